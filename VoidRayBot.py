@@ -1,27 +1,100 @@
 # General imports
+import asyncio
+import math
 import random
+import time
 import constants
-import math
-import cv2
 import numpy as np
+import rasterizer
+import perf
+from snapshot import UnitSnapshot
+from action_channel import NO_ACTION
 
 # SC2 API imports
 from sc2.bot_ai import BotAI  # parent class we inherit from
 from sc2.ids.unit_typeid import UnitTypeId
 from sc2.ids.unit_typeid import UnitTypeId
 
+# Colors used by visualize_intel for each kind of unit
+VOIDRAY_COLOR = [255, 75, 75]
+OWN_UNIT_COLOR = [175, 255, 0]
+MINERAL_COLOR = [175, 255, 255]
+HIDDEN_MINERAL_COLOR = [20, 75, 50]
+ENEMY_START_COLOR = [0, 0, 255]
+ENEMY_UNIT_COLOR = [100, 0, 255]
+ENEMY_STRUCTURE_COLOR = [0, 100, 255]
+NEXUS_COLOR = [255, 255, 175]
+OWN_STRUCTURE_COLOR = [0, 255, 175]
+GEYSER_COLOR = [255, 175, 255]
+HIDDEN_GEYSER_COLOR = [50, 20, 75]
+
+# Plane of every category in the "planes" observation mode
+PLANE_OWN_UNITS = constants.OBSERVATION_PLANES.index("own_units")
+PLANE_VOID_RAYS = constants.OBSERVATION_PLANES.index("void_rays")
+PLANE_OWN_STRUCTURES = constants.OBSERVATION_PLANES.index("own_structures")
+PLANE_ENEMY_UNITS = constants.OBSERVATION_PLANES.index("enemy_units")
+PLANE_ENEMY_STRUCTURES = constants.OBSERVATION_PLANES.index("enemy_structures")
+PLANE_MINERALS = constants.OBSERVATION_PLANES.index("minerals")
+PLANE_GEYSERS = constants.OBSERVATION_PLANES.index("geysers")
+PLANE_ENEMY_START = constants.OBSERVATION_PLANES.index("enemy_start")
+# Value of the minerals and geysers out of sight in the "planes" observation mode
+HIDDEN_RESOURCE_VALUE = 64
+
+# Game seconds a cached building placement is trusted for, even if no structure
+# was started or destroyed in the meantime (e.g. a build order that never happened)
+PLACEMENT_CACHE_TTL = 30
+
+# Pathing distances from a start location to every expansion, per map. They
+# never change during a game, so they are shared by all the games on that map.
+EXPANSION_DISTANCES = {}
+
+# perf stage names of every macro action branch of on_step
+ACTION_STAGES = [f"bot/action_{action}" for action in range(constants.NUMBER_OF_ACTIONS)]
+
 class VRBot(BotAI): # inhereits from BotAI (part of BurnySC2)
-    def __init__(self, *args,bot_in_box=None, action_in=None, result_out=None, **kwargs, ):
+    def __init__(self, *args,bot_in_box=None, action_in=None, result_out=None, on_ready=None,
+                 observation_mode=constants.OBSERVATION_MODE, observation_resolution=constants.OBSERVATION_RESOLUTION, **kwargs, ):
         super().__init__(*args, **kwargs)
         self.action_in = action_in
         self.result_out = result_out
+        self.on_ready = on_ready # called once the game is loaded and the bot is about to wait for actions
         self.main_base_destroyed = False
         self.last_action_time = 0
+        self.action = None
+        # How actions are turned into game commands, see constants.py
+        self.decision_interval = constants.DECISION_INTERVAL
+        self.action_repeat = constants.ACTION_REPEAT
+        self.non_blocking = constants.NON_BLOCKING_ACTIONS
+        self.max_decision_lag = constants.MAX_DECISION_LAG
+        self.action_timeout = constants.ACTION_TIMEOUT
+        self.last_heartbeat = time.monotonic() # start of the last on_step, watched by the GamePool
+        # See OBSERVATION_MODE in constants.py
+        self.observation_mode = observation_mode
+        self.observation_resolution = observation_resolution
+        observation_shape = constants.observation_space(observation_mode, observation_resolution).shape
+        self.frames = [np.zeros(observation_shape, dtype=np.uint8) for _ in range(2)]
+        self.frame_index = 0
+        self.obs_out = None # when set by the environment, frames are rendered straight into this array
+        self.observe_stats = False # set by the environment when its observations include game_stats()
+        self.current_snapshot = None # grouped units of the current step, see the snapshot property
+        self.placements = {} # (building, position) -> (placement, game time it was found at)
+        # Counted between two decisions and reported in the step info
+        self.api_round_trips = 0
+        self.cache_hits = 0
+
+    async def on_start(self):
+        self.action_in.bind()
+        if self.on_ready is not None:
+            self.on_ready()
 
     async def on_end(self,game_result):
         print ("Game over!")
         
-        obs = np.zeros((224, 224, 3), dtype=np.uint8)
+        if self.obs_out is not None:
+            obs = self.obs_out
+            obs.fill(0)
+        else:
+            obs = np.zeros_like(self.frames[0])
 
         print(f"GAME DURATION: {self.time}")
         
@@ -30,15 +103,24 @@ class VRBot(BotAI): # inhereits from BotAI (part of BurnySC2)
         else:
             reward = -300
 
-        self.result_out.put({"observation" : obs, "reward" : reward, "action" : None, "done" : True, "truncated" : False, "info" : {}})
+        self.result_out.put({"observation" : obs, "reward" : reward, "action" : None, "done" : True, "truncated" : False,
+                             "info" : {"game_result" : game_result.name}})
         
 
+    @property
+    def snapshot(self):
+        # Built on first use in each step, on_step drops the one of the previous step
+        if self.current_snapshot is None:
+            self.current_snapshot = UnitSnapshot(self)
+        return self.current_snapshot
+
     async def on_step(self, iteration): # on_step is a method that is called every step of the game.
-        if self.time - self.last_action_time < 0.5:
+        self.last_heartbeat = time.monotonic()
+        self.current_snapshot = None
+        if self.time - self.last_action_time < self.decision_interval:
+            await self.repeat_action()
             return
 
-        self.last_action_time = self.time  
-
         game_time_minutes = self.time / 60  # self.time is in seconds
 
         if game_time_minutes > 30:
@@ -46,16 +128,62 @@ class VRBot(BotAI): # inhereits from BotAI (part of BurnySC2)
             # Force a game end. Here, we just surrender.
             await self.client.leave()
 
-
-        self.action = self.action_in.get()
+        wait_start = time.perf_counter()
+        if self.non_blocking and self.action is not None and self.time - self.last_action_time < self.max_decision_lag:
+            # Don't hold the game while the learner computes the next action.
+            # The first action of a game is always waited for, so that warm
+            # spares don't start playing on their own.
+            action = self.action_in.get_nowait()
+            if action is NO_ACTION:
+                await self.repeat_action()
+                return
+        elif self.action is None:
+            # Warm spares may wait for their first action as long as an episode lasts
+            action = await self.action_in.get()
+        else:
+            try:
+                action = await self.action_in.get(self.action_timeout)
+            except asyncio.TimeoutError:
+                print(f"No action for {self.action_timeout}s, leaving the game.")
+                await self.client.leave()
+                return
+        action_wait = time.perf_counter() - wait_start # time spent waiting for the learner
+        perf.record("bot/action_wait", action_wait)
+
+        decision_lag = self.time - self.last_action_time # game seconds since the previous decision
+        self.last_action_time = self.time
+        self.action = action
 
         print(f"Iteration: {iteration} | Action: {self.action} | Game time: {self.time}")
 
         if self.action is None:
             print("no action returning.")
             return None
-        
-        
+
+        await self.act(self.action)
+
+        with perf.timed("bot/visualize_intel"):
+            obs = self.visualize_intel()
+        with perf.timed("bot/reward_function"):
+            reward = self.reward_function()
+        #if iteration % 10 == 0:
+        #    print(f"Reward: {reward}")
+
+        info = {"action_wait" : action_wait, "decision_lag" : decision_lag,
+                "api_round_trips" : self.api_round_trips, "cache_hits" : self.cache_hits}
+        self.api_round_trips = 0
+        self.cache_hits = 0
+        out = {"observation" : obs, "reward" : reward, "action" : None, "done" : False, "truncated" : False, "info" : info}
+        if self.observe_stats:
+            out["stats"] = self.game_stats()
+        self.result_out.put(out)
+
+    async def repeat_action(self):
+        # Between decisions, optionally keep applying the last macro action
+        if self.action_repeat and self.action is not None:
+            await self.act(self.action)
+
+    async def act(self, action):
         # DRL Agent Logic
         # 0 - Expand, Build Assimilators and Workers (Long-Term Economy)
         # 1 - Build Stargate (Military Building)
@@ -65,106 +193,175 @@ class VRBot(BotAI): # inhereits from BotAI (part of BurnySC2)
         # 5 - Do nothing 
 
         try:
-            await self.distribute_workers()
-            if self.action == 0:
-                await self.expand()
-                await self.build_assimilators()
-                await self.build_workers()
-            elif self.action == 1:
-                await self.build_gateway()
-                await self.build_cybernetics_core()
-                await self.build_stargates()
-            elif self.action == 2:
-                await self.build_void_rays()
-            elif self.action == 3:
-                await self.attack()
-            elif self.action == 4:
-                await self.build_pylons()
-            else:
-                pass
+            with perf.timed("bot/distribute_workers"):
+                await self.distribute_workers()
+            with perf.timed(ACTION_STAGES[action]):
+                if action == 0:
+                    await self.expand()
+                    await self.build_assimilators()
+                    await self.build_workers()
+                elif action == 1:
+                    await self.build_gateway()
+                    await self.build_cybernetics_core()
+                    await self.build_stargates()
+                elif action == 2:
+                    await self.build_void_rays()
+                elif action == 3:
+                    await self.attack()
+                elif action == 4:
+                    await self.build_pylons()
+                else:
+                    pass
         except Exception as e:
             print(f"Exception - {e}")
 
-        obs = self.visualize_intel()
-        reward = self.reward_function()
-        #if iteration % 10 == 0:
-        #    print(f"Reward: {reward}")
-
-        self.result_out.put({"observation" : obs, "reward" : reward, "action" : None, "done" : False, "truncated" : False, "info" : {}})
+    async def on_building_construction_started(self, unit):
+        # A new structure changes where buildings fit
+        self.placements.clear()
+
+    async def on_unit_destroyed(self, unit_tag):
+        if unit_tag in self._structures_previous_map or unit_tag in self._enemy_structures_previous_map:
+            self.placements.clear()
+
+    async def cached_placement(self, building, near):
+        # find_placement, reusing the answer for the same building and position
+        # until a structure is started or destroyed
+        key = (building, round(near.x, 1), round(near.y, 1))
+        cached = self.placements.get(key)
+        if cached is not None and self.time - cached[1] < PLACEMENT_CACHE_TTL:
+            self.cache_hits += 1
+            return cached[0]
+        self.api_round_trips += 1
+        with perf.timed("bot/api/find_placement"):
+            placement = await self.find_placement(building, near)
+        self.placements[key] = (placement, self.time)
+        return placement
+
+    async def build_near(self, building, near):
+        # Same as BotAI.build, with the placement coming from cached_placement
+        if not self.can_afford(building):
+            return False
+        near = near.position.to2
+        placement = await self.cached_placement(building, near)
+        if placement is None:
+            return False
+        builder = self.select_build_worker(near)
+        if builder is None:
+            return False
+        builder.build(building, placement)
+        return True
+
+    async def next_expansion(self):
+        # Same as BotAI.get_next_expansion, with the pathing distances kept per map
+        start = self.game_info.player_start_location
+        key = (self.game_info.map_name, start.x, start.y)
+        distances = EXPANSION_DISTANCES.get(key)
+        if distances is None:
+            distances = []
+            for location in self.expansion_locations_list:
+                self.api_round_trips += 1
+                with perf.timed("bot/api/query_pathing"):
+                    distances.append((location, await self.client.query_pathing(start, location)))
+            EXPANSION_DISTANCES[key] = distances
+        else:
+            self.cache_hits += 1
+
+        closest = None
+        closest_distance = math.inf
+        for location, distance in distances:
+            if distance is None or distance >= closest_distance:
+                continue
+            if any(townhall.distance_to(location) < self.EXPANSION_GAP_THRESHOLD for townhall in self.townhalls):
+                # already taken
+                continue
+            closest = location
+            closest_distance = distance
+        return closest
 
     async def build_workers(self):
-        for nexus in self.structures(UnitTypeId.NEXUS).ready:
+        for nexus in self.snapshot.ready(UnitTypeId.NEXUS):
             if nexus.is_idle and self.can_afford(UnitTypeId.PROBE):
                 nexus.train(UnitTypeId.PROBE)
 
     async def build_pylons(self):
-        if not self.already_pending(UnitTypeId.PYLON):
+        units = self.snapshot
+        if not units.already_pending(UnitTypeId.PYLON):
             if self.supply_left < 5:
-                if len(self.structures(UnitTypeId.NEXUS)) > 0:
-                    nexus = self.structures(UnitTypeId.NEXUS).ready.random
+                if units.count(UnitTypeId.NEXUS) > 0:
+                    nexus = units.ready(UnitTypeId.NEXUS).random
                     position = nexus.position.towards(self.game_info.map_center, 5)
                     if self.can_afford(UnitTypeId.PYLON):
-                        await self.build(UnitTypeId.PYLON, near=position)
+                        await self.build_near(UnitTypeId.PYLON, near=position)
 
     async def build_assimilators(self):
-        if len(self.structures(UnitTypeId.NEXUS)) > 0:
-            for nexus in self.structures(UnitTypeId.NEXUS).ready:
+        units = self.snapshot
+        if units.count(UnitTypeId.NEXUS) > 0:
+            for nexus in units.ready(UnitTypeId.NEXUS):
                 vespenes = self.vespene_geyser.closer_than(15.0, nexus.position)  # Corrected to use `position`
                 for vespene in vespenes:
-                    if not self.can_afford(UnitTypeId.ASSIMILATOR) or self.structures(UnitTypeId.ASSIMILATOR).closer_than(1.0, vespene).exists:
+                    if not self.can_afford(UnitTypeId.ASSIMILATOR) or units.of_type(UnitTypeId.ASSIMILATOR).closer_than(1.0, vespene).exists:
                         continue
                     worker = self.select_build_worker(vespene.position)
                     if worker:
                         worker.build(UnitTypeId.ASSIMILATOR, vespene)
 
     async def expand(self):
-        if self.can_afford(UnitTypeId.NEXUS) and not self.already_pending(UnitTypeId.NEXUS):
-            location = await self.get_next_expansion()  # Assuming this is async
+        if self.can_afford(UnitTypeId.NEXUS) and not self.snapshot.already_pending(UnitTypeId.NEXUS):
+            location = await self.next_expansion()
             if location:
-                await self.build(UnitTypeId.NEXUS, near=location)
+                await self.build_near(UnitTypeId.NEXUS, near=location)
 
     async def build_gateway(self):
-        if len(self.structures(UnitTypeId.NEXUS)) > 0:
-            if not self.structures(UnitTypeId.GATEWAY).ready.exists and not self.already_pending(UnitTypeId.GATEWAY):
-                pylons = self.structures(UnitTypeId.PYLON).ready
+        units = self.snapshot
+        if units.count(UnitTypeId.NEXUS) > 0:
+            if not units.ready_count(UnitTypeId.GATEWAY) and not units.already_pending(UnitTypeId.GATEWAY):
+                pylons = units.ready(UnitTypeId.PYLON)
                 if pylons.exists and self.can_afford(UnitTypeId.GATEWAY):
-                    await self.build(UnitTypeId.GATEWAY, near=pylons.closest_to(self.structures(UnitTypeId.NEXUS).first))
+                    await self.build_near(UnitTypeId.GATEWAY, near=pylons.closest_to(units.of_type(UnitTypeId.NEXUS).first))
 
     async def build_cybernetics_core(self):
-        if len(self.structures(UnitTypeId.NEXUS)) > 0:
-            if self.structures(UnitTypeId.GATEWAY).ready.exists and not self.structures(UnitTypeId.CYBERNETICSCORE):
-                pylon = self.structures(UnitTypeId.PYLON).ready.random
-                if self.can_afford(UnitTypeId.CYBERNETICSCORE) and not self.already_pending(UnitTypeId.CYBERNETICSCORE):
-                    await self.build(UnitTypeId.CYBERNETICSCORE, near=pylon.position.towards(self.game_info.map_center, 5))
+        units = self.snapshot
+        if units.count(UnitTypeId.NEXUS) > 0:
+            if units.ready_count(UnitTypeId.GATEWAY) and not units.count(UnitTypeId.CYBERNETICSCORE):
+                pylon = units.ready(UnitTypeId.PYLON).random
+                if self.can_afford(UnitTypeId.CYBERNETICSCORE) and not units.already_pending(UnitTypeId.CYBERNETICSCORE):
+                    await self.build_near(UnitTypeId.CYBERNETICSCORE, near=pylon.position.towards(self.game_info.map_center, 5))
 
     async def build_stargates(self):
-        if len(self.structures(UnitTypeId.NEXUS)) > 0:
-            if self.structures(UnitTypeId.CYBERNETICSCORE).ready.exists:
-                for pylon in self.structures(UnitTypeId.PYLON).ready:
-                    if self.can_afford(UnitTypeId.STARGATE) and not self.already_pending(UnitTypeId.STARGATE):
-                        await self.build(UnitTypeId.STARGATE, near=pylon.position.towards(self.game_info.map_center, 5))
+        units = self.snapshot
+        if units.count(UnitTypeId.NEXUS) > 0:
+            if units.ready_count(UnitTypeId.CYBERNETICSCORE):
+                for pylon in units.ready(UnitTypeId.PYLON):
+                    if self.can_afford(UnitTypeId.STARGATE) and not units.already_pending(UnitTypeId.STARGATE):
+                        await self.build_near(UnitTypeId.STARGATE, near=pylon.position.towards(self.game_info.map_center, 5))
 
     async def build_void_rays(self):
-        for stargate in self.structures(UnitTypeId.STARGATE).ready.idle:
+        for stargate in self.snapshot.ready(UnitTypeId.STARGATE).idle:
             if self.can_afford(UnitTypeId.VOIDRAY) and self.supply_left > 0:
                 stargate.train(UnitTypeId.VOIDRAY)
 
     async def defend_bases(self):
-        if self.units(UnitTypeId.VOIDRAY).amount < 5:
-            for vr in self.units(UnitTypeId.VOIDRAY).idle:
+        units = self.snapshot
+        if units.count(UnitTypeId.VOIDRAY) < 5:
+            for vr in units.of_type(UnitTypeId.VOIDRAY).idle:
                 vr.move(self.start_location)
 
     async def attack(self):
         # take all void rays and attack!
-        for voidray in self.units(UnitTypeId.VOIDRAY).idle:
-            if self.enemy_units.closer_than(10, voidray):
-                voidray.attack(random.choice(self.enemy_units.closer_than(10, voidray)))
-            elif self.enemy_units:
-                voidray.attack(random.choice(self.enemy_units))
-            elif self.enemy_structures.closer_than(10, voidray):
-                voidray.attack(random.choice(self.enemy_structures.closer_than(10, voidray)))
-            elif self.enemy_structures:
-                voidray.attack(random.choice(self.enemy_structures))
+        voidrays = self.snapshot.of_type(UnitTypeId.VOIDRAY).idle
+        if not voidrays:
+            return
+        enemy_unit_index, enemy_structure_index = self.snapshot.enemies()
+        for voidray in voidrays:
+            close_units = enemy_unit_index.closer_than(10, voidray)
+            if close_units:
+                voidray.attack(random.choice(close_units))
+            elif enemy_unit_index.units:
+                voidray.attack(random.choice(enemy_unit_index.units))
+            elif close_structures := enemy_structure_index.closer_than(10, voidray):
+                voidray.attack(random.choice(close_structures))
+            elif enemy_structure_index.units:
+                voidray.attack(random.choice(enemy_structure_index.units))
             elif self.enemy_start_locations:
                 voidray.attack(self.enemy_start_locations[0])
         
@@ -172,123 +369,121 @@ class VRBot(BotAI): # inhereits from BotAI (part of BurnySC2)
         reward = 0
         attack_count = 0
         # iterate through our void rays:
-        for vr in self.units(UnitTypeId.VOIDRAY):
+        for vr in self.snapshot.of_type(UnitTypeId.VOIDRAY):
             # if voidray is attacking and is in range of enemy unit:
             if vr.is_attacking and vr.target_in_range:
-                if self.enemy_units.closer_than(12, vr) or self.enemy_structures.closer_than(12, vr):
+                enemy_unit_index, enemy_structure_index = self.snapshot.enemies()
+                if enemy_unit_index.any_closer_than(12, vr) or enemy_structure_index.any_closer_than(12, vr):
                     reward += 0.15  
                     attack_count += 1
 
         return reward
     
-    def visualize_intel(self):
+    def game_stats(self):
+        # Scalar stats given to the policy next to the map, see OBSERVATION_STATS in constants.py
+        units = self.snapshot
+        voidrays = units.of_type(UnitTypeId.VOIDRAY)
+        stats = np.array([
+            units.count(UnitTypeId.PROBE),
+            len(voidrays),
+            sum(1 for vr in voidrays if vr.is_attacking),
+            units.count(UnitTypeId.NEXUS),
+            units.count(UnitTypeId.ASSIMILATOR),
+            units.count(UnitTypeId.STARGATE),
+            units.count(UnitTypeId.PYLON),
+            min(199, self.supply_left),
+            self.time,
+        ], dtype=np.float32)
+        return np.minimum(stats / constants.GAME_STATS_LIMITS, 1)
 
-        obs = np.zeros((224, 224, 3), dtype=np.uint8)
-        """ limits = np.array(constants.OBSERVATION_SPACE_ARRAY)
-
-        # Number of probes
-        obs[0] = self.units(UnitTypeId.PROBE).amount
-        # Number of void rays
-        obs[1] = self.units(UnitTypeId.VOIDRAY).amount
-        # Number of attacking void rays
-        obs[2] = len([vr for vr in self.units(UnitTypeId.VOIDRAY) if vr.is_attacking])
-        # Number of nexus
-        obs[3] = self.units(UnitTypeId.NEXUS).amount
-        # Number of assimilators
-        obs[4] = self.units(UnitTypeId.ASSIMILATOR).amount
-        # Number of stargates
-        obs[5] = self.units(UnitTypeId.STARGATE).amount
-        # Number of pylons
-        obs[6] = self.units(UnitTypeId.PYLON).amount
-        # Supply left
-        obs[7] = min(199, int(self.supply_left))
-        # Game time
-        obs[8] = self.time
-
-        for i in range(len(obs)):
-            if obs[i] >= limits[i]-1:
-                obs[i] = limits[i] - 1 """
-
-        # Draw our units
-        for our_unit in self.all_own_units:
-            # if it is a voidray:
-            if our_unit.type_id == UnitTypeId.VOIDRAY:
-                pos = our_unit.position
-                c = [255, 75 , 75]
-                # get health:
-                fraction = our_unit.health / our_unit.health_max if our_unit.health_max > 0 else 0.0001
-                obs[math.ceil(pos.y)][math.ceil(pos.x)] = [int(fraction*i) for i in c]
-
-
-            else:
-                pos = our_unit.position
-                c = [175, 255, 0]
-                # get health:
-                fraction = our_unit.health / our_unit.health_max if our_unit.health_max > 0 else 0.0001
-                obs[math.ceil(pos.y)][math.ceil(pos.x)] = [int(fraction*i) for i in c]
+    def visualize_intel(self):
+        # Reuse one of two preallocated frames instead of allocating a new one
+        # every step. Two are needed because the previous frame may still be
+        # in flight to the environment while the next one is being drawn.
+        if self.obs_out is not None:
+            obs = self.obs_out
+        else:
+            self.frame_index = 1 - self.frame_index
+            obs = self.frames[self.frame_index]
+        obs.fill(0)
+        units = self.snapshot
+        if self.observation_mode == "planes":
+            return self.draw_planes(obs, units)
+
+        layers = rasterizer.Layers()
+
+        # Draw our units. The same table also gives the rows of our structures,
+        # which keep the order of all_own_units like self.structures does.
+        own_table = units.table("own")
+        is_voidray = own_table[:, 4] == UnitTypeId.VOIDRAY.value
+        colors = np.where(is_voidray[:, None], VOIDRAY_COLOR, OWN_UNIT_COLOR)
+        fractions = rasterizer.health_fractions(own_table[:, 2], own_table[:, 3])
+        layers.add(own_table[:, 0], own_table[:, 1], rasterizer.shade(colors, fractions))
 
         # Draw the minerals
-        for mineral in self.mineral_field:
-            pos = mineral.position
-            c = [175, 255, 255]
-            fraction = mineral.mineral_contents / 1800
-            if mineral.is_visible:
-                obs[math.ceil(pos.y)][math.ceil(pos.x)] = c
-            else:
-                obs[math.ceil(pos.y)][math.ceil(pos.x)] = [20,75,50]  
+        table = units.table("minerals")
+        layers.add(table[:, 0], table[:, 1], np.where(table[:, 2:3] > 0, MINERAL_COLOR, HIDDEN_MINERAL_COLOR))
 
         # Draw the enemy start location
-        for pos in self.enemy_start_locations:
-            c = [0, 0, 255]
-            obs[math.ceil(pos.y)][math.ceil(pos.x)] = c
-
-        # Draw the enemy units
-        for enemy_unit in self.all_enemy_units:
-            pos = enemy_unit.position
-            c = [100, 0, 255]
-            # get unit health fraction:
-            fraction = enemy_unit.health / enemy_unit.health_max if enemy_unit.health_max > 0 else 0.0001
-            obs[math.ceil(pos.y)][math.ceil(pos.x)] = [int(fraction*i) for i in c]
-
-        # Draw the enemy structures
-        for enemy_structure in self.enemy_structures:
-            pos = enemy_structure.position
-            c = [0, 100, 255]
-            # get structure health fraction:
-            fraction = enemy_structure.health / enemy_structure.health_max if enemy_structure.health_max > 0 else 0.0001
-            obs[math.ceil(pos.y)][math.ceil(pos.x)] = [int(fraction*i) for i in c]
+        table = np.array([tuple(pos) for pos in self.enemy_start_locations], dtype=np.float64).reshape(-1, 2)
+        layers.add(table[:, 0], table[:, 1], ENEMY_START_COLOR)
+
+        # Draw all the enemies, then their structures again on top
+        enemy_table = units.table("enemy")
+        for table, color in ((enemy_table, ENEMY_UNIT_COLOR), (enemy_table[enemy_table[:, 4] > 0], ENEMY_STRUCTURE_COLOR)):
+            fractions = rasterizer.health_fractions(table[:, 2], table[:, 3])
+            layers.add(table[:, 0], table[:, 1], rasterizer.shade(color, fractions))
 
         # Draw our structures
-        for our_structure in self.all_own_units.structure:
-            if our_structure.type_id == UnitTypeId.NEXUS:
-                pos = our_structure.position
-                c = [255, 255, 175]
-                # get structure health fraction:
-                fraction = our_structure.health / our_structure.health_max if our_structure.health_max > 0 else 0.0001
-                obs[math.ceil(pos.y)][math.ceil(pos.x)] = [int(fraction*i) for i in c]
-            
-            else:
-                pos = our_structure.position
-                c = [0, 255, 175]
-                # get structure health fraction:
-                fraction = our_structure.health / our_structure.health_max if our_structure.health_max > 0 else 0.0001
-                obs[math.ceil(pos.y)][math.ceil(pos.x)] = [int(fraction*i) for i in c]
+        table = own_table[own_table[:, 5] > 0]
+        is_nexus = table[:, 4] == UnitTypeId.NEXUS.value
+        colors = np.where(is_nexus[:, None], NEXUS_COLOR, OWN_STRUCTURE_COLOR)
+        fractions = rasterizer.health_fractions(table[:, 2], table[:, 3])
+        layers.add(table[:, 0], table[:, 1], rasterizer.shade(colors, fractions))
 
         # Draw the vespene geysers
-        for vespene in self.vespene_geyser:
-            pos = vespene.position
-            c = [255, 175, 255]
-            fraction = vespene.vespene_contents / 2250
-
-            if vespene.is_visible:
-                obs[math.ceil(pos.y)][math.ceil(pos.x)] = [int(fraction*i) for i in c]
-            else:
-                obs[math.ceil(pos.y)][math.ceil(pos.x)] = [50,20,75]
-
+        table = units.table("geysers")
+        shaded = rasterizer.shade(GEYSER_COLOR, table[:, 3] / 2250)
+        layers.add(table[:, 0], table[:, 1], np.where(table[:, 2:3] > 0, shaded, HIDDEN_GEYSER_COLOR))
 
+        layers.draw(obs)
 
-        # Show obs with OpenCV, resized to be larger
+        # Show obs with OpenCV, resized to be larger (OpenCV is not imported by default, the env workers don't need it)
         #cv2.imshow('obs',cv2.flip(cv2.resize(obs, None, fx=4, fy=4, interpolation=cv2.INTER_NEAREST), 0))
         #cv2.waitKey(1)
         
-        return obs
\ No newline at end of file
+        return obs
+
+    def draw_planes(self, obs, units):
+        # One plane per category of constants.OBSERVATION_PLANES, cropped to the playable area.
+        # Units are drawn with their health (at least 1 so they never disappear).
+        planes = rasterizer.Planes(self.game_info.playable_area, self.observation_resolution)
+
+        def health(table):
+            return np.maximum(rasterizer.health_fractions(table[:, 2], table[:, 3]) * 255, 1)
+
+        own_table = units.table("own")
+        is_structure = own_table[:, 5] > 0
+        is_voidray = own_table[:, 4] == UnitTypeId.VOIDRAY.value
+        for plane, rows in ((PLANE_OWN_UNITS, ~is_structure & ~is_voidray), (PLANE_VOID_RAYS, is_voidray),
+                            (PLANE_OWN_STRUCTURES, is_structure)):
+            table = own_table[rows]
+            planes.add(table[:, 0], table[:, 1], plane, health(table))
+
+        enemy_table = units.table("enemy")
+        is_enemy_structure = enemy_table[:, 4] > 0
+        for plane, rows in ((PLANE_ENEMY_UNITS, ~is_enemy_structure), (PLANE_ENEMY_STRUCTURES, is_enemy_structure)):
+            table = enemy_table[rows]
+            planes.add(table[:, 0], table[:, 1], plane, health(table))
+
+        # Resources we can't see are drawn dimmer
+        table = units.table("minerals")
+        planes.add(table[:, 0], table[:, 1], PLANE_MINERALS, np.where(table[:, 2] > 0, 255, HIDDEN_RESOURCE_VALUE))
+        table = units.table("geysers")
+        contents = np.maximum(table[:, 3] / 2250 * 255, 1)
+        planes.add(table[:, 0], table[:, 1], PLANE_GEYSERS, np.where(table[:, 2] > 0, contents, HIDDEN_RESOURCE_VALUE))
+
+        table = np.array([tuple(pos) for pos in self.enemy_start_locations], dtype=np.float64).reshape(-1, 2)
+        planes.add(table[:, 0], table[:, 1], PLANE_ENEMY_START, 255)
+
+        return planes.draw(obs)
@@ -0,0 +1,62 @@
+# General imports
+import asyncio
+from collections import deque
+from threading import Lock
+
+# Returned by get_nowait() when no action is waiting
+NO_ACTION = object()
+
+
+def _wake(waiter):
+    if not waiter.done():
+        waiter.set_result(None)
+
+
+class ActionChannel:
+    """Hands actions from the environment thread to the bot's asyncio loop.
+
+    put() can be called from any thread. Inside the game loop, `await get()`
+    suspends the bot coroutine instead of blocking the whole event loop the way
+    queue.Queue.get() does, and get_nowait() lets the bot poll for an action
+    while the game keeps running.
+    """
+
+    def __init__(self) -> None:
+        self.pending = deque()
+        self.lock = Lock()
+        self.loop = None
+        self.waiter = None
+
+    def bind(self):
+        # Must be called from the game's event loop before the first get()
+        self.loop = asyncio.get_running_loop()
+
+    def put(self, action):
+        with self.lock:
+            self.pending.append(action)
+            waiter, self.waiter = self.waiter, None
+        if waiter is not None:
+            self.loop.call_soon_threadsafe(_wake, waiter)
+
+    def get_nowait(self):
+        with self.lock:
+            return self.pending.popleft() if self.pending else NO_ACTION
+
+    async def get(self, timeout=None):
+        # Raises asyncio.TimeoutError if no action came within timeout seconds
+        deadline = None if timeout is None else self.loop.time() + timeout
+        while True:
+            with self.lock:
+                if self.pending:
+                    return self.pending.popleft()
+                self.waiter = waiter = self.loop.create_future()
+            if deadline is None:
+                await waiter
+                continue
+            try:
+                await asyncio.wait_for(waiter, max(0.0, deadline - self.loop.time()))
+            except asyncio.TimeoutError:
+                with self.lock:
+                    if self.waiter is waiter:
+                        self.waiter = None
+                raise
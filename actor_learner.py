@@ -0,0 +1,393 @@
+# General imports
+import os
+import sys
+import time
+from queue import Queue, Empty, Full
+from threading import Thread, Lock
+from multiprocessing import get_context
+from multiprocessing.connection import Listener, Client, wait
+import numpy as np
+import constants
+from checkpoints import write_atomically
+from env_worker import start_forkserver
+from policies import policy_kwargs
+
+# PyTorch and StableBaselines3 imports
+import torch as th
+from gymnasium.spaces import Discrete
+from stable_baselines3.common.policies import ActorCriticCnnPolicy
+from stable_baselines3.common.vec_env import VecTransposeImage
+from stable_baselines3.common.vec_env.base_vec_env import CloudpickleWrapper
+
+# Asynchronous actor/learner training (IMPALA style), an alternative to train_ppo.
+#
+# Every actor process plays its own QueueEnv and never waits for the other ones.
+# To pick an action it sends its observation to the inference server of the
+# learner process, which answers all the requests received within
+# INFERENCE_BATCH_WINDOW with a single forward pass of the policy. Every
+# UNROLL_LENGTH steps the actor sends the segment it played (observations,
+# actions, rewards, dones and the log-probabilities of the policy that acted) to
+# the learner. Since the policy keeps changing while actors play, segments are
+# slightly off-policy and the learner corrects for it with V-trace.
+#
+# Actors talk to the learner over a multiprocessing.connection socket: a local
+# unix socket by default, or TCP when INFERENCE_ADDRESS is set, in which case
+# actors can run on other machines with `python actor_learner.py actor HOST PORT`.
+# Connections unpickle whatever they receive, so their key is all that keeps
+# strangers from running code in the learner: see inference_authkey.
+
+
+def vtrace(behaviour_log_probs, target_log_probs, rewards, dones, values, bootstrap_values,
+           gamma=constants.GAMMA, rho_bar=constants.VTRACE_RHO_BAR, c_bar=constants.VTRACE_C_BAR):
+    # V-trace targets and policy gradient advantages (Espeholt et al., 2018).
+    # Every argument has shape (T, B), except bootstrap_values which is (B,).
+    rhos = th.exp(target_log_probs - behaviour_log_probs)
+    clipped_rhos = th.clamp(rhos, max=rho_bar)
+    cs = th.clamp(rhos, max=c_bar)
+    discounts = gamma * (1.0 - dones)
+    next_values = th.cat([values[1:], bootstrap_values[None]], dim=0)
+    deltas = clipped_rhos * (rewards + discounts * next_values - values)
+
+    accumulated = th.zeros_like(bootstrap_values)
+    vs_minus_values = []
+    for t in reversed(range(len(deltas))):
+        accumulated = deltas[t] + discounts[t] * cs[t] * accumulated
+        vs_minus_values.append(accumulated)
+    vs = values + th.stack(vs_minus_values[::-1])
+
+    next_vs = th.cat([vs[1:], bootstrap_values[None]], dim=0)
+    pg_advantages = clipped_rhos * (rewards + discounts * next_vs - values)
+    return vs, pg_advantages
+
+
+def as_tensor(observations, device):
+    # (N, H, W, C) uint8 frames to the (N, C, H, W) layout of the CNN policies
+    return th.as_tensor(observations, device=device).permute(0, 3, 1, 2)
+
+
+def inference_authkey(address=None):
+    # The key set in the environment, or a random one for this run when actors
+    # are local. Over TCP a key known to everyone (e.g. one in the code) would let
+    # anyone who reaches the port run code here, so there is no default then.
+    key = os.environ.get(constants.INFERENCE_AUTHKEY_VARIABLE)
+    if key:
+        return key.encode()
+    if address is None:
+        return os.urandom(32)
+    raise ValueError(f"Set a secret key in the {constants.INFERENCE_AUTHKEY_VARIABLE} environment "
+                     f"variable to serve or join actors over TCP")
+
+
+def make_policy(observation_space):
+    return ActorCriticCnnPolicy(VecTransposeImage.transpose_space(observation_space),
+                                Discrete(constants.NUMBER_OF_ACTIONS),
+                                lr_schedule=lambda _: constants.LEARNING_RATE, **policy_kwargs())
+
+
+class InferenceServer:
+    """Answers the action requests of the actors in batches.
+
+    Requests received within batch_window of the first pending one (or until
+    max_batch requests, or one per connected actor, are pending) are answered
+    with one forward pass. Completed segments sent by the actors are put in
+    the `segments` queue for the learner; when the learner falls behind the
+    queue fills up and the actors wait, instead of piling up stale experience.
+    """
+
+    def __init__(self, policy, address=None, authkey=None,
+                 batch_window=constants.INFERENCE_BATCH_WINDOW, max_batch=constants.INFERENCE_MAX_BATCH,
+                 max_queued_segments=constants.LEARNER_QUEUE_SEGMENTS) -> None:
+        self.policy = policy
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+        self.segments = Queue(maxsize=max_queued_segments)
+        self.lock = Lock() # held while the policy is used or its weights replaced
+        self.policy_version = 0
+        self.connections = []
+        self.stopping = False
+        self.batch_sizes = []
+        self.env_steps = 0
+        # Handed to the local actors
+        self.authkey = authkey if authkey is not None else inference_authkey(address)
+        if address is None:
+            self.listener = Listener(family="AF_UNIX", authkey=self.authkey)
+        else:
+            self.listener = Listener(address, authkey=self.authkey)
+        self.address = self.listener.address
+        self.accept_thread = Thread(target=self.accept, daemon=True)
+        self.serve_thread = Thread(target=self.serve, daemon=True)
+
+    def start(self):
+        self.accept_thread.start()
+        self.serve_thread.start()
+
+    def accept(self):
+        while not self.stopping:
+            try:
+                connection = self.listener.accept()
+            except OSError:
+                return
+            self.connections.append(connection)
+
+    def update_weights(self, state_dict):
+        with self.lock:
+            self.policy.load_state_dict(state_dict)
+            self.policy_version += 1
+
+    def serve(self):
+        pending = []
+        deadline = None
+        while not (self.stopping and not self.connections):
+            if not self.connections:
+                time.sleep(0.01)
+                continue
+            timeout = 0.05 if deadline is None else max(0.0, deadline - time.perf_counter())
+            for connection in wait(list(self.connections), timeout):
+                try:
+                    kind, payload = connection.recv()
+                except (EOFError, OSError):
+                    self.connections.remove(connection)
+                    continue
+                if kind == "act":
+                    pending.append((connection, payload))
+                    if deadline is None:
+                        deadline = time.perf_counter() + self.batch_window
+                elif kind == "segment":
+                    self.env_steps += len(payload["actions"])
+                    self.queue_segment(payload)
+            # Nobody else can join the batch when every actor is already waiting
+            if pending and (len(pending) >= min(self.max_batch, len(self.connections))
+                            or time.perf_counter() >= deadline):
+                self.answer(pending)
+                pending = []
+                deadline = None
+
+    def queue_segment(self, segment):
+        while not self.stopping:
+            try:
+                self.segments.put(segment, timeout=0.1)
+                return
+            except Full:
+                pass
+
+    def answer(self, pending):
+        if self.stopping:
+            # Tells the actors to finish
+            for connection, _ in pending:
+                connection.send(None)
+            return
+        observations = np.stack([observation for _, observation in pending])
+        with self.lock, th.no_grad():
+            actions, _, log_probs = self.policy(as_tensor(observations, self.policy.device))
+            version = self.policy_version
+        self.batch_sizes.append(len(pending))
+        for (connection, _), action, log_prob in zip(pending, actions.tolist(), log_probs.tolist()):
+            connection.send((action, log_prob, version))
+
+    def stop(self, timeout=30):
+        self.stopping = True
+        self.serve_thread.join(timeout)
+        self.listener.close()
+
+
+def run_actor(address, authkey=None, env_fn=None, unroll_length=constants.UNROLL_LENGTH):
+    # Plays episodes with the actions of the inference server until it tells us to stop.
+    # Remote actors take the key from the environment, like the learner.
+    if authkey is None:
+        authkey = inference_authkey(address)
+    if env_fn is None:
+        from queue_env import make_env
+        # The policies of the actor/learner only take the map, see OBSERVATION_STATS in constants.py
+        env_fn = make_env(stats=False)
+    elif isinstance(env_fn, CloudpickleWrapper):
+        env_fn = env_fn.var
+    connection = Client(address, authkey=authkey)
+    env = env_fn()
+    try:
+        observation, _ = env.reset()
+        while True:
+            segment = {"observations": [], "actions": [], "rewards": [], "dones": [], "log_probs": []}
+            for _ in range(unroll_length):
+                connection.send(("act", observation))
+                reply = connection.recv()
+                if reply is None:
+                    return
+                action, log_prob, version = reply
+                if not segment["actions"]:
+                    segment["policy_version"] = version
+                # The bot reuses its frames, keep a copy of the one we acted on
+                segment["observations"].append(np.array(observation, copy=True))
+                observation, reward, terminated, truncated, _ = env.step(action)
+                done = terminated or truncated
+                segment["actions"].append(action)
+                segment["rewards"].append(reward)
+                segment["dones"].append(done)
+                segment["log_probs"].append(log_prob)
+                if done:
+                    observation, _ = env.reset()
+            # The value of the next observation bootstraps the end of the segment
+            segment["observations"].append(np.array(observation, copy=True))
+            connection.send(("segment", segment))
+    except (EOFError, OSError):
+        pass # the learner went away
+    finally:
+        env.close()
+        connection.close()
+
+
+def update(policy, segments):
+    # One V-trace step on a batch of segments, returns the losses
+    observations = np.stack([segment["observations"] for segment in segments]) # (B, T+1, H, W, C)
+    batch, steps = observations.shape[0], observations.shape[1] - 1
+
+    def time_major(key, dtype=th.float32):
+        return th.as_tensor(np.array([segment[key] for segment in segments]), dtype=dtype, device=policy.device).T
+
+    actions = time_major("actions", th.long)
+    rewards = time_major("rewards")
+    dones = time_major("dones")
+    behaviour_log_probs = time_major("log_probs")
+
+    acted = as_tensor(observations[:, :steps].reshape(-1, *observations.shape[2:]), policy.device)
+    values, log_probs, entropy = policy.evaluate_actions(acted, actions.T.reshape(-1))
+    values = values.reshape(batch, steps).T
+    log_probs = log_probs.reshape(batch, steps).T
+    with th.no_grad():
+        bootstrap_values = policy.predict_values(as_tensor(observations[:, steps], policy.device)).reshape(batch)
+        vs, pg_advantages = vtrace(behaviour_log_probs, log_probs, rewards, dones, values, bootstrap_values)
+
+    policy_loss = -(pg_advantages * log_probs).mean()
+    value_loss = 0.5 * ((vs - values) ** 2).mean()
+    entropy_loss = -entropy.mean()
+    loss = policy_loss + constants.VF_COEF * value_loss + constants.ENT_COEF * entropy_loss
+
+    policy.optimizer.zero_grad()
+    loss.backward()
+    th.nn.utils.clip_grad_norm_(policy.parameters(), constants.MAX_GRAD_NORM)
+    policy.optimizer.step()
+    return {"policy_loss": policy_loss.item(), "value_loss": value_loss.item(), "entropy": -entropy_loss.item()}
+
+
+class ActorLearner:
+    """The inference server, the actor processes and the learner of one training run.
+
+    env_fn builds the QueueEnv of each actor, queue_env.make_env() by default. With
+    an address, actors running on other machines may connect too.
+    """
+
+    def __init__(self, num_actors=constants.NUMBER_OF_ACTORS, env_fn=None, observation_space=None,
+                 address=constants.INFERENCE_ADDRESS, save_dir=None, log_interval=10) -> None:
+        observation_space = observation_space or constants.OBSERVATION_SPACE_ARRAY
+        self.policy = make_policy(observation_space)
+        inference_policy = make_policy(observation_space)
+        inference_policy.load_state_dict(self.policy.state_dict())
+        inference_policy.set_training_mode(False)
+        self.server = InferenceServer(inference_policy, address)
+        self.num_actors = num_actors
+        self.env_fn = env_fn
+        self.save_dir = save_dir
+        self.log_interval = log_interval
+        self.actors = []
+        self.leftover_segments = []
+        self.env_steps = 0
+        self.updates = 0
+        self.policy_lags = []
+        self.learn_time = 0.0
+
+    def start(self):
+        if self.save_dir is not None:
+            os.makedirs(self.save_dir, exist_ok=True)
+        self.server.start()
+        ctx = get_context("forkserver")
+        # Actors are forked from a server that has already imported torch and
+        # the environment, so they share those pages instead of each loading them.
+        # Raises if SharedMemoryVecEnv already started the server of this process without them.
+        start_forkserver(["actor_learner", "queue_env"])
+        wrapper = CloudpickleWrapper(self.env_fn) if self.env_fn is not None else None
+        for _ in range(self.num_actors):
+            actor = ctx.Process(target=run_actor, args=(self.server.address, self.server.authkey, wrapper),
+                                daemon=True)
+            actor.start()
+            self.actors.append(actor)
+
+    def next_batch(self, deadline):
+        # Waits for a full batch of segments, or returns None at the deadline
+        segments = self.leftover_segments
+        while len(segments) < constants.LEARNER_BATCH_SEGMENTS:
+            try:
+                segments.append(self.server.segments.get(timeout=1))
+            except Empty:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return None # what we got is kept for the next call
+                # Remote actors may still send segments, but without a deadline
+                # nothing else would end the wait once ours are gone
+                if self.actors and not any(actor.is_alive() for actor in self.actors) and not self.server.connections:
+                    codes = [actor.exitcode for actor in self.actors]
+                    raise RuntimeError(f"Every actor process exited (exit codes {codes}), no segments will come")
+        self.leftover_segments = []
+        return segments
+
+    def learn(self, total_timesteps=None, duration=None):
+        # Trains until total_timesteps more env steps were consumed or for duration seconds
+        start = time.perf_counter()
+        deadline = start + duration if duration is not None else None
+        target = self.env_steps + total_timesteps if total_timesteps is not None else None
+        while target is None or self.env_steps < target:
+            if deadline is not None and time.perf_counter() >= deadline:
+                break
+            segments = self.next_batch(deadline)
+            if segments is None:
+                break
+            losses = update(self.policy, segments)
+            self.policy_lags.extend(self.updates - segment["policy_version"] for segment in segments)
+            self.updates += 1
+            self.env_steps += sum(len(segment["actions"]) for segment in segments)
+            self.server.update_weights(self.policy.state_dict())
+            if self.updates % self.log_interval == 0:
+                print(f"Update {self.updates} | env steps {self.env_steps} | "
+                      f"policy loss {losses['policy_loss']:.3f} | value loss {losses['value_loss']:.3f} | entropy {losses['entropy']:.3f}")
+                self.save()
+        self.learn_time += time.perf_counter() - start
+
+    def save(self):
+        if self.save_dir is not None:
+            state_dict = self.policy.state_dict()
+            write_atomically(os.path.join(self.save_dir, "actor_learner_policy.pt"), lambda file: th.save(state_dict, file))
+
+    def stats(self):
+        return {
+            "updates": self.updates,
+            "learner_env_steps": self.env_steps,
+            "actor_env_steps": self.server.env_steps,
+            "learner_steps_per_sec": self.env_steps / self.learn_time if self.learn_time else 0.0,
+            "mean_inference_batch": float(np.mean(self.server.batch_sizes)) if self.server.batch_sizes else 0.0,
+            "mean_policy_lag": float(np.mean(self.policy_lags)) if self.policy_lags else 0.0,
+        }
+
+    def close(self):
+        self.save()
+        self.server.stop()
+        for actor in self.actors:
+            actor.join(10)
+            if actor.is_alive():
+                actor.terminate()
+
+
+def train_actor_learner(total_timesteps=None, **kwargs):
+    # Runs until total_timesteps env steps were consumed, or until interrupted
+    actor_learner = ActorLearner(**kwargs)
+    actor_learner.start()
+    try:
+        actor_learner.learn(total_timesteps)
+    finally:
+        actor_learner.close()
+    return actor_learner.stats()
+
+
+if __name__ == "__main__":
+    if len(sys.argv) == 4 and sys.argv[1] == "actor":
+        # Remote actor: python actor_learner.py actor LEARNER_HOST PORT
+        run_actor((sys.argv[2], int(sys.argv[3])))
+    else:
+        from main import models_dir
+        train_actor_learner(save_dir=models_dir)
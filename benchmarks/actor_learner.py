@@ -0,0 +1,108 @@
+# Scaling of the asynchronous actor/learner mode against the stand-in simulator.
+# Run from the repository root with: python -m benchmarks.actor_learner [results.jsonl [actors...]]
+#
+# For every number of actors of the sweep, an ActorLearner is started with
+# actors playing simulated games, warmed up until every actor has sent
+# experience, and then trained for a fixed wall-clock time. Reported:
+#   - env steps/s played by the actors and consumed by the learner,
+#   - mean size of the batches of the inference server,
+#   - mean policy lag (learner updates between acting and learning),
+#   - peak RSS of the learner and of the actors.
+# It first checks that, on-policy, V-trace targets reduce to the usual
+# bootstrapped discounted returns.
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+from functools import partial
+import numpy as np
+import torch as th
+
+import constants
+import simulator
+from actor_learner import ActorLearner, vtrace
+from benchmarks.training_loop import quiet_env, current_commit
+
+SWEEP_NUM_ACTORS = [1, 2, 4, 8, 16, 32]
+OBSERVATION_MODE = ("planes", 64)
+WARMUP_SECONDS = 120
+SECONDS = 30
+DEFAULT_RESULTS_FILE = "benchmark_results.jsonl"
+
+
+def check_vtrace():
+    rng = np.random.default_rng(0)
+    steps, batch, gamma = 16, 3, constants.GAMMA
+    rewards = rng.normal(size=(steps, batch))
+    dones = (rng.random((steps, batch)) < 0.1).astype(np.float64)
+    values = rng.normal(size=(steps, batch))
+    bootstrap = rng.normal(size=batch)
+    log_probs = th.as_tensor(rng.normal(size=(steps, batch)))
+    vs, _ = vtrace(log_probs, log_probs, th.as_tensor(rewards), th.as_tensor(dones),
+                   th.as_tensor(values), th.as_tensor(bootstrap), gamma=gamma)
+    expected = np.zeros((steps, batch))
+    ret = bootstrap
+    for t in reversed(range(steps)):
+        ret = rewards[t] + gamma * (1 - dones[t]) * ret
+        expected[t] = ret
+    assert np.allclose(vs.numpy(), expected), "on-policy V-trace targets differ from the discounted returns"
+
+
+def run(num_actors):
+    mode, resolution = OBSERVATION_MODE
+    space = constants.observation_space(mode, resolution)
+    bot_class = partial(simulator.SimulatedVRBot, observation_mode=mode, observation_resolution=resolution)
+    make_pool = partial(simulator.simulated_pool, bot_class=bot_class, size=1, warm_spares=1)
+    actor_learner = ActorLearner(num_actors, env_fn=quiet_env(make_pool, space), observation_space=space,
+                                 log_interval=10 ** 9)
+    actor_learner.start()
+    try:
+        # Wait for every actor to be connected and playing
+        start = time.perf_counter()
+        while time.perf_counter() - start < WARMUP_SECONDS and actor_learner.server.env_steps < num_actors * constants.UNROLL_LENGTH:
+            actor_learner.learn(duration=1)
+        actor_steps, learner_steps = actor_learner.server.env_steps, actor_learner.env_steps
+        batches = len(actor_learner.server.batch_sizes)
+        start = time.perf_counter()
+        actor_learner.learn(duration=SECONDS)
+        elapsed = time.perf_counter() - start
+        stats = actor_learner.stats()
+        batch_sizes = actor_learner.server.batch_sizes[batches:]
+    finally:
+        actor_learner.close()
+    return {
+        "num_actors": num_actors,
+        "observation_shape": list(space.shape),
+        "seconds": elapsed,
+        "actor_steps_per_sec": (stats["actor_env_steps"] - actor_steps) / elapsed,
+        "learner_steps_per_sec": (stats["learner_env_steps"] - learner_steps) / elapsed,
+        "mean_inference_batch": float(np.mean(batch_sizes)) if batch_sizes else 0.0,
+        "mean_policy_lag": stats["mean_policy_lag"],
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        "peak_actor_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024,
+    }
+
+
+def main():
+    check_vtrace()
+    print("V-trace check passed")
+    results_file = os.path.abspath(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_RESULTS_FILE)
+    commit = current_commit()
+    num_actors_sweep = [int(n) for n in sys.argv[2:]] or SWEEP_NUM_ACTORS
+    # QueueEnv writes its episode logs under models/, keep that out of the repository
+    os.chdir(tempfile.mkdtemp(prefix="actor_learner_bench_"))
+    print(f"{'actors':>6} | {'actor steps/s':>13} | {'learner steps/s':>15} | {'batch':>5} | {'lag':>5} | {'actor RSS MB':>12}")
+    for num_actors in num_actors_sweep:
+        result = run(num_actors)
+        result.update(benchmark="actor_learner", commit=commit, timestamp=time.time())
+        with open(results_file, "a") as file:
+            file.write(json.dumps(result) + "\n")
+        print(f"{num_actors:>6} | {result['actor_steps_per_sec']:>13.1f} | {result['learner_steps_per_sec']:>15.1f} | "
+              f"{result['mean_inference_batch']:>5.1f} | {result['mean_policy_lag']:>5.1f} | {result['peak_actor_rss_mb']:>12.0f}")
+    print(f"Results appended to {results_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+# Learner stall per checkpoint, synchronous model.save versus AsyncCheckpointer.
+# Run from the repository root with: python -m benchmarks.checkpointing [results.jsonl]
+#
+# For every observation mode, a PPO model is trained for a few steps against
+# the simulator (so the optimizer has its state), then saved REPEATS times:
+#   - with model.save, as train_ppo and CheckpointCallback used to,
+#   - with AsyncCheckpointer.save, waiting for the writer between two saves
+#     so that only the in-memory snapshot is measured,
+# and trained once more with a checkpoint every SAVE_FREQ steps through each
+# of the two callbacks. It also checks that the checkpoints written in the
+# background load back to the same parameters, and that the retention policy
+# keeps the expected files on disk.
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from functools import partial
+import numpy as np
+import torch as th
+
+from stable_baselines3 import PPO
+from stable_baselines3.common.callbacks import CheckpointCallback
+from stable_baselines3.common.vec_env import SubprocVecEnv
+
+import constants
+import simulator
+from callbacks import AsyncCheckpointCallback
+from checkpoints import AsyncCheckpointer, INDEX_FILE, retained
+from benchmarks.training_loop import quiet_env, current_commit
+
+OBSERVATION_MODES = [("rgb", 224), ("planes", 64)]
+REPEATS = 5
+N_STEPS = 64
+SAVE_FREQ = 64
+TRAIN_STEPS = 512
+DEFAULT_RESULTS_FILE = "benchmark_results.jsonl"
+
+
+def check_same_parameters(path_a, path_b):
+    a, b = PPO.load(path_a, device="cpu"), PPO.load(path_b, device="cpu")
+    for (name, x), (_, y) in zip(a.policy.state_dict().items(), b.policy.state_dict().items()):
+        assert th.equal(x, y), f"{name} differs between the checkpoints"
+    for x, y in zip(a.policy.optimizer.state_dict()["state"].values(), b.policy.optimizer.state_dict()["state"].values()):
+        assert all(th.equal(x[key], y[key]) for key in x), "optimizer state differs between the checkpoints"
+
+
+def check_retention(directory):
+    checkpointer = AsyncCheckpointer(directory, keep_last=2, keep_best=2)
+    model = PPO("MlpPolicy", "CartPole-v1", n_steps=16, batch_size=16)
+    rng = random.Random(0)
+    entries = []
+    for steps in range(10):
+        score = rng.random() if steps % 3 else None
+        checkpointer.save(model, f"model_{steps}.zip", steps=steps, score=score)
+        entries.append({"file": f"model_{steps}.zip", "steps": steps, "score": score})
+    checkpointer.save(model, "model.zip", prune=False)
+    checkpointer.close()
+    expected = {entry["file"] for entry in retained(entries, 2, 2)} | {"model.zip"}
+    on_disk = set(os.listdir(directory)) - {INDEX_FILE}
+    assert len(expected) == 5 and on_disk == expected, f"kept {sorted(on_disk)}, expected {sorted(expected)}"
+
+
+def timed_learn(model, callback):
+    start = time.perf_counter()
+    model.learn(total_timesteps=TRAIN_STEPS, callback=callback, reset_num_timesteps=False)
+    return time.perf_counter() - start
+
+
+def run(observation_mode, directory):
+    mode, resolution = observation_mode
+    space = constants.observation_space(mode, resolution)
+    bot_class = partial(simulator.SimulatedVRBot, observation_mode=mode, observation_resolution=resolution)
+    env = SubprocVecEnv([quiet_env(partial(simulator.simulated_pool, bot_class=bot_class), space)])
+    model = PPO("CnnPolicy", env, n_steps=N_STEPS, batch_size=32, verbose=0)
+    model.learn(total_timesteps=N_STEPS)
+
+    sync_stalls = []
+    for i in range(REPEATS):
+        start = time.perf_counter()
+        model.save(os.path.join(directory, f"sync_{i}"))
+        sync_stalls.append(time.perf_counter() - start)
+    size_mb = os.path.getsize(os.path.join(directory, "sync_0.zip")) / 2 ** 20
+
+    checkpointer = AsyncCheckpointer(directory, keep_last=REPEATS, keep_best=0)
+    for i in range(REPEATS):
+        checkpointer.save(model, f"async_{i}.zip")
+        checkpointer.wait()
+    check_same_parameters(os.path.join(directory, "sync_0.zip"), os.path.join(directory, "async_0.zip"))
+
+    sync_learn = timed_learn(model, CheckpointCallback(save_freq=SAVE_FREQ, save_path=directory, name_prefix="sync"))
+    async_learn = timed_learn(model, AsyncCheckpointCallback(SAVE_FREQ, checkpointer, name_prefix="async"))
+    checkpointer.close()
+    env.close()
+    return {
+        "observation_mode": mode,
+        "observation_shape": list(space.shape),
+        "checkpoint_mb": size_mb,
+        "sync_stall_ms": float(np.median(sync_stalls) * 1000),
+        "async_stall_ms": float(np.median(checkpointer.stalls[:REPEATS]) * 1000),
+        "async_write_ms": float(np.median(checkpointer.writes[:REPEATS]) * 1000),
+        "learn_sec_sync_checkpoints": sync_learn,
+        "learn_sec_async_checkpoints": async_learn,
+    }
+
+
+def main():
+    results_file = os.path.abspath(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_RESULTS_FILE)
+    commit = current_commit()
+    # QueueEnv writes its episode logs under models/, keep that out of the repository
+    os.chdir(tempfile.mkdtemp(prefix="checkpoint_bench_"))
+    check_retention(tempfile.mkdtemp(prefix="retention_"))
+    print("Retention check passed")
+    print(f"{'mode':>10} | {'MB':>6} | {'sync stall ms':>13} | {'async stall ms':>14} | {'async write ms':>14} | {'learn s sync':>12} | {'learn s async':>13}")
+    for observation_mode in OBSERVATION_MODES:
+        directory = tempfile.mkdtemp(prefix="checkpoints_")
+        result = run(observation_mode, directory)
+        shutil.rmtree(directory)
+        result.update(benchmark="checkpointing", commit=commit, timestamp=time.time())
+        with open(results_file, "a") as file:
+            file.write(json.dumps(result) + "\n")
+        mode = f"{observation_mode[0]} {observation_mode[1]}"
+        print(f"{mode:>10} | {result['checkpoint_mb']:>6.1f} | {result['sync_stall_ms']:>13.1f} | {result['async_stall_ms']:>14.1f} | "
+              f"{result['async_write_ms']:>14.1f} | {result['learn_sec_sync_checkpoints']:>12.1f} | {result['learn_sec_async_checkpoints']:>13.1f}")
+    print(f"Results appended to {results_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# Game time simulated per wall-clock second for the ways VRBot can wait for actions.
+# Run from the repository root with: python -m benchmarks.decision_loop
+#
+# A QueueEnv plays the stand-in simulator (simulator.py) while the learner is
+# modelled by a fixed sleep before every action. Blocking modes hold the game
+# during that time, non blocking ones keep it running (up to MAX_DECISION_LAG),
+# and action repeat keeps applying the last macro action between decisions.
+import contextlib
+import io
+import os
+import tempfile
+import time
+from functools import partial
+import numpy as np
+
+import simulator
+from queue_env import QueueEnv
+
+SECONDS = 10
+LEARNER_LATENCY = 0.01  # seconds the learner needs to pick an action
+UNITS = 50
+
+# name, decision interval (game seconds), non blocking, action repeat
+MODES = [
+    ("blocking", 0.5, False, False),
+    ("blocking + repeat", 0.5, False, True),
+    ("blocking, 2s interval", 2.0, False, False),
+    ("non blocking", 0.5, True, False),
+    ("non blocking + repeat", 0.5, True, True),
+]
+
+
+class ClockBot(simulator.SimulatedVRBot):
+    # Adds up the game time played by every bot and applies the mode being measured
+    mode = {}
+    game_seconds = 0.0
+
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.__dict__.update(self.mode)
+
+    async def on_end(self, game_result):
+        ClockBot.game_seconds += self.time
+        return await super().on_end(game_result)
+
+
+def run(decision_interval, non_blocking, action_repeat):
+    ClockBot.mode = {"decision_interval": decision_interval, "non_blocking": non_blocking,
+                     "action_repeat": action_repeat}
+    ClockBot.game_seconds = 0.0
+    config = simulator.SimulatorConfig(own_units=UNITS, enemy_units=UNITS)
+    env = QueueEnv(make_pool=partial(simulator.simulated_pool, config, bot_class=ClockBot))
+    rng = np.random.default_rng(0)
+    decisions = 0
+    lags = []
+    with contextlib.redirect_stdout(io.StringIO()) as log:
+        env.reset()
+        start = time.perf_counter()
+        while time.perf_counter() - start < SECONDS:
+            time.sleep(LEARNER_LATENCY)
+            _, _, done, _, info = env.step(int(rng.integers(6)))
+            decisions += 1
+            if done:
+                env.reset()
+            else:
+                lags.append(info["decision_lag"])
+            if decisions % 1000 == 0:
+                # Don't let the captured game log grow without bounds
+                log.seek(0)
+                log.truncate()
+        elapsed = time.perf_counter() - start
+        game_seconds = ClockBot.game_seconds + env.game.bot.time
+    env.close()
+    return game_seconds / elapsed, decisions / elapsed, float(np.mean(lags))
+
+
+def main():
+    # QueueEnv writes its episode logs under models/, keep that out of the repository
+    os.chdir(tempfile.mkdtemp(prefix="decision_bench_"))
+    print(f"learner latency {LEARNER_LATENCY * 1000:.0f} ms, {UNITS} extra units per side\n")
+    print(f"{'mode':>22} | {'game s / wall s':>15} | {'decisions/s':>11} | {'mean lag (game s)':>17}")
+    for name, *mode in MODES:
+        speed, decisions, lag = run(*mode)
+        print(f"{name:>22} | {speed:>15.1f} | {decisions:>11.1f} | {lag:>17.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+# Throughput of evaluate.py against the number of env processes.
+# Run from the repository root with: python -m benchmarks.evaluation [results.jsonl]
+#
+# Evaluates an untrained sparse_cnn model on short simulated games, the same
+# schedule with 1, 2 and 4 processes, each in a fresh Python process, and
+# reports games/hour and how many games share each forward pass. Games/hour
+# can only grow with the processes as long as there are cores to run them.
+# Also checks the confidence intervals of evaluate.py against known values, and
+# that no two games of an evaluation share their seed or play out the same,
+# which would make those intervals too narrow.
+# Env processes import this module too, so it only imports what envs need at the top.
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+import constants
+import simulator
+from evaluate import evaluate, mean_interval, wilson_interval
+
+WORKERS = [1, 2, 4]
+DIFFICULTIES = ["Easy", "Hard"]
+GAMES = 4
+GAME_SECONDS = 120
+DEFAULT_RESULTS_FILE = "benchmark_results.jsonl"
+
+
+def check_intervals():
+    # Known values of the Wilson interval at 95%
+    for (successes, n), expected in [((0, 10), (0.0, 0.2775)), ((5, 10), (0.2366, 0.7634)), ((10, 10), (0.7225, 1.0))]:
+        low, high = wilson_interval(successes, n)
+        assert abs(low - expected[0]) < 1e-3 and abs(high - expected[1]) < 1e-3, (successes, n, low, high)
+    assert wilson_interval(0, 0) is None
+    values = np.arange(10, dtype=np.float64)
+    mean, (low, high) = mean_interval(values)
+    half = 1.96 * values.std(ddof=1) / math.sqrt(len(values))
+    assert mean == 4.5 and abs(high - low - 2 * half) < 1e-9
+    assert mean_interval([3.0]) == (3.0, None)
+
+
+def check_distinct_games(records):
+    seeds = sorted(record["seed"] for record in records)
+    assert len(set(seeds)) == len(seeds), f"Games share their seeds: {seeds}"
+    trajectories = [record["trajectory_crc"] for record in records]
+    assert len(set(trajectories)) == len(trajectories), "Some games played exactly the same"
+
+
+def run(workers):
+    # Learner side imports, the env processes don't need them
+    from stable_baselines3 import PPO
+    from benchmarks.policies import RandomFrameEnv
+    from policies import policy_kwargs
+
+    model = PPO("CnnPolicy", RandomFrameEnv(constants.OBSERVATION_SPACE_ARRAY), n_steps=64,
+                policy_kwargs=policy_kwargs("sparse_cnn"), device="cpu", seed=0)
+    model.save("model.zip")
+    config = simulator.SimulatorConfig(time_limit=GAME_SECONDS)
+    result = evaluate("model.zip", constants.EVALUATION_MAPS, ["Terran"], DIFFICULTIES, GAMES, workers, config)
+    check_distinct_games(result["records"])
+    return {key: result[key] for key in ("workers", "games", "elapsed_sec", "games_per_hour", "mean_batch_size")}
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "run":
+        # One configuration, in a process of its own: python -m benchmarks.evaluation run WORKERS
+        os.chdir(tempfile.mkdtemp(prefix="evaluation_bench_"))
+        print(json.dumps(run(int(sys.argv[2]))))
+        return
+
+    from benchmarks.training_loop import current_commit
+    results_file = os.path.abspath(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_RESULTS_FILE)
+    commit = current_commit()
+    check_intervals()
+    print("Confidence intervals match the known values")
+    print(f"{GAMES * len(DIFFICULTIES)} games of {GAME_SECONDS}s on {os.cpu_count()} cores")
+    print(f"{'workers':>7} | {'seconds':>7} | {'games/hour':>10} | {'games per forward pass':>22}")
+    for workers in WORKERS:
+        output = subprocess.run([sys.executable, "-m", "benchmarks.evaluation", "run", str(workers)],
+                                check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        result.update(benchmark="evaluation", cpu_count=os.cpu_count(), game_seconds=GAME_SECONDS,
+                      commit=commit, timestamp=time.time())
+        with open(results_file, "a") as file:
+            file.write(json.dumps(result) + "\n")
+        print(f"{workers:>7} | {result['elapsed_sec']:>7.1f} | {result['games_per_hour']:>10.0f} | {result['mean_batch_size']:>22.1f}")
+    print(f"Results appended to {results_file}")
+
+
+if __name__ == "__main__":
+    main()
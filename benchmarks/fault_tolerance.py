@@ -0,0 +1,136 @@
+# Recovery of QueueEnv from games that crash or hang, by fault injection in the simulator.
+# Run from the repository root with: python -m benchmarks.fault_tolerance [results.jsonl]
+#
+# Every scenario plays random actions for SECONDS against simulated games that
+# crash or stop answering at random, while playing or while loading, and
+# reports env steps/s, the games given up on (per reason), the steps of the
+# episodes cut short and the step and reset latencies. It checks that no step
+# ever blocks for much longer than the watchdog allows (or the step timeout,
+# when the watchdog is off), that resets always get a game within
+# RESET_TIMEOUT, and that SC2Process can install its SIGINT handler from a game
+# server thread without patching burnysc2.
+import contextlib
+import io
+import json
+import os
+import signal
+import sys
+import tempfile
+import threading
+import time
+from functools import partial
+import numpy as np
+
+import simulator
+from queue_env import QueueEnv
+from sc2 import sc2process
+from benchmarks.training_loop import current_commit
+
+SECONDS = 20
+HANG_TIMEOUT = 1.0
+LOAD_TIMEOUT = 1.0
+WATCHDOG_INTERVAL = 0.2
+STEP_TIMEOUT = 3.0
+RESET_TIMEOUT = 10.0
+# name, crash and hang rates per game step, crash and hang rates per game while loading, whether the watchdog runs
+SCENARIOS = [
+    ("no faults", 0.0, 0.0, 0.0, 0.0, True),
+    ("crashes", 2e-4, 0.0, 0.0, 0.0, True),
+    ("hangs", 0.0, 2e-4, 0.0, 0.0, True),
+    ("crashes + hangs", 2e-4, 2e-4, 0.0, 0.0, True),
+    ("hangs, step timeout only", 0.0, 2e-4, 0.0, 0.0, False),
+    ("crashes while loading", 0.0, 0.0, 0.3, 0.0, True),
+    ("hangs while loading", 0.0, 0.0, 0.0, 0.3, True),
+]
+DEFAULT_RESULTS_FILE = "benchmark_results.jsonl"
+
+
+def check_signal_shim():
+    errors = []
+
+    def install():
+        try:
+            sc2process.signal.signal(signal.SIGINT, signal.SIG_DFL)
+        except ValueError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=install)
+    thread.start()
+    thread.join()
+    assert not errors, f"SIGINT handler from a thread failed: {errors[0]}"
+
+
+def run(crash_rate, hang_rate, load_crash_rate, load_hang_rate, watchdog):
+    config = simulator.SimulatorConfig(crash_rate=crash_rate, hang_rate=hang_rate,
+                                       load_crash_rate=load_crash_rate, load_hang_rate=load_hang_rate)
+    hang_timeout = HANG_TIMEOUT if watchdog else 10 ** 6
+    env = QueueEnv(make_pool=partial(simulator.simulated_pool, config, hang_timeout=hang_timeout,
+                                     load_timeout=LOAD_TIMEOUT, watchdog_interval=WATCHDOG_INTERVAL))
+    env.step_timeout = STEP_TIMEOUT
+    # A lost warm permit would make every later reset wait until this timeout and raise
+    env.reset_timeout = RESET_TIMEOUT
+    rng = np.random.default_rng(0)
+    latencies = []
+    reset_latencies = []
+    steps = episodes = truncated_episodes = 0
+    with contextlib.redirect_stdout(io.StringIO()) as log:
+        _, info = env.reset()
+        reset_latencies.append(info["reset_latency"])
+        start = time.perf_counter()
+        while time.perf_counter() - start < SECONDS:
+            step_start = time.perf_counter()
+            _, _, done, truncated, info = env.step(int(rng.integers(6)))
+            latencies.append(time.perf_counter() - step_start)
+            steps += 1
+            if truncated:
+                assert "game_failure" in info
+                truncated_episodes += 1
+            if done or truncated:
+                episodes += 1
+                _, info = env.reset()
+                reset_latencies.append(info["reset_latency"])
+            if steps % 1000 == 0:
+                # Don't let the captured game log grow without bounds
+                log.seek(0)
+                log.truncate()
+        elapsed = time.perf_counter() - start
+        restarts = dict(env.pool.restarts)
+        env.close()
+    bound = (HANG_TIMEOUT + WATCHDOG_INTERVAL if watchdog else STEP_TIMEOUT) + 0.5
+    assert max(latencies) < bound, f"a step blocked for {max(latencies):.2f}s"
+    assert truncated_episodes == env.restarts
+    return {
+        "steps_per_sec": steps / elapsed,
+        "episodes": episodes,
+        "truncated_episodes": truncated_episodes,
+        "server_restarts": restarts,
+        "lost_steps": env.lost_steps,
+        "step_p99_ms": float(np.percentile(latencies, 99) * 1000),
+        "step_max_ms": float(max(latencies) * 1000),
+        "reset_max_ms": float(max(reset_latencies) * 1000),
+    }
+
+
+def main():
+    results_file = os.path.abspath(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_RESULTS_FILE)
+    commit = current_commit()
+    check_signal_shim()
+    print("SIGINT shim check passed")
+    # QueueEnv writes its episode logs under models/, keep that out of the repository
+    os.chdir(tempfile.mkdtemp(prefix="fault_bench_"))
+    print(f"{'scenario':>24} | {'steps/s':>7} | {'episodes':>8} | {'truncated':>9} | {'crashed':>7} | {'hung':>4} | {'abandoned':>9} | {'lost steps':>10} | {'max step ms':>11} | {'max reset ms':>12}")
+    for name, crash_rate, hang_rate, load_crash_rate, load_hang_rate, watchdog in SCENARIOS:
+        result = run(crash_rate, hang_rate, load_crash_rate, load_hang_rate, watchdog)
+        result.update(benchmark="fault_tolerance", scenario=name, crash_rate=crash_rate, hang_rate=hang_rate,
+                      load_crash_rate=load_crash_rate, load_hang_rate=load_hang_rate,
+                      commit=commit, timestamp=time.time())
+        with open(results_file, "a") as file:
+            file.write(json.dumps(result) + "\n")
+        restarts = result["server_restarts"]
+        print(f"{name:>24} | {result['steps_per_sec']:>7.0f} | {result['episodes']:>8} | {result['truncated_episodes']:>9} | "
+              f"{restarts['crashed']:>7} | {restarts['hung']:>4} | {restarts['abandoned']:>9} | {result['lost_steps']:>10} | {result['step_max_ms']:>11.0f} | {result['reset_max_ms']:>12.0f}")
+    print(f"Results appended to {results_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# Overhead of the perf instrumentation, disabled and enabled.
+# Run from the repository root with: python -m benchmarks.instrumentation
+#
+# First times the bare `with perf.timed(...)` blocks, then plays the same
+# stand-in game (simulator.py) with instrumentation off and on and compares
+# the on_step throughput.
+import asyncio
+import contextlib
+import io
+import time
+from queue import Queue
+import numpy as np
+
+import perf
+from action_channel import ActionChannel
+import simulator
+
+CALLS = 1_000_000
+ITERATIONS = 3000
+REPEATS = 4
+
+
+def time_blocks():
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        pass
+    baseline = time.perf_counter() - start
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        with perf.timed("bench/block"):
+            pass
+    return (time.perf_counter() - start - baseline) / CALLS * 1e9
+
+
+async def play(iterations):
+    # Drives the bot directly, with every action queued in advance
+    rng = np.random.default_rng(0)
+    bot = simulator.SimulatedVRBot(action_in=ActionChannel(), result_out=Queue())
+    for action in rng.integers(0, 6, iterations):
+        bot.action_in.put(int(action))
+    game = simulator.SimulatedGame(bot, simulator.SimulatorConfig(own_units=50, enemy_units=50))
+    bot.simulation = game
+    await bot.on_start()
+    start = time.perf_counter()
+    for iteration in range(iterations):
+        game.prepare(bot)
+        await bot.on_step(iteration)
+        # Drop the results as the env would, so the queue doesn't keep every frame alive
+        while not bot.result_out.empty():
+            bot.result_out.get()
+        game.advance()
+    return iterations / (time.perf_counter() - start)
+
+
+def steps_per_second():
+    # Alternates off and on runs and keeps the best of each, as the machine drifts between runs
+    rates = {False: 0.0, True: 0.0}
+    with contextlib.redirect_stdout(io.StringIO()):
+        for _ in range(REPEATS):
+            for enabled in rates:
+                perf.enable(enabled)
+                rates[enabled] = max(rates[enabled], asyncio.run(play(ITERATIONS)))
+    perf.enable(False)
+    return rates[False], rates[True], perf.drain()
+
+
+def main():
+    for enabled in (False, True):
+        perf.enable(enabled)
+        print(f"timed() block, instrumentation {'on ' if enabled else 'off'}: {time_blocks():7.1f} ns per block")
+    perf.drain()
+    off, on, histograms = steps_per_second()
+    print(f"on_step/s with instrumentation off: {off:8.1f}")
+    print(f"on_step/s with instrumentation on:  {on:8.1f} ({(off / on - 1) * 100:+.1f}% time per step)")
+    print()
+    for stage, histogram in sorted(histograms.items()):
+        summary = perf.summarize(histogram)
+        print(f"{stage:28s} calls {summary['calls']:7d}  mean {summary['mean_ms']:7.3f} ms  "
+              f"p50 {summary['p50_ms']:7.3f}  p99 {summary['p99_ms']:7.3f}  max {summary['max_ms']:7.3f}")
+
+
+if __name__ == "__main__":
+    main()
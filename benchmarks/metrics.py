@@ -0,0 +1,132 @@
+# Cost of logging episodes and of keeping rolling statistics over them.
+# Run from the repository root with: python -m benchmarks.metrics [results.jsonl]
+#
+# Compares, per episode, the old per-episode CSV append of QueueEnv with
+# MetricsWriter, then grows the logs of NUM_ENVS envs to TOTAL_EPISODES
+# episodes and measures after every increment:
+#   - an incremental MetricsTailer.poll() + RollingStats.update(),
+#   - reloading the whole CSV with pandas, as reward_plotter.py used to.
+# The rolling statistics are checked against numpy on the full data.
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+import pandas as pd
+
+from metrics import MetricsWriter, MetricsTailer, RollingStats, RESULTS
+from benchmarks.training_loop import current_commit
+
+NUM_ENVS = 8
+TOTAL_EPISODES = 1_000_000
+INCREMENTS = 5
+APPEND_EPISODES = 20_000
+WINDOW = 1000
+DEFAULT_RESULTS_FILE = "benchmark_results.jsonl"
+
+
+def episodes(rng, n):
+    return {
+        "reward": rng.normal(0, 300, n),
+        "length": rng.integers(100, 4000, n),
+        "result": rng.choice(RESULTS, n),
+        "duration": rng.uniform(10, 600, n),
+    }
+
+
+def csv_append(path, rewards):
+    # What QueueEnv.step did at the end of every episode
+    for reward in rewards:
+        with open(path, 'a', newline='') as file:
+            writer = csv.writer(file)
+            if file.tell() == 0:
+                writer.writerow(["Total Episode Reward"])
+            writer.writerow([reward])
+
+
+def append_cost(root, rng):
+    data = episodes(rng, APPEND_EPISODES)
+    start = time.perf_counter()
+    csv_append(os.path.join(root, "append.csv"), data["reward"])
+    csv_us = (time.perf_counter() - start) / APPEND_EPISODES * 1e6
+    writer = MetricsWriter(os.path.join(root, "append"))
+    start = time.perf_counter()
+    for reward, length, result, duration in zip(data["reward"], data["length"], data["result"], data["duration"]):
+        writer.append(reward, length, result, duration)
+    writer.close()
+    return csv_us, (time.perf_counter() - start) / APPEND_EPISODES * 1e6
+
+
+def check(stats, rewards, results):
+    summary = stats.summary()
+    victory = RESULTS.index("Victory")
+    assert summary["episodes"] == len(rewards)
+    assert np.isclose(summary["mean_reward"], rewards.mean()) and np.isclose(summary["std_reward"], rewards.std())
+    assert np.isclose(summary["window_mean_reward"], rewards[-WINDOW:].mean())
+    assert np.isclose(summary["win_rate"], np.mean(results == victory))
+    assert np.isclose(summary["window_win_rate"], np.mean(results[-WINDOW:] == victory))
+
+
+def main():
+    results_file = os.path.abspath(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_RESULTS_FILE)
+    root = tempfile.mkdtemp(prefix="metrics_bench_")
+    rng = np.random.default_rng(0)
+    csv_us, writer_us = append_cost(root, rng)
+    print(f"Per episode: CSV append {csv_us:.1f} us, MetricsWriter {writer_us:.1f} us")
+
+    logs = os.path.join(root, "metrics")
+    writers = [MetricsWriter(os.path.join(logs, f"env_{i}"), flush_episodes=4096) for i in range(NUM_ENVS)]
+    csv_path = os.path.join(root, "episode_rewards.csv")
+    with open(csv_path, "w") as file:
+        file.write("Total Episode Reward\n")
+    tailer = MetricsTailer(logs)
+    stats = RollingStats(WINDOW)
+    all_rewards, all_results = [], []
+    end_time = time.time()
+    rows = []
+    print(f"{'episodes':>9} | {'new':>7} | {'tail + update ms':>16} | {'pandas reload ms':>16}")
+    for _ in range(INCREMENTS):
+        n = TOTAL_EPISODES // INCREMENTS
+        data = episodes(rng, n)
+        # Envs end their episodes in turn, one second apart
+        end_times = end_time + np.arange(n)
+        end_time += n
+        for i, writer in enumerate(writers):
+            for j in range(i, n, NUM_ENVS):
+                writer.append(data["reward"][j], data["length"][j], data["result"][j], data["duration"][j], end_time=end_times[j])
+            writer.flush()
+        with open(csv_path, "a") as file:
+            file.write("\n".join(map(repr, data["reward"].tolist())) + "\n")
+        all_rewards.append(data["reward"])
+        all_results.append(np.array([RESULTS.index(result) for result in data["result"]]))
+
+        start = time.perf_counter()
+        new = tailer.poll()
+        stats.update(new)
+        summary = stats.summary()
+        tail_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        reloaded = pd.read_csv(csv_path)
+        reloaded["Total Episode Reward"].rolling(WINDOW).mean()
+        reload_ms = (time.perf_counter() - start) * 1000
+        check(stats, np.concatenate(all_rewards), np.concatenate(all_results))
+        rows.append({"episodes": summary["episodes"], "new_episodes": len(new["reward"]), "tail_ms": tail_ms, "pandas_reload_ms": reload_ms})
+        print(f"{summary['episodes']:>9} | {len(new['reward']):>7} | {tail_ms:>16.1f} | {reload_ms:>16.1f}")
+
+    # Polling without new episodes only stats the files
+    start = time.perf_counter()
+    tailer.poll()
+    idle_ms = (time.perf_counter() - start) * 1000
+    print(f"Idle poll: {idle_ms:.2f} ms. Rolling statistics match numpy on the full data")
+
+    result = {"benchmark": "metrics", "csv_append_us": csv_us, "writer_append_us": writer_us, "idle_poll_ms": idle_ms,
+              "increments": rows, "commit": current_commit(), "timestamp": time.time()}
+    with open(results_file, "a") as file:
+        file.write(json.dumps(result) + "\n")
+    print(f"Results appended to {results_file}")
+
+
+if __name__ == "__main__":
+    main()
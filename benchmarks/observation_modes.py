@@ -0,0 +1,108 @@
+# Cost of every observation mode for the bots and for the learner.
+# Run from the repository root with: python -m benchmarks.observation_modes
+#
+# For every mode and resolution (see OBSERVATION_MODE in constants.py):
+#   - the time VRBot.visualize_intel takes on a busy stand-in game,
+#   - the memory the PPO rollout buffer of train_ppo needs for the observations,
+#   - the learner throughput: policy forward passes while collecting, and
+#     forward + backward passes while training, on a CnnPolicy.
+import contextlib
+import io
+import time
+from queue import Queue
+import gymnasium as gym
+import numpy as np
+
+from stable_baselines3 import PPO
+from stable_baselines3.common.buffers import RolloutBuffer
+from stable_baselines3.common.callbacks import BaseCallback
+
+import constants
+import simulator
+from action_channel import ActionChannel
+
+MODES = [("rgb", 224), ("planes", 96), ("planes", 64)]
+UNITS = 100
+RENDER_REPEATS = 200
+# PPO settings of train_ppo
+TRAIN_N_STEPS = 256
+# Kept small, a single CPU core trains the large frames slowly
+N_STEPS = 64
+BATCH_SIZE = 32
+
+
+class StillEnv(gym.Env):
+    # Observations of the right shape, the content doesn't change the cost of the CNN
+    def __init__(self, observation_space):
+        self.observation_space = observation_space
+        self.action_space = gym.spaces.Discrete(constants.NUMBER_OF_ACTIONS)
+        self.observation = np.random.default_rng(0).integers(0, 256, observation_space.shape, dtype=np.uint8)
+
+    def reset(self, *, seed=None, options=None):
+        return self.observation, {}
+
+    def step(self, action):
+        return self.observation, 0.0, False, False, {}
+
+
+class LearnerTimer(BaseCallback):
+    def _on_training_start(self):
+        self.rollout_time = 0.0
+        self.start = time.perf_counter()
+
+    def _on_rollout_start(self):
+        self.rollout_start = time.perf_counter()
+
+    def _on_rollout_end(self):
+        self.rollout_time += time.perf_counter() - self.rollout_start
+
+    def _on_step(self):
+        return True
+
+    def _on_training_end(self):
+        self.train_time = time.perf_counter() - self.start - self.rollout_time
+
+
+def render_ms(mode, resolution):
+    bot = simulator.SimulatedVRBot(action_in=ActionChannel(), result_out=Queue(),
+                                   observation_mode=mode, observation_resolution=resolution)
+    game = simulator.SimulatedGame(bot, simulator.SimulatorConfig(own_units=UNITS, enemy_units=UNITS))
+    bot.simulation = game
+    game.prepare(bot)
+    best = float("inf")
+    for _ in range(RENDER_REPEATS):
+        # A new step, whose unit tables are not gathered yet
+        bot.current_snapshot = None
+        start = time.perf_counter()
+        bot.visualize_intel()
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def rollout_buffer_mb(space):
+    # train_ppo's buffer holds n_steps observations for every env, stored in the buffer's own dtype
+    buffer = RolloutBuffer(1, space, gym.spaces.Discrete(constants.NUMBER_OF_ACTIONS), n_envs=1)
+    per_observation = buffer.observations.nbytes
+    return per_observation * TRAIN_N_STEPS * constants.NUMBER_OF_CONCURRENT_EXECUTIONS / 2 ** 20
+
+
+def learner_steps_per_second(space):
+    model = PPO("CnnPolicy", StillEnv(space), n_steps=N_STEPS, batch_size=BATCH_SIZE, n_epochs=1, verbose=0)
+    timer = LearnerTimer()
+    model.learn(total_timesteps=N_STEPS, callback=timer)
+    return N_STEPS / timer.rollout_time, N_STEPS / timer.train_time
+
+
+def main():
+    print(f"{'mode':>6} | {'shape':>13} | {'render ms':>9} | {'rollout buffer MB':>17} | {'collect steps/s':>15} | {'train samples/s':>15}")
+    for mode, resolution in MODES:
+        space = constants.observation_space(mode, resolution)
+        with contextlib.redirect_stdout(io.StringIO()):
+            render = render_ms(mode, resolution)
+        collect, train = learner_steps_per_second(space)
+        shape = "x".join(map(str, space.shape))
+        print(f"{mode:>6} | {shape:>13} | {render:>9.3f} | {rollout_buffer_mb(space):>17.0f} | {collect:>15.1f} | {train:>15.1f}")
+
+
+if __name__ == "__main__":
+    main()
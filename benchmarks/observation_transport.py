@@ -0,0 +1,101 @@
+# Throughput of the observation transport between the env workers and the learner.
+# Run from the repository root with: python -m benchmarks.observation_transport
+#
+# Compares the original path (int32 conversions in QueueEnv.step, pickled
+# through SubprocVecEnv's pipes) against uint8 frames through SubprocVecEnv and
+# against SharedMemoryVecEnv, using a synthetic environment that draws a sparse
+# frame like VRBot.visualize_intel does.
+import pickle
+import time
+import numpy as np
+import gymnasium as gym
+from gymnasium.spaces import Discrete
+
+from stable_baselines3.common.vec_env import SubprocVecEnv
+
+import constants
+from shm_vec_env import SharedMemoryVecEnv
+
+NUM_ENVS = [1, 4, 8]
+STEPS = 2000
+PIXELS_PER_FRAME = 400
+EPISODE_LENGTH = 500
+
+
+class FrameEnv(gym.Env):
+    def __init__(self, legacy=False):
+        super().__init__()
+        self.action_space = Discrete(constants.NUMBER_OF_ACTIONS)
+        self.observation_space = constants.OBSERVATION_SPACE_ARRAY
+        self.legacy = legacy
+        self.rng = np.random.default_rng(0)
+        self.frame = np.zeros(self.observation_space.shape, dtype=np.uint8)
+        self.obs_target = None
+        self.steps = 0
+
+    def render_frame(self):
+        obs = self.obs_target if self.obs_target is not None else self.frame
+        obs.fill(0)
+        ys = self.rng.integers(0, obs.shape[0], PIXELS_PER_FRAME)
+        xs = self.rng.integers(0, obs.shape[1], PIXELS_PER_FRAME)
+        obs[ys, xs] = self.rng.integers(0, 256, (PIXELS_PER_FRAME, obs.shape[2]), dtype=np.uint8)
+        return obs
+
+    def step(self, action):
+        self.steps += 1
+        obs = self.render_frame()
+        if self.legacy:
+            # The conversions QueueEnv.step used to do
+            obs = obs.astype(np.int32)
+            obs = np.clip(obs, 0, np.inf).astype(np.int32)
+        return obs, 0.0, self.steps % EPISODE_LENGTH == 0, False, {}
+
+    def reset(self, *, seed=None, options=None):
+        obs = self.obs_target if self.obs_target is not None else self.frame
+        obs.fill(0)
+        return obs, {}
+
+
+def make_frame_env(legacy):
+    def _init():
+        return FrameEnv(legacy)
+    return _init
+
+
+def estimated_pipe_bytes(legacy):
+    # Bytes copied per env and step on the SubprocVecEnv path: the conversions
+    # in the worker, pickling, unpickling and stacking in the learner.
+    env = FrameEnv(legacy)
+    env.reset()
+    obs = env.step(0)[0]
+    conversions = 2 * obs.nbytes if legacy else 0
+    payload = len(pickle.dumps(obs, protocol=pickle.HIGHEST_PROTOCOL))
+    return conversions + 2 * payload + obs.nbytes
+
+
+def run(vec_env):
+    vec_env.reset()
+    actions = np.zeros(vec_env.num_envs, dtype=np.int64)
+    start = time.perf_counter()
+    for _ in range(STEPS):
+        vec_env.step(actions)
+    elapsed = time.perf_counter() - start
+    bytes_per_step = getattr(vec_env, "bytes_copied", None)
+    vec_env.close()
+    return STEPS * vec_env.num_envs / elapsed, bytes_per_step
+
+
+def main():
+    print(f"{'envs':>5} | {'transport':<22} | {'env steps/s':>12} | {'bytes copied/step':>18}")
+    for n in NUM_ENVS:
+        for name, legacy in (("pipes, int32 (legacy)", True), ("pipes, uint8", False)):
+            sps, _ = run(SubprocVecEnv([make_frame_env(legacy) for _ in range(n)]))
+            print(f"{n:>5} | {name:<22} | {sps:>12.0f} | {estimated_pipe_bytes(legacy) * n:>17}~")
+        vec_env = SharedMemoryVecEnv([make_frame_env(False) for _ in range(n)], constants.OBSERVATION_SPACE_ARRAY)
+        sps, copied = run(vec_env)
+        print(f"{n:>5} | {'shared memory':<22} | {sps:>12.0f} | {copied / STEPS:>18.0f}")
+    print("~ estimated from the pickled payload size; shared memory bytes are counted by SharedMemoryVecEnv.")
+
+
+if __name__ == "__main__":
+    main()
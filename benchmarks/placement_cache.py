@@ -0,0 +1,85 @@
+# Game API round trips per decision with and without the placement/expansion caches.
+# Run from the repository root with: python -m benchmarks.placement_cache
+#
+# The same stand-in games (simulator.py) are played by VRBot and by a bot whose
+# caches never hit, with action 0 (expand) making up most of the actions as
+# in our training runs. Games are played one after the other on the same map,
+# like in a GamePool, so the expansion distances carry over between them.
+# The stand-in answers queries instantly, so the time they would cost against
+# SC2 is estimated from ROUND_TRIP_MS.
+import asyncio
+import contextlib
+import io
+import random
+from queue import Queue
+import numpy as np
+
+import simulator
+import VoidRayBot
+from action_channel import ActionChannel
+
+GAMES = 4
+STEPS = 1000 # at most, per game
+ROUND_TRIP_MS = 2.0
+ACTION_PROBABILITIES = [0.4, 0.15, 0.15, 0.1, 0.15, 0.05]
+
+
+class UncachedBot(simulator.SimulatedVRBot):
+    # Queries the game every time, like BotAI.build and BotAI.get_next_expansion
+
+    async def cached_placement(self, building, near):
+        self.placements.clear()
+        return await super().cached_placement(building, near)
+
+    async def next_expansion(self):
+        VoidRayBot.EXPANSION_DISTANCES.clear()
+        return await super().next_expansion()
+
+
+async def play(bot_class, actions, seed, totals):
+    bot = bot_class(action_in=ActionChannel(), result_out=Queue())
+    for action in actions:
+        bot.action_in.put(int(action))
+    game = simulator.SimulatedGame(bot, simulator.SimulatorConfig(seed=seed), seed=seed)
+    bot.simulation = game
+    random.seed(seed)
+    await bot.on_start()
+    decisions = 0
+    for iteration in range(10 * len(actions)):
+        game.prepare(bot)
+        await game.issue_events(bot)
+        await bot.on_step(iteration)
+        while not bot.result_out.empty():
+            info = bot.result_out.get()["info"]
+            decisions += 1
+            totals["decisions"] += 1
+            totals["api_round_trips"] += info["api_round_trips"]
+            totals["cache_hits"] += info["cache_hits"]
+        game.advance()
+        if game.result() is not None or decisions == len(actions):
+            break
+
+
+def play_games(bot_class):
+    VoidRayBot.EXPANSION_DISTANCES.clear()
+    totals = {"decisions": 0, "api_round_trips": 0, "cache_hits": 0}
+    for seed in range(GAMES):
+        actions = np.random.default_rng(seed).choice(6, size=STEPS, p=ACTION_PROBABILITIES)
+        asyncio.run(play(bot_class, actions, seed, totals))
+    return totals
+
+
+def main():
+    print(f"{GAMES} games, {ROUND_TRIP_MS:.0f} ms per round trip to the game\n")
+    print(f"{'bot':>8} | {'decisions':>9} | {'round trips/game':>16} | {'cache hits/game':>15} | {'est. ms/decision':>16}")
+    for name, bot_class in (("uncached", UncachedBot), ("cached", simulator.SimulatedVRBot)):
+        with contextlib.redirect_stdout(io.StringIO()):
+            totals = play_games(bot_class)
+        decisions = totals["decisions"]
+        trips = totals["api_round_trips"]
+        print(f"{name:>8} | {decisions:>9} | {trips / GAMES:>16.1f} | {totals['cache_hits'] / GAMES:>15.1f} | "
+              f"{trips * ROUND_TRIP_MS / decisions:>16.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+# CPU cost and learning of the policy networks of policies.py against the default CnnPolicy.
+# Run from the repository root with: python -m benchmarks.policies [results.jsonl] [learning timesteps]
+#
+# For every network and observation mode, measures on CPU:
+#   - inference latency of the policy (action, value and log prob) per batch size,
+#   - time of one PPO epoch over a rollout of ROLLOUT_STEPS with train_ppo's minibatch size,
+# then trains PPO for a while on simulated games with each network on the default
+# "rgb" observations, and reports the mean episode reward over training (the learning curve).
+import json
+import os
+import sys
+import tempfile
+import time
+from functools import partial
+import numpy as np
+import torch as th
+
+from stable_baselines3 import PPO
+from stable_baselines3.common.callbacks import BaseCallback
+from stable_baselines3.common.vec_env import SubprocVecEnv, VecTransposeImage
+
+import constants
+import simulator
+from queue_env import QueueEnv
+from policies import policy_kwargs, policy_name
+from shm_vec_env import SharedMemoryVecEnv
+from benchmarks.training_loop import current_commit
+
+NETWORKS = ["nature_cnn", "sparse_cnn"]
+OBSERVATION_MODES = [("rgb", 224), ("planes", 64)]
+BATCH_SIZES = [1, 8, 32]
+INFERENCE_REPEATS = 50
+ROLLOUT_STEPS = 256
+MINIBATCH = 32
+EPOCH_REPEATS = 3
+# Learning curves, on games of 5 minutes instead of 30 so that episodes end more often
+LEARNING_CURVES = [("nature_cnn", False), ("sparse_cnn", False), ("sparse_cnn", True)]
+LEARNING_TIMESTEPS = 8192
+LEARNING_ENVS = 2
+LEARNING_GAME_SECONDS = 300
+CURVE_POINTS = 4
+DEFAULT_RESULTS_FILE = "benchmark_results.jsonl"
+
+
+def sparse_frames(rng, space, n):
+    # Mostly empty frames with a few hundred unit pixels, like the ones VRBot draws
+    frames = np.zeros((n,) + space.shape, dtype=np.uint8)
+    height, width = space.shape[:2]
+    for frame in frames:
+        ys, xs = rng.integers(height, size=300), rng.integers(width, size=300)
+        frame[ys, xs] = rng.integers(1, 256, size=(300, space.shape[2]))
+    return frames
+
+
+def make_model(network, space, env=None):
+    if env is None:
+        env = RandomFrameEnv(space)
+    return PPO(policy_name(False), env, n_steps=ROLLOUT_STEPS, batch_size=MINIBATCH, n_epochs=1,
+               policy_kwargs=policy_kwargs(network), device="cpu", verbose=0)
+
+
+class RandomFrameEnv(QueueEnv):
+    # Serves sparse_frames without any game, to fill the rollout buffer quickly
+    def __init__(self, space):
+        super().__init__(observation_space=space, stats=False)
+        self.rng = np.random.default_rng(0)
+        self.frames = sparse_frames(self.rng, space, 16)
+
+    def reset(self, *, seed=None, options=None):
+        return self.frames[0], {}
+
+    def step(self, action):
+        return self.frames[self.rng.integers(len(self.frames))], float(self.rng.normal()), False, False, {}
+
+
+def inference(network, space, rng):
+    model = make_model(network, space)
+    policy = model.policy
+    policy.set_training_mode(False)
+    results = {}
+    for batch_size in BATCH_SIZES:
+        frames = sparse_frames(rng, space, batch_size)
+        # What PPO.collect_rollouts does with the frames of the envs
+        observations = VecTransposeImage.transpose_image(frames)
+        times = []
+        for _ in range(INFERENCE_REPEATS):
+            start = time.perf_counter()
+            with th.no_grad():
+                policy(th.as_tensor(observations))
+            times.append(time.perf_counter() - start)
+        results[batch_size] = float(np.median(times) * 1000)
+    return model, results
+
+
+def epoch_time(model):
+    # Fills the rollout buffer once, then times PPO.train() with n_epochs=1 on it
+    model.learn(ROLLOUT_STEPS)
+    times = []
+    for _ in range(EPOCH_REPEATS):
+        start = time.perf_counter()
+        model.train()
+        times.append(time.perf_counter() - start)
+    return float(np.median(times) * 1000)
+
+
+class CurveCallback(BaseCallback):
+    def __init__(self):
+        super().__init__()
+        self.episodes = [] # (timestep, episode reward, seconds since the start)
+
+    def _on_training_start(self):
+        self.start = time.perf_counter()
+        self.rewards = np.zeros(self.training_env.num_envs)
+
+    def _on_step(self):
+        self.rewards += self.locals["rewards"]
+        for i, done in enumerate(self.locals["dones"]):
+            if done:
+                self.episodes.append((self.num_timesteps, float(self.rewards[i]), time.perf_counter() - self.start))
+                self.rewards[i] = 0
+        return True
+
+    def _on_training_end(self):
+        self.elapsed = time.perf_counter() - self.start
+
+
+def quiet_env(make_pool, stats):
+    def _init():
+        sys.stdout = open(os.devnull, "w")
+        return QueueEnv(make_pool=make_pool, stats=stats)
+    return _init
+
+
+def learning_curve(network, stats, timesteps):
+    config = simulator.SimulatorConfig(time_limit=LEARNING_GAME_SECONDS)
+    env_fns = [quiet_env(partial(simulator.simulated_pool, config), stats) for _ in range(LEARNING_ENVS)]
+    if stats:
+        env = SubprocVecEnv(env_fns)
+    else:
+        env = SharedMemoryVecEnv(env_fns, constants.OBSERVATION_SPACE_ARRAY)
+    # train_ppo's settings
+    model = PPO(policy_name(stats), env, n_steps=ROLLOUT_STEPS, batch_size=MINIBATCH,
+                policy_kwargs=policy_kwargs(network), device="cpu", seed=0, verbose=0)
+    callback = CurveCallback()
+    model.learn(total_timesteps=timesteps, callback=callback)
+    env.close()
+    episodes = np.array(callback.episodes).reshape(-1, 3)
+    points = []
+    edges = np.linspace(0, model.num_timesteps, CURVE_POINTS + 1)
+    for low, high in zip(edges[:-1], edges[1:]):
+        rewards = episodes[(episodes[:, 0] > low) & (episodes[:, 0] <= high), 1]
+        ended = episodes[episodes[:, 0] <= high, 2]
+        points.append({"timesteps": int(high), "episodes": len(rewards),
+                       "mean_reward": float(rewards.mean()) if len(rewards) else None,
+                       "seconds": float(ended.max()) if len(ended) else None})
+    return {"timesteps": model.num_timesteps, "steps_per_sec": model.num_timesteps / callback.elapsed, "curve": points}
+
+
+def main():
+    results_file = os.path.abspath(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_RESULTS_FILE)
+    learning_timesteps = int(sys.argv[2]) if len(sys.argv) > 2 else LEARNING_TIMESTEPS
+    commit = current_commit()
+    # QueueEnv writes its episode logs under models/, keep that out of the repository
+    os.chdir(tempfile.mkdtemp(prefix="policies_bench_"))
+    th.set_num_threads(1)
+    rng = np.random.default_rng(0)
+
+    batches = " | ".join(f"{f'batch {n} ms':>11}" for n in BATCH_SIZES)
+    print(f"{'network':>10} | {'mode':>10} | {'params':>9} | {batches} | {'epoch ms':>8}")
+    for mode, resolution in OBSERVATION_MODES:
+        space = constants.observation_space(mode, resolution)
+        for network in NETWORKS:
+            model, latencies = inference(network, space, rng)
+            epoch_ms = epoch_time(model)
+            params = sum(p.numel() for p in model.policy.parameters())
+            result = {"benchmark": "policies", "network": network, "observation_mode": mode,
+                      "observation_shape": list(space.shape), "parameters": params,
+                      "inference_ms": latencies, "epoch_ms": epoch_ms, "rollout_steps": ROLLOUT_STEPS,
+                      "minibatch": MINIBATCH, "commit": commit, "timestamp": time.time()}
+            with open(results_file, "a") as file:
+                file.write(json.dumps(result) + "\n")
+            batches = " | ".join(f"{latencies[n]:>11.2f}" for n in BATCH_SIZES)
+            print(f"{network:>10} | {f'{mode} {resolution}':>10} | {params:>9} | {batches} | {epoch_ms:>8.0f}")
+
+    print(f"Learning curves, mean episode reward per {learning_timesteps // CURVE_POINTS} steps:")
+    for network, stats in LEARNING_CURVES:
+        result = learning_curve(network, stats, learning_timesteps)
+        result.update(benchmark="policies_learning", network=network, stats=stats, commit=commit, timestamp=time.time())
+        with open(results_file, "a") as file:
+            file.write(json.dumps(result) + "\n")
+        name = network + (" + stats" if stats else "")
+        curve = " ".join(f"{point['mean_reward']:>7.1f}" if point["mean_reward"] is not None else f"{'-':>7}"
+                         for point in result["curve"])
+        print(f"{name:>18} | {result['steps_per_sec']:>6.1f} steps/s | {curve}")
+    print(f"Results appended to {results_file}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+# Stress test of the QueueEnv -> VRBot loop against the stand-in simulator.
+# Run from the repository root with: python -m benchmarks.simulator
+#
+# Plays random actions for a fixed wall-clock time per configuration and
+# reports env steps/s, on_step calls/s and peak RSS, without any SC2 binary.
+import contextlib
+import io
+import os
+import resource
+import tempfile
+import time
+from functools import partial
+import numpy as np
+
+import simulator
+from queue_env import QueueEnv
+
+UNIT_COUNTS = [0, 100, 500, 1000]
+SECONDS = 10
+
+
+class CountingBot(simulator.SimulatedVRBot):
+    # Counts the on_step calls of every game
+    calls = 0
+
+    async def on_step(self, iteration):
+        CountingBot.calls += 1
+        return await super().on_step(iteration)
+
+
+def run(units):
+    config = simulator.SimulatorConfig(own_units=units, enemy_units=units)
+    env = QueueEnv(make_pool=partial(simulator.simulated_pool, config, bot_class=CountingBot))
+    rng = np.random.default_rng(0)
+    CountingBot.calls = 0
+    steps = 0
+    episodes = 0
+    with contextlib.redirect_stdout(io.StringIO()) as log:
+        env.reset()
+        start = time.perf_counter()
+        while time.perf_counter() - start < SECONDS:
+            _, _, done, _, _ = env.step(int(rng.integers(6)))
+            steps += 1
+            if done:
+                episodes += 1
+                env.reset()
+            if steps % 1000 == 0:
+                # Don't let the captured game log grow without bounds
+                log.seek(0)
+                log.truncate()
+        elapsed = time.perf_counter() - start
+    env.close()
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return steps / elapsed, CountingBot.calls / elapsed, episodes, rss
+
+
+def main():
+    # QueueEnv writes its episode logs under models/, keep that out of the repository
+    os.chdir(tempfile.mkdtemp(prefix="sim_bench_"))
+    print(f"{'extra units':>11} | {'env steps/s':>11} | {'on_step/s':>9} | {'episodes':>8} | {'peak RSS MB':>11}")
+    for units in UNIT_COUNTS:
+        sps, calls, episodes, rss = run(units)
+        print(f"{units:>11} | {sps:>11.0f} | {calls:>9.0f} | {episodes:>8} | {rss:>11.0f}")
+
+
+if __name__ == "__main__":
+    main()
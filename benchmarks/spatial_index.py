@@ -0,0 +1,116 @@
+# Equivalence check and scaling of the per-step enemy spatial index.
+# Run from the repository root with: python -m benchmarks.spatial_index
+#
+# The original attack() and reward_function() (brute force closer_than
+# queries) are kept here and compared with VRBot's, first for identical
+# results (same targets, same reward, same random choices), then for speed
+# as both armies grow. Armies are played on the stand-in simulator's units.
+import asyncio
+import random
+import time
+from queue import Queue
+
+import simulator
+from action_channel import ActionChannel
+from sc2.ids.unit_typeid import UnitTypeId
+from spatial_index import SpatialIndex
+
+ARMY_SIZES = [5, 20, 50, 100, 200, 400]
+REPEATS = 5
+
+
+async def legacy_attack(bot):
+    for voidray in bot.units(UnitTypeId.VOIDRAY).idle:
+        if bot.enemy_units.closer_than(10, voidray):
+            voidray.attack(random.choice(bot.enemy_units.closer_than(10, voidray)))
+        elif bot.enemy_units:
+            voidray.attack(random.choice(bot.enemy_units))
+        elif bot.enemy_structures.closer_than(10, voidray):
+            voidray.attack(random.choice(bot.enemy_structures.closer_than(10, voidray)))
+        elif bot.enemy_structures:
+            voidray.attack(random.choice(bot.enemy_structures))
+        elif bot.enemy_start_locations:
+            voidray.attack(bot.enemy_start_locations[0])
+
+
+def legacy_reward_function(bot):
+    reward = 0
+    for vr in bot.units(UnitTypeId.VOIDRAY):
+        if vr.is_attacking and vr.target_in_range:
+            if bot.enemy_units.closer_than(12, vr) or bot.enemy_structures.closer_than(12, vr):
+                reward += 0.15
+    return reward
+
+
+def battle(army, seed, enemy_units=True):
+    # `army` void rays facing `army` marines and a few structures around the middle of the map
+    rng = random.Random(seed)
+    bot = simulator.SimulatedVRBot(action_in=ActionChannel(), result_out=Queue())
+    game = simulator.SimulatedGame(bot, simulator.SimulatorConfig(seed=seed), seed=seed)
+    bot.simulation = game
+    center = (92, 88)
+    spread = 8 + int(army ** 0.5 * 2)
+    for _ in range(army):
+        # Integer coordinates put some pairs exactly at the query distances
+        position = (center[0] + rng.randint(-spread, spread), center[1] + rng.uniform(-spread, spread))
+        game.add_unit(UnitTypeId.VOIDRAY, position, True)
+        if enemy_units:
+            game.add_unit(UnitTypeId.MARINE, (center[0] + rng.uniform(-spread, spread), center[1] + rng.randint(-spread, spread)), False)
+    for _ in range(max(1, army // 10)):
+        game.add_unit(UnitTypeId.PYLON, (center[0] + rng.uniform(-spread, spread), center[1] + rng.uniform(-spread, spread)), False)
+    if not enemy_units:
+        game.units = [u for u in game.units if u.is_mine or u.is_structure]
+    game.prepare(bot)
+    return bot
+
+
+def play_step(bot, attack, reward_function, seed):
+    # Sends the idle void rays to attack, then computes the reward
+    for voidray in bot.units(UnitTypeId.VOIDRAY):
+        voidray.order = voidray.target = None
+    bot.current_snapshot = None
+    random.seed(seed)
+    asyncio.run(attack(bot))
+    targets = [(vr.order, getattr(vr.target, "tag", vr.target)) for vr in bot.units(UnitTypeId.VOIDRAY)]
+    return targets, reward_function(bot)
+
+
+def check_equivalence():
+    rng = random.Random(0)
+    for army in ARMY_SIZES:
+        for enemy_units in (True, False):
+            bot = battle(army, seed=army, enemy_units=enemy_units)
+            assert play_step(bot, legacy_attack, legacy_reward_function, 1) == \
+                play_step(bot, type(bot).attack, type(bot).reward_function, 1), (army, enemy_units)
+            # Raw queries, including points right at the edge of the radius
+            units = bot.all_enemy_units
+            index = SpatialIndex(units, 12)
+            for _ in range(200):
+                point = (rng.randint(60, 120) + rng.choice((0, 0.5)), rng.randint(60, 120))
+                for distance in (0, 1, 3, 10, 12, 30, 200):
+                    assert index.closer_than(distance, point) == units.closer_than(distance, point)
+                    assert index.any_closer_than(distance, point) == bool(units.closer_than(distance, point))
+    print("spatial index results match brute force closer_than")
+
+
+def measure(bot, attack, reward_function):
+    best = float("inf")
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        play_step(bot, attack, reward_function, 1)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+
+def main():
+    check_equivalence()
+    print(f"{'army size':>9} | {'brute force ms':>14} | {'spatial index ms':>16} | {'speedup':>7}")
+    for army in ARMY_SIZES:
+        bot = battle(army, seed=army)
+        legacy = measure(bot, legacy_attack, legacy_reward_function)
+        indexed = measure(bot, type(bot).attack, type(bot).reward_function)
+        print(f"{army:>9} | {legacy:>14.3f} | {indexed:>16.3f} | {legacy / indexed:>6.1f}x")
+
+
+if __name__ == "__main__":
+    main()
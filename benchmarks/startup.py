@@ -0,0 +1,115 @@
+# Startup time and memory of the env worker processes.
+# Run from the repository root with: python -m benchmarks.startup [results.jsonl] [num_envs]
+#
+# Starts NUM_ENVS QueueEnv workers on simulated games, each configuration in a
+# fresh Python process, and reports per worker the time from the creation of
+# the vec env until its env exists (imports done) and until its first step has
+# returned, and the RSS and private (anonymous) memory of the worker:
+#   - subproc: SB3's SubprocVecEnv, whose workers import StableBaselines3 and torch,
+#   - shm spawn: SharedMemoryVecEnv with fresh interpreters, which only import the env,
+#   - shm forkserver: SharedMemoryVecEnv forked from a server with the env preloaded (the default).
+# Workers import this module too, so it only imports what the env needs at the top.
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import numpy as np
+
+import constants
+import simulator
+from queue_env import QueueEnv
+
+MODES = ["subproc", "shm spawn", "shm forkserver"]
+NUM_ENVS = 4
+DEFAULT_RESULTS_FILE = "benchmark_results.jsonl"
+
+
+class StartupEnv(QueueEnv):
+    # QueueEnv on simulated games that tells when it was created and first stepped
+    def __init__(self):
+        super().__init__(make_pool=simulator.simulated_pool)
+        self.created_at = time.time()
+        self.first_step_at = None
+
+    def step(self, action):
+        observation, reward, done, truncated, info = super().step(action)
+        if self.first_step_at is None:
+            self.first_step_at = time.time()
+            info.update(created_at=self.created_at, first_step_at=self.first_step_at)
+        return observation, reward, done, truncated, info
+
+
+def make_startup_env():
+    # The bots print every step, keep the worker output out of the report
+    sys.stdout = open(os.devnull, "w")
+    return StartupEnv()
+
+
+def memory_mb(pid):
+    # Resident and anonymous (not shared with files, e.g. loaded libraries) memory
+    fields = {}
+    with open(f"/proc/{pid}/status") as file:
+        for line in file:
+            key, _, value = line.partition(":")
+            if key in ("VmRSS", "RssAnon"):
+                fields[key] = int(value.split()[0]) / 1024
+    return fields["VmRSS"], fields["RssAnon"]
+
+
+def run(mode, num_envs):
+    # Learner side imports, not timed: the learner has them anyway
+    from stable_baselines3.common.vec_env import SubprocVecEnv
+    from shm_vec_env import SharedMemoryVecEnv
+
+    env_fns = [make_startup_env for _ in range(num_envs)]
+    start = time.time()
+    if mode == "subproc":
+        env = SubprocVecEnv(env_fns)
+    elif mode == "shm spawn":
+        env = SharedMemoryVecEnv(env_fns, constants.OBSERVATION_SPACE_ARRAY, start_method="spawn")
+    else:
+        env = SharedMemoryVecEnv(env_fns, constants.OBSERVATION_SPACE_ARRAY)
+    env.reset()
+    _, _, _, infos = env.step(np.zeros(num_envs, dtype=np.int64))
+    ready = time.time() - start
+    memory = [memory_mb(process.pid) for process in env.processes]
+    env.close()
+    return {
+        "mode": mode,
+        "num_envs": num_envs,
+        "env_created_sec": [info["created_at"] - start for info in infos],
+        "first_step_sec": [info["first_step_at"] - start for info in infos],
+        "all_ready_sec": ready,
+        "worker_rss_mb": [rss for rss, _ in memory],
+        "worker_private_mb": [private for _, private in memory],
+    }
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "run":
+        # One configuration, in a process of its own: python -m benchmarks.startup run MODE NUM_ENVS
+        os.chdir(tempfile.mkdtemp(prefix="startup_bench_"))
+        print(json.dumps(run(sys.argv[2], int(sys.argv[3]))))
+        return
+
+    from benchmarks.training_loop import current_commit
+    results_file = os.path.abspath(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_RESULTS_FILE)
+    num_envs = int(sys.argv[2]) if len(sys.argv) > 2 else NUM_ENVS
+    commit = current_commit()
+    print(f"{'mode':>14} | {'envs':>4} | {'env created s':>13} | {'first step s':>12} | {'max first step s':>16} | {'worker RSS MB':>13} | {'private MB':>10}")
+    for mode in MODES:
+        output = subprocess.run([sys.executable, "-m", "benchmarks.startup", "run", mode, str(num_envs)],
+                                check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        result.update(benchmark="startup", commit=commit, timestamp=time.time())
+        with open(results_file, "a") as file:
+            file.write(json.dumps(result) + "\n")
+        print(f"{mode:>14} | {num_envs:>4} | {np.mean(result['env_created_sec']):>13.2f} | {np.mean(result['first_step_sec']):>12.2f} | "
+              f"{max(result['first_step_sec']):>16.2f} | {np.mean(result['worker_rss_mb']):>13.0f} | {np.mean(result['worker_private_mb']):>10.0f}")
+    print(f"Results appended to {results_file}")
+
+
+if __name__ == "__main__":
+    main()
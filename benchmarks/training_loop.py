@@ -0,0 +1,164 @@
+# End-to-end throughput of the train_ppo pipeline against the stand-in simulator.
+# Run from the repository root with: python -m benchmarks.training_loop [results.jsonl]
+#
+# For every configuration of the sweep, PPO is trained for a few rollouts on
+# QueueEnv workers driven by simulator.py, and the following are measured:
+#   - env steps/s over the whole run and during rollouts only,
+#   - per-env step latency percentiles (time QueueEnv.step waits for the game),
+#   - time blocked on result_out.get() in QueueEnv and on action_in.get() in VRBot,
+#   - peak RSS of the learner and of the env workers.
+# Every configuration runs in a fresh Python process, so that peak memory is its own.
+# Env workers import this module too, so like main.py it only imports what envs need at the top.
+# One JSON object per configuration is appended to the results file, together
+# with the current commit, so runs can be compared between commits.
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from functools import partial
+import numpy as np
+
+import constants
+import simulator
+from queue_env import QueueEnv
+
+SWEEP_OBSERVATION_MODES = [("rgb", 224), ("planes", 64)]
+SWEEP_NUM_ENVS = [1, 2, 4]
+SWEEP_UNIT_DENSITY = [0, 100]
+TIMESTEPS = 1024
+N_STEPS = 64
+DEFAULT_RESULTS_FILE = "benchmark_results.jsonl"
+
+
+def quiet_env(make_pool, observation_space):
+    # The bots print every step, keep the worker output out of the report
+    def _init():
+        sys.stdout = open(os.devnull, "w")
+        return QueueEnv(make_pool=make_pool, observation_space=observation_space)
+    return _init
+
+
+def throughput_callback():
+    from stable_baselines3.common.callbacks import BaseCallback
+
+    class ThroughputCallback(BaseCallback):
+        def __init__(self):
+            super().__init__()
+            self.result_waits = []
+            self.action_waits = []
+            self.rollout_time = 0.0
+
+        def _on_training_start(self):
+            self.start = time.perf_counter()
+
+        def _on_rollout_start(self):
+            self.rollout_start = time.perf_counter()
+
+        def _on_rollout_end(self):
+            self.rollout_time += time.perf_counter() - self.rollout_start
+
+        def _on_step(self):
+            for info in self.locals["infos"]:
+                if "result_wait" in info:
+                    self.result_waits.append(info["result_wait"])
+                if "action_wait" in info:
+                    self.action_waits.append(info["action_wait"])
+            return True
+
+        def _on_training_end(self):
+            self.elapsed = time.perf_counter() - self.start
+
+    return ThroughputCallback()
+
+
+def current_commit():
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], text=True,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def peak_rss_mb(pid="self"):
+    # High-water mark of the resident memory of a process
+    with open(f"/proc/{pid}/status") as file:
+        for line in file:
+            if line.startswith("VmHWM:"):
+                return int(line.split()[1]) / 1024
+    return None
+
+
+def run(observation_mode, num_envs, unit_density):
+    # Learner side imports, the env workers don't need them
+    from stable_baselines3 import PPO
+    from stable_baselines3.common.vec_env import SubprocVecEnv
+    from shm_vec_env import SharedMemoryVecEnv
+
+    mode, resolution = observation_mode
+    space = constants.observation_space(mode, resolution)
+    config = simulator.SimulatorConfig(own_units=unit_density, enemy_units=unit_density)
+    bot_class = partial(simulator.SimulatedVRBot, observation_mode=mode, observation_resolution=resolution)
+    env_fns = [quiet_env(partial(simulator.simulated_pool, config, bot_class=bot_class), space) for _ in range(num_envs)]
+    if constants.SHARED_MEMORY_OBSERVATIONS:
+        env = SharedMemoryVecEnv(env_fns, space)
+    else:
+        env = SubprocVecEnv(env_fns)
+    model = PPO('CnnPolicy', env, n_steps=N_STEPS, batch_size=32, verbose=0)
+    callback = throughput_callback()
+    model.learn(total_timesteps=TIMESTEPS, callback=callback)
+    # The workers are children of the forkserver, not ours, so read their peaks before they exit
+    worker_peaks = [peak_rss_mb(process.pid) for process in env.processes]
+    env.close()
+
+    latencies = np.array(callback.result_waits) * 1000
+    steps = model.num_timesteps
+    return {
+        "observation_mode": mode,
+        "num_envs": num_envs,
+        "unit_density": unit_density,
+        "observation_shape": list(space.shape),
+        "timesteps": steps,
+        "steps_per_sec": steps / callback.elapsed,
+        "rollout_steps_per_sec": steps / callback.rollout_time,
+        "learner_update_sec": callback.elapsed - callback.rollout_time,
+        "step_latency_ms": {f"p{p}": float(np.percentile(latencies, p)) for p in (50, 90, 99)},
+        # Summed over all envs
+        "result_wait_sec": float(np.sum(callback.result_waits)),
+        "action_wait_sec": float(np.sum(callback.action_waits)),
+        "peak_rss_mb": peak_rss_mb(),
+        "peak_worker_rss_mb": max(worker_peaks),
+    }
+
+
+def main():
+    if len(sys.argv) > 1 and sys.argv[1] == "run":
+        # One configuration, in a process of its own: python -m benchmarks.training_loop run MODE RESOLUTION NUM_ENVS UNITS
+        # QueueEnv writes its episode logs under models/, keep that out of the repository
+        os.chdir(tempfile.mkdtemp(prefix="training_bench_"))
+        mode, resolution, num_envs, unit_density = sys.argv[2], int(sys.argv[3]), int(sys.argv[4]), int(sys.argv[5])
+        print(json.dumps(run((mode, resolution), num_envs, unit_density)))
+        return
+
+    results_file = os.path.abspath(sys.argv[1] if len(sys.argv) > 1 else DEFAULT_RESULTS_FILE)
+    commit = current_commit()
+    print(f"{'mode':>10} | {'envs':>4} | {'units':>5} | {'steps/s':>8} | {'rollout steps/s':>15} | {'p50 ms':>7} | {'p99 ms':>7} | {'worker RSS MB':>13}")
+    for observation_mode in SWEEP_OBSERVATION_MODES:
+        for num_envs in SWEEP_NUM_ENVS:
+            for unit_density in SWEEP_UNIT_DENSITY:
+                command = [sys.executable, "-m", "benchmarks.training_loop", "run", observation_mode[0],
+                           str(observation_mode[1]), str(num_envs), str(unit_density)]
+                output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+                result = json.loads(output.strip().splitlines()[-1])
+                result.update(commit=commit, timestamp=time.time())
+                with open(results_file, "a") as file:
+                    file.write(json.dumps(result) + "\n")
+                mode = f"{observation_mode[0]} {observation_mode[1]}"
+                print(f"{mode:>10} | {num_envs:>4} | {unit_density:>5} | {result['steps_per_sec']:>8.1f} | {result['rollout_steps_per_sec']:>15.1f} | "
+                      f"{result['step_latency_ms']['p50']:>7.2f} | {result['step_latency_ms']['p99']:>7.2f} | {result['peak_worker_rss_mb']:>13.0f}")
+    print(f"Results appended to {results_file}")
+
+
+if __name__ == "__main__":
+    main()
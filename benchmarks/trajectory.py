@@ -0,0 +1,91 @@
+# Size and speed of the trajectory recordings (trajectory.py).
+# Run from the repository root with: python -m benchmarks.trajectory
+#
+# A QueueEnv plays the stand-in simulator with and without recording, for
+# every observation mode. The recording is then read back: every step is
+# checked against a copy kept in memory, and random minibatches are timed.
+import contextlib
+import io
+import os
+import tempfile
+import time
+from functools import partial
+import numpy as np
+
+import constants
+import simulator
+from queue_env import QueueEnv
+from trajectory import TrajectoryReader
+
+MODES = [("rgb", 224), ("planes", 64)]
+STEPS = 2000
+UNITS = 50
+BATCH_SIZE = 64
+BATCHES = 50
+
+
+def play(mode, resolution, record, keep=False):
+    constants.RECORD_TRAJECTORIES = record
+    constants.TRAJECTORY_DIR = tempfile.mkdtemp(prefix="trajectories_")
+    config = simulator.SimulatorConfig(own_units=UNITS, enemy_units=UNITS)
+    bot_class = partial(simulator.SimulatedVRBot, observation_mode=mode, observation_resolution=resolution)
+    env = QueueEnv(make_pool=partial(simulator.simulated_pool, config, bot_class=bot_class),
+                   observation_space=constants.observation_space(mode, resolution))
+    rng = np.random.default_rng(0)
+    kept = [] # (observation, action, reward, done) of every recorded step
+    with contextlib.redirect_stdout(io.StringIO()) as log:
+        observation, _ = env.reset()
+        start = time.perf_counter()
+        for step in range(STEPS):
+            action = int(rng.integers(6))
+            previous = observation.copy() if keep else None
+            observation, reward, done, _, _ = env.step(action)
+            if keep:
+                kept.append((previous, action, reward, done))
+            if done:
+                observation, _ = env.reset()
+            if step % 500 == 0:
+                log.seek(0)
+                log.truncate()
+        elapsed = time.perf_counter() - start
+    env.close()
+    return STEPS / elapsed, constants.TRAJECTORY_DIR, kept
+
+
+def directory_size(directory):
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, files in os.walk(directory) for name in files)
+
+
+def main():
+    # QueueEnv writes its episode logs under models/, keep that out of the repository
+    os.chdir(tempfile.mkdtemp(prefix="trajectory_bench_"))
+    print(f"{'mode':>10} | {'steps/s':>7} | {'recording':>9} | {'bytes/step':>10} | {'dense bytes/step':>16} | {'read samples/s':>14}")
+    for mode, resolution in MODES:
+        plain, _, _ = play(mode, resolution, record=False)
+        recording, directory, kept = play(mode, resolution, record=True, keep=True)
+
+        reader = TrajectoryReader(directory)
+        assert len(reader) == len(kept), (len(reader), len(kept))
+        for start in range(0, len(kept), 256):
+            indices = np.arange(start, min(start + 256, len(kept)))
+            batch = reader.batch(indices)
+            assert np.array_equal(batch["observations"], np.stack([kept[i][0] for i in indices]))
+            assert np.array_equal(batch["actions"], [kept[i][1] for i in indices])
+            assert np.allclose(batch["rewards"], [kept[i][2] for i in indices])
+            assert np.array_equal(batch["dones"], [kept[i][3] for i in indices])
+
+        rng = np.random.default_rng(0)
+        start = time.perf_counter()
+        for _ in range(BATCHES):
+            reader.sample(BATCH_SIZE, rng)
+        read = BATCHES * BATCH_SIZE / (time.perf_counter() - start)
+
+        name = f"{mode} {resolution}"
+        dense = int(np.prod(reader.observation_shape)) + 8 + 4 + 1
+        print(f"{name:>10} | {plain:>7.0f} | {recording:>9.0f} | {directory_size(directory) / len(reader):>10.0f} | "
+              f"{dense:>16} | {read:>14.0f}")
+    print("\nRecorded steps read back identical")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+# Python-level unit filtering per step, with and without the per-step UnitSnapshot.
+# Run from the repository root with: python -m benchmarks.unit_snapshot
+#
+# The same stand-in game (simulator.py) is played by VRBot and by a bot that
+# keeps the original macro actions, which query self.structures(...) and
+# already_pending() directly, under cProfile. Calls to the collection
+# filters of the simulator's SimUnits and to already_pending are counted.
+import asyncio
+import contextlib
+import cProfile
+import io
+import pstats
+import random
+import time
+from queue import Queue
+import numpy as np
+
+import simulator
+from action_channel import ActionChannel
+from sc2.ids.unit_typeid import UnitTypeId
+from spatial_index import SpatialIndex
+
+STEPS = 1500
+OWN_UNITS = 50
+FILTERS = {"__call__", "of_type", "filter", "subgroup", "ready", "idle", "structure", "not_structure",
+           "closer_than", "amount", "exists", "first", "random", "already_pending"}
+
+
+class LegacyBot(simulator.SimulatedVRBot):
+    # The macro actions, attack() and reward_function() as they were before UnitSnapshot
+
+    async def build_workers(self):
+        for nexus in self.structures(UnitTypeId.NEXUS).ready:
+            if nexus.is_idle and self.can_afford(UnitTypeId.PROBE):
+                nexus.train(UnitTypeId.PROBE)
+
+    async def build_pylons(self):
+        if not self.already_pending(UnitTypeId.PYLON):
+            if self.supply_left < 5:
+                if len(self.structures(UnitTypeId.NEXUS)) > 0:
+                    nexus = self.structures(UnitTypeId.NEXUS).ready.random
+                    position = nexus.position.towards(self.game_info.map_center, 5)
+                    if self.can_afford(UnitTypeId.PYLON):
+                        await self.build(UnitTypeId.PYLON, near=position)
+
+    async def build_assimilators(self):
+        if len(self.structures(UnitTypeId.NEXUS)) > 0:
+            for nexus in self.structures(UnitTypeId.NEXUS).ready:
+                vespenes = self.vespene_geyser.closer_than(15.0, nexus.position)
+                for vespene in vespenes:
+                    if not self.can_afford(UnitTypeId.ASSIMILATOR) or self.structures(UnitTypeId.ASSIMILATOR).closer_than(1.0, vespene).exists:
+                        continue
+                    worker = self.select_build_worker(vespene.position)
+                    if worker:
+                        worker.build(UnitTypeId.ASSIMILATOR, vespene)
+
+    async def expand(self):
+        if self.can_afford(UnitTypeId.NEXUS) and not self.already_pending(UnitTypeId.NEXUS):
+            location = await self.get_next_expansion()
+            if location:
+                await self.build(UnitTypeId.NEXUS, near=location)
+
+    async def build_gateway(self):
+        if len(self.structures(UnitTypeId.NEXUS)) > 0:
+            if not self.structures(UnitTypeId.GATEWAY).ready.exists and not self.already_pending(UnitTypeId.GATEWAY):
+                pylons = self.structures(UnitTypeId.PYLON).ready
+                if pylons.exists and self.can_afford(UnitTypeId.GATEWAY):
+                    await self.build(UnitTypeId.GATEWAY, near=pylons.closest_to(self.structures(UnitTypeId.NEXUS).first))
+
+    async def build_cybernetics_core(self):
+        if len(self.structures(UnitTypeId.NEXUS)) > 0:
+            if self.structures(UnitTypeId.GATEWAY).ready.exists and not self.structures(UnitTypeId.CYBERNETICSCORE):
+                pylon = self.structures(UnitTypeId.PYLON).ready.random
+                if self.can_afford(UnitTypeId.CYBERNETICSCORE) and not self.already_pending(UnitTypeId.CYBERNETICSCORE):
+                    await self.build(UnitTypeId.CYBERNETICSCORE, near=pylon.position.towards(self.game_info.map_center, 5))
+
+    async def build_stargates(self):
+        if len(self.structures(UnitTypeId.NEXUS)) > 0:
+            if self.structures(UnitTypeId.CYBERNETICSCORE).ready.exists:
+                for pylon in self.structures(UnitTypeId.PYLON).ready:
+                    if self.can_afford(UnitTypeId.STARGATE) and not self.already_pending(UnitTypeId.STARGATE):
+                        await self.build(UnitTypeId.STARGATE, near=pylon.position.towards(self.game_info.map_center, 5))
+
+    async def build_void_rays(self):
+        for stargate in self.structures(UnitTypeId.STARGATE).ready.idle:
+            if self.can_afford(UnitTypeId.VOIDRAY) and self.supply_left > 0:
+                stargate.train(UnitTypeId.VOIDRAY)
+
+    async def attack(self):
+        voidrays = self.units(UnitTypeId.VOIDRAY).idle
+        if not voidrays:
+            return
+        enemy_unit_index, enemy_structure_index = self.enemy_indexes()
+        for voidray in voidrays:
+            close_units = enemy_unit_index.closer_than(10, voidray)
+            if close_units:
+                voidray.attack(random.choice(close_units))
+            elif self.enemy_units:
+                voidray.attack(random.choice(self.enemy_units))
+            elif close_structures := enemy_structure_index.closer_than(10, voidray):
+                voidray.attack(random.choice(close_structures))
+            elif self.enemy_structures:
+                voidray.attack(random.choice(self.enemy_structures))
+            elif self.enemy_start_locations:
+                voidray.attack(self.enemy_start_locations[0])
+
+    def enemy_indexes(self):
+        if getattr(self, "enemy_index_time", None) != self.time:
+            self.enemy_index_time = self.time
+            self.enemy_unit_index = SpatialIndex(self.enemy_units, 12)
+            self.enemy_structure_index = SpatialIndex(self.enemy_structures, 12)
+        return self.enemy_unit_index, self.enemy_structure_index
+
+    def reward_function(self):
+        reward = 0
+        for vr in self.units(UnitTypeId.VOIDRAY):
+            if vr.is_attacking and vr.target_in_range:
+                enemy_unit_index, enemy_structure_index = self.enemy_indexes()
+                if enemy_unit_index.any_closer_than(12, vr) or enemy_structure_index.any_closer_than(12, vr):
+                    reward += 0.15
+        return reward
+
+
+async def play(bot_class, actions):
+    # Drives the bot directly, every on_step being a decision
+    bot = bot_class(action_in=ActionChannel(), result_out=Queue())
+    bot.decision_interval = 0
+    for action in actions:
+        bot.action_in.put(int(action))
+    game = simulator.SimulatedGame(bot, simulator.SimulatorConfig(own_units=OWN_UNITS), seed=0)
+    bot.simulation = game
+    random.seed(0)
+    await bot.on_start()
+    for iteration in range(len(actions)):
+        game.prepare(bot)
+        await bot.on_step(iteration)
+        while not bot.result_out.empty():
+            bot.result_out.get()
+        game.advance()
+        if game.result() is not None:
+            return iteration + 1
+    return len(actions)
+
+
+def profile(bot_class, actions):
+    profiler = cProfile.Profile()
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        profiler.enable()
+        steps = asyncio.run(play(bot_class, actions))
+        profiler.disable()
+        elapsed = time.perf_counter() - start
+    stats = pstats.Stats(profiler).stats
+    filters = sum(calls for (filename, _, name), (_, calls, *_) in stats.items()
+                  if filename == simulator.__file__ and name in FILTERS)
+    # "~" is where cProfile files builtins such as list.append
+    python_calls = sum(calls for (filename, _, _), (_, calls, *_) in stats.items() if filename != "~")
+    return filters / steps, python_calls / steps, elapsed / steps * 1000
+
+
+def main():
+    # Mostly macro actions, which are the ones using the snapshot
+    actions = np.random.default_rng(0).choice(6, size=STEPS, p=[0.25, 0.2, 0.2, 0.1, 0.2, 0.05])
+    print(f"{STEPS} decisions, {OWN_UNITS} extra units\n")
+    print(f"{'bot':>8} | {'filter calls/step':>17} | {'Python calls/step':>17} | {'ms/step (profiled)':>18}")
+    for name, bot_class in (("original", LegacyBot), ("snapshot", simulator.SimulatedVRBot)):
+        filters, total, ms = profile(bot_class, actions)
+        print(f"{name:>8} | {filters:>17.1f} | {total:>17.1f} | {ms:>18.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+# Micro-benchmark of VRBot.visualize_intel against the original per-unit renderer.
+# Run from the repository root with: python -m benchmarks.visualize_intel
+#
+# Before timing anything, every configuration is rendered with both
+# implementations and the frames are required to be identical.
+import math
+import random
+import time
+import numpy as np
+
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.position import Point2
+
+from VoidRayBot import VRBot
+from snapshot import UnitSnapshot
+
+UNIT_COUNTS = [10, 50, 100, 250, 500, 1000]
+REPEATS = 200
+
+
+class FakeUnit:
+    def __init__(self, rng, type_id, is_structure=False):
+        self.type_id = type_id
+        self.position = Point2((rng.uniform(0, 200), rng.uniform(0, 200)))
+        self.health_max = rng.choice([0, 40, 150, 400, 1000])
+        self.health = rng.uniform(0, self.health_max)
+        self.is_structure = is_structure
+        self.is_visible = rng.random() < 0.7
+        self.mineral_contents = rng.randint(0, 1800)
+        self.vespene_contents = rng.randint(0, 2250)
+
+
+class FakeUnits(list):
+    @property
+    def structure(self):
+        return FakeUnits(u for u in self if u.is_structure)
+
+    def subgroup(self, units):
+        return FakeUnits(units)
+
+
+class FakeBot:
+    # Only what visualize_intel reads from the bot
+    def __init__(self, n, seed=0):
+        rng = random.Random(seed)
+        own_types = [UnitTypeId.PROBE, UnitTypeId.VOIDRAY]
+        self.all_own_units = FakeUnits(
+            [FakeUnit(rng, rng.choice(own_types)) for _ in range(n)] +
+            [FakeUnit(rng, rng.choice([UnitTypeId.NEXUS, UnitTypeId.PYLON]), True) for _ in range(max(1, n // 10))])
+        self.mineral_field = FakeUnits(FakeUnit(rng, UnitTypeId.MINERALFIELD) for _ in range(64))
+        self.vespene_geyser = FakeUnits(FakeUnit(rng, UnitTypeId.VESPENEGEYSER) for _ in range(16))
+        self.enemy_start_locations = [Point2((rng.uniform(0, 200), rng.uniform(0, 200)))]
+        # Like BotAI, enemy_structures are the structures of all_enemy_units, in the same order
+        self.all_enemy_units = FakeUnits(
+            [FakeUnit(rng, UnitTypeId.MARINE) for _ in range(n)] +
+            [FakeUnit(rng, UnitTypeId.COMMANDCENTER, True) for _ in range(max(1, n // 10))])
+        rng.shuffle(self.all_enemy_units)
+        self.enemy_structures = self.all_enemy_units.structure
+        self.frames = [np.zeros((224, 224, 3), dtype=np.uint8) for _ in range(2)]
+        self.frame_index = 0
+        self.obs_out = None
+        self.observation_mode = "rgb"
+        self.current_snapshot = None
+
+    snapshot = VRBot.snapshot
+
+
+def legacy_visualize_intel(bot):
+    # The original renderer, kept here as the reference for the equivalence check
+    obs = np.zeros((224, 224, 3), dtype=np.uint8)
+    for our_unit in bot.all_own_units:
+        pos = our_unit.position
+        c = [255, 75, 75] if our_unit.type_id == UnitTypeId.VOIDRAY else [175, 255, 0]
+        fraction = our_unit.health / our_unit.health_max if our_unit.health_max > 0 else 0.0001
+        obs[math.ceil(pos.y)][math.ceil(pos.x)] = [int(fraction*i) for i in c]
+    for mineral in bot.mineral_field:
+        pos = mineral.position
+        if mineral.is_visible:
+            obs[math.ceil(pos.y)][math.ceil(pos.x)] = [175, 255, 255]
+        else:
+            obs[math.ceil(pos.y)][math.ceil(pos.x)] = [20, 75, 50]
+    for pos in bot.enemy_start_locations:
+        obs[math.ceil(pos.y)][math.ceil(pos.x)] = [0, 0, 255]
+    for enemy_unit in bot.all_enemy_units:
+        pos = enemy_unit.position
+        fraction = enemy_unit.health / enemy_unit.health_max if enemy_unit.health_max > 0 else 0.0001
+        obs[math.ceil(pos.y)][math.ceil(pos.x)] = [int(fraction*i) for i in [100, 0, 255]]
+    for enemy_structure in bot.enemy_structures:
+        pos = enemy_structure.position
+        fraction = enemy_structure.health / enemy_structure.health_max if enemy_structure.health_max > 0 else 0.0001
+        obs[math.ceil(pos.y)][math.ceil(pos.x)] = [int(fraction*i) for i in [0, 100, 255]]
+    for our_structure in bot.all_own_units.structure:
+        pos = our_structure.position
+        c = [255, 255, 175] if our_structure.type_id == UnitTypeId.NEXUS else [0, 255, 175]
+        fraction = our_structure.health / our_structure.health_max if our_structure.health_max > 0 else 0.0001
+        obs[math.ceil(pos.y)][math.ceil(pos.x)] = [int(fraction*i) for i in c]
+    for vespene in bot.vespene_geyser:
+        pos = vespene.position
+        fraction = vespene.vespene_contents / 2250
+        if vespene.is_visible:
+            obs[math.ceil(pos.y)][math.ceil(pos.x)] = [int(fraction*i) for i in [255, 175, 255]]
+        else:
+            obs[math.ceil(pos.y)][math.ceil(pos.x)] = [50, 20, 75]
+    return obs
+
+
+def check_equivalence():
+    for n in UNIT_COUNTS:
+        for seed in range(5):
+            bot = FakeBot(n, seed)
+            expected = legacy_visualize_intel(bot)
+            actual = VRBot.visualize_intel(bot)
+            if not np.array_equal(expected, actual):
+                raise AssertionError(f"Renderers disagree for {n} units (seed {seed})")
+    print("Equivalence check passed.")
+
+
+def time_renderer(render, bot):
+    total = 0.0
+    for _ in range(REPEATS):
+        # A new step, whose unit tables are not gathered yet. The snapshot
+        # groups the units for the macro actions of the step as well, not timed.
+        bot.current_snapshot = UnitSnapshot(bot)
+        start = time.perf_counter()
+        render(bot)
+        total += time.perf_counter() - start
+    return total / REPEATS
+
+
+def main():
+    check_equivalence()
+    print(f"{'units':>8} | {'legacy (ms)':>12} | {'batched (ms)':>12} | {'speedup':>8}")
+    for n in UNIT_COUNTS:
+        bot = FakeBot(n)
+        legacy = time_renderer(legacy_visualize_intel, bot)
+        batched = time_renderer(VRBot.visualize_intel, bot)
+        print(f"{n:>8} | {legacy * 1000:>12.3f} | {batched * 1000:>12.3f} | {legacy / batched:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
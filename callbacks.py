@@ -0,0 +1,109 @@
+# General imports
+import os
+from collections import deque
+import numpy as np
+
+# StableBaselines3 imports
+from stable_baselines3.common.callbacks import BaseCallback
+
+import perf
+
+# Per-step counters reported by VRBot in the step info, logged as their mean per step
+COUNTERS = ("api_round_trips", "cache_hits")
+
+
+class PerfCallback(BaseCallback):
+    """Logs the hot-path timings of the env workers to TensorBoard.
+
+    Workers attach their drained perf histograms to the step info every
+    PERF_REPORT_INTERVAL steps; they are merged here and written as perf/*
+    scalars at the end of every rollout, together with the mean of the
+    per-step counters (perf/counters/*).
+    """
+
+    def __init__(self, verbose=0):
+        super().__init__(verbose)
+        self.histograms = {}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.steps = 0
+
+    def _on_step(self):
+        for info in self.locals["infos"]:
+            if "perf" in info:
+                perf.merge(self.histograms, info["perf"])
+            if COUNTERS[0] in info:
+                self.steps += 1
+                for name in COUNTERS:
+                    self.counters[name] += info[name]
+        return True
+
+    def _on_rollout_end(self):
+        # The learner's own stages, if any were recorded in this process
+        perf.merge(self.histograms, perf.drain())
+        for stage, histogram in self.histograms.items():
+            for name, value in perf.summarize(histogram).items():
+                self.logger.record(f"perf/{stage}/{name}", value)
+        if self.steps:
+            for name, total in self.counters.items():
+                self.logger.record(f"perf/counters/{name}", total / self.steps)
+        self.histograms = {}
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.steps = 0
+
+
+class AsyncCheckpointCallback(BaseCallback):
+    """Drop-in replacement of CheckpointCallback writing through an AsyncCheckpointer.
+
+    Checkpoints are named like CheckpointCallback's and scored by the mean
+    reward of the last SCORE_EPISODES episodes finished during training, so
+    the best ones survive the retention policy of the checkpointer.
+    """
+
+    SCORE_EPISODES = 20
+
+    def __init__(self, save_freq, checkpointer, name_prefix="rl_model", verbose=0):
+        super().__init__(verbose)
+        self.save_freq = save_freq
+        self.checkpointer = checkpointer
+        self.name_prefix = name_prefix
+        self.episode_rewards = None
+        self.finished_episodes = deque(maxlen=self.SCORE_EPISODES)
+
+    def score(self):
+        return float(np.mean(self.finished_episodes)) if self.finished_episodes else None
+
+    def _on_step(self):
+        rewards, dones = self.locals["rewards"], self.locals["dones"]
+        if self.episode_rewards is None:
+            self.episode_rewards = np.zeros(len(rewards))
+        self.episode_rewards += rewards
+        for index in np.flatnonzero(dones):
+            self.finished_episodes.append(self.episode_rewards[index])
+            self.episode_rewards[index] = 0
+        if self.n_calls % self.save_freq == 0:
+            filename = f"{self.name_prefix}_{self.num_timesteps}_steps.zip"
+            stall = self.checkpointer.save(self.model, filename, score=self.score())
+            if self.verbose >= 2:
+                print(f"Saving model checkpoint to {os.path.join(self.checkpointer.directory, filename)} ({stall * 1000:.0f} ms)")
+        return True
+
+
+class FaultCallback(BaseCallback):
+    """Logs the games given up on by the envs (faults/restarts) and the steps
+    of the episodes they cut short (faults/lost_steps), totalled over the run."""
+
+    def __init__(self, verbose=0):
+        super().__init__(verbose)
+        self.restarts = 0
+        self.lost_steps = 0
+
+    def _on_step(self):
+        for info in self.locals["infos"]:
+            if "game_failure" in info:
+                self.restarts += 1
+                self.lost_steps += info["lost_steps"]
+        return True
+
+    def _on_rollout_end(self):
+        self.logger.record("faults/restarts", self.restarts)
+        self.logger.record("faults/lost_steps", self.lost_steps)
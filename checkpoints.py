@@ -0,0 +1,136 @@
+# General imports
+import copy
+import json
+import os
+import time
+from collections import deque
+from queue import Queue
+from threading import Thread
+import numpy as np
+
+import constants
+import perf
+
+# StableBaselines3 imports
+from stable_baselines3.common.save_util import recursive_getattr, save_to_zip_file
+
+# Checkpoints written in the background. The learner only copies the policy
+# and optimizer state into memory (see snapshot()), a writer thread then
+# serializes them to <file>.tmp and renames it into place, so a checkpoint on
+# disk is always complete. Checkpoints saved with prune=True are recorded in
+# checkpoints.json and only the KEEP_LAST most recent plus the KEEP_BEST with
+# the highest score are kept.
+
+INDEX_FILE = "checkpoints.json"
+
+
+def snapshot(model):
+    # Same content as model.save(), copied so that training can go on while it is written
+    data = model.__dict__.copy()
+    exclude = set(model._excluded_save_params())
+    state_dicts_names, torch_variable_names = model._get_torch_save_params()
+    for name in state_dicts_names + torch_variable_names:
+        exclude.add(name.split(".")[0])
+    for name in exclude:
+        data.pop(name, None)
+    # Only containers change during training (e.g. _last_obs, ep_info_buffer)
+    for key, value in data.items():
+        if isinstance(value, (np.ndarray, deque, list, dict)):
+            data[key] = copy.deepcopy(value)
+    pytorch_variables = {name: copy.deepcopy(recursive_getattr(model, name)) for name in torch_variable_names}
+    params = {name: copy.deepcopy(state_dict) for name, state_dict in model.get_parameters().items()}
+    return data, params, pytorch_variables
+
+
+def retained(entries, keep_last, keep_best):
+    # The checkpoints to keep: the keep_last latest and the keep_best best scored
+    latest = sorted(entries, key=lambda entry: entry["steps"])[-keep_last:] if keep_last > 0 else []
+    scored = [entry for entry in entries if entry["score"] is not None]
+    best = sorted(scored, key=lambda entry: entry["score"])[-keep_best:] if keep_best > 0 else []
+    keep = {entry["file"] for entry in latest + best}
+    return [entry for entry in entries if entry["file"] in keep]
+
+
+class AsyncCheckpointer:
+    def __init__(self, directory, keep_last=constants.CHECKPOINTS_KEEP_LAST,
+                 keep_best=constants.CHECKPOINTS_KEEP_BEST) -> None:
+        self.directory = directory
+        self.keep_last = keep_last
+        self.keep_best = keep_best
+        os.makedirs(directory, exist_ok=True)
+        # Keep the retention going across runs resumed in the same directory
+        self.entries = []
+        index = os.path.join(directory, INDEX_FILE)
+        if os.path.exists(index):
+            with open(index) as file:
+                self.entries = json.load(file)
+        self.stalls = [] # seconds the learner spent in save()
+        self.writes = [] # seconds the writer spent per checkpoint
+        self.pending = Queue(maxsize=constants.CHECKPOINTS_MAX_PENDING)
+        self.writer = Thread(target=self.write_loop, daemon=True)
+        self.writer.start()
+
+    def save(self, model, filename, steps=None, score=None, prune=True):
+        # Returns as soon as the model has been copied, unless MAX_PENDING checkpoints are still being written
+        start = time.perf_counter()
+        entry = {"file": filename, "steps": model.num_timesteps if steps is None else steps, "score": score}
+        self.pending.put((snapshot(model), entry, prune))
+        stall = time.perf_counter() - start
+        self.stalls.append(stall)
+        perf.record("checkpoint/stall", stall)
+        return stall
+
+    def write_loop(self):
+        while True:
+            job = self.pending.get()
+            if job is None:
+                self.pending.task_done()
+                return
+            (data, params, pytorch_variables), entry, prune = job
+            start = time.perf_counter()
+            path = os.path.join(self.directory, entry["file"])
+            try:
+                write_atomically(path, lambda file: save_to_zip_file(file, data=data, params=params,
+                                                                     pytorch_variables=pytorch_variables))
+                if prune:
+                    self.prune(entry)
+            except Exception as e:
+                print(f"Checkpoint {path} could not be written - {e}")
+            finally:
+                self.pending.task_done()
+            self.writes.append(time.perf_counter() - start)
+            perf.record("checkpoint/write", self.writes[-1])
+
+    def prune(self, entry):
+        self.entries = [e for e in self.entries if e["file"] != entry["file"]] + [entry]
+        kept = retained(self.entries, self.keep_last, self.keep_best)
+        for old in self.entries:
+            if old not in kept:
+                try:
+                    os.remove(os.path.join(self.directory, old["file"]))
+                except FileNotFoundError:
+                    pass
+        self.entries = kept
+        write_atomically(os.path.join(self.directory, INDEX_FILE),
+                         lambda file: file.write(json.dumps(self.entries, indent=1).encode()))
+
+    def wait(self):
+        # Blocks until every checkpoint requested so far is on disk
+        self.pending.join()
+
+    def close(self):
+        self.pending.put(None)
+        self.writer.join()
+
+
+def write_atomically(path, write):
+    temporary = path + ".tmp"
+    try:
+        with open(temporary, "wb") as file:
+            write(file)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temporary, path)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
@@ -22,17 +22,65 @@ NUMBER_OF_ACTIONS = 6
 #   PylonsNum: The number of Pylons (supply and power-providing structures).
 #   SupplyLeft: The amount of remaining supply capacity for building additional units.
 #   SecondsOfGame: The elapsed game time in seconds.
-OBSERVATION_SPACE_ARRAY = spaces.Box(low=0, high=255, shape=(224, 224, 3), dtype=np.uint8)
+# The observations are now images of the map drawn by VRBot.visualize_intel:
+#   OBSERVATION_MODE: "rgb" draws every kind of unit into one 224x224 RGB frame indexed by
+#       raw map coordinates. "planes" crops the frame to the playable area, scales it to
+#       OBSERVATION_RESOLUTION pixels per side and draws every category of OBSERVATION_PLANES
+#       into its own uint8 plane, so categories no longer overwrite each other.
+#   OBSERVATION_RESOLUTION: Side in pixels of the "planes" frames, e.g. 64 or 96.
+OBSERVATION_MODE = "rgb"
+OBSERVATION_RESOLUTION = 96
+OBSERVATION_PLANES = ["own_units", "void_rays", "own_structures", "enemy_units", "enemy_structures",
+                      "minerals", "geysers", "enemy_start"]
+
+
+def observation_space(mode=OBSERVATION_MODE, resolution=OBSERVATION_RESOLUTION):
+    if mode == "planes":
+        shape = (resolution, resolution, len(OBSERVATION_PLANES))
+    elif mode == "rgb":
+        shape = (224, 224, 3)
+    else:
+        raise ValueError(f"Unknown observation mode {mode}")
+    return spaces.Box(low=0, high=255, shape=shape, dtype=np.uint8)
+
+
+OBSERVATION_SPACE_ARRAY = observation_space()
+
+# Optional vector of game statistics given to the policy next to the map: the ProbeNum to
+# SecondsOfGame values listed above, each divided by its entry of GAME_STATS_LIMITS and capped at 1.
+#   OBSERVATION_STATS: Whether the observations of train_ppo are a dict of the "map" and these "stats"
+#       instead of the map alone. actor_learner.py always trains on the map alone.
+OBSERVATION_STATS = False
+GAME_STATS_LIMITS = np.array([100, 50, 50, 10, 20, 10, 50, 200, 1800], dtype=np.float32)
+STATS_SPACE = spaces.Box(low=0, high=1, shape=GAME_STATS_LIMITS.shape, dtype=np.float32)
 
 # Defines an empty observation indicating the initial or reset state of the environment,
 # typically used at the start of a new episode.
-EMPTY_OBSERVATION = np.zeros((224, 224, 3), dtype=np.uint8)
+EMPTY_OBSERVATION = np.zeros(OBSERVATION_SPACE_ARRAY.shape, dtype=np.uint8)
+
+# Network of the policy trained by train_ppo and actor_learner.py (see policies.py).
+#   "nature_cnn": The default CNN of StableBaselines3, sized for dense Atari frames.
+#   "sparse_cnn": A much smaller CNN for the sparse unit maps drawn by VRBot, that max-pools
+#       them down to at most POLICY_INPUT_SIDE pixels per side first. Far cheaper on CPU,
+#       but opt-in until longer learning curves show it learns at least as well.
+#   POLICY_FEATURES: Number of features the "sparse_cnn" extracts from the map.
+POLICY_NETWORK = "nature_cnn"
+POLICY_INPUT_SIDE = 64
+POLICY_FEATURES = 128
+
+# Map the environments play on.
+MAP_NAME = "AbyssalReefLE"
 
 # Specifies the number of environments that are run in parallel during training.
 # Running multiple environments concurrently can significantly speed up training
 # by providing diverse experiences from multiple games.
 NUMBER_OF_CONCURRENT_EXECUTIONS = 5
 
+# When True, observations are rendered by the bots straight into shared memory
+# and handed to the learner without being pickled (see shm_vec_env.py and env_worker.py).
+# When False, the stock SubprocVecEnv is used instead.
+SHARED_MEMORY_OBSERVATIONS = True
+
 # Defines the number of timesteps for which the model is trained in each iteration.
 # A timestep generally represents a single decision-making step of the agent.
 TIMESTEPS = 10000
@@ -40,3 +88,109 @@ TIMESTEPS = 10000
 # The total number of iterations to run the training. Each iteration consists of
 # training for the specified number of timesteps.
 NUMBER_OF_ITERATIONS = 100000
+
+# Every environment keeps a pool of long-lived SC2 processes that are reused
+# across episodes instead of launching a new game process on every reset.
+#   GAME_POOL_SIZE: Number of SC2 processes per environment.
+#   GAME_POOL_WARM_SPARES: Number of games loaded ahead of time, waiting for the next reset.
+#   GAME_POOL_RECYCLE_AFTER: Number of games after which an SC2 process is restarted.
+GAME_POOL_SIZE = 2
+GAME_POOL_WARM_SPARES = 1
+GAME_POOL_RECYCLE_AFTER = 20
+
+# How VRBot turns the actions of the agent into game commands.
+#   DECISION_INTERVAL: Game seconds between two decisions of the agent.
+#   ACTION_REPEAT: Whether the last macro action keeps being applied on the game steps between decisions.
+#   NON_BLOCKING_ACTIONS: Whether the game keeps running while the learner computes the next action,
+#       instead of waiting for it. Observations are then a bit older than the game when the action lands.
+#   MAX_DECISION_LAG: With non blocking actions, game seconds after which the game waits for the action anyway.
+DECISION_INTERVAL = 0.5
+ACTION_REPEAT = False
+NON_BLOCKING_ACTIONS = False
+MAX_DECISION_LAG = 2.0
+
+# Recovery from games that crash or hang (see GamePool.watch and QueueEnv.step).
+#   STEP_TIMEOUT: Seconds QueueEnv.step waits for a result before giving up on the game and truncating the episode.
+#   RESET_TIMEOUT: Seconds QueueEnv.reset waits for a game to be loaded before raising an error.
+#   GAME_HANG_TIMEOUT: Seconds without a game step, while an env waits for it, after which its server is restarted.
+#   GAME_LOAD_TIMEOUT: Seconds a game may take to load (the map and the start of the bot) before its server is restarted.
+#   WATCHDOG_INTERVAL: Seconds between two checks of the game servers of a pool.
+#   ACTION_TIMEOUT: Seconds a game in progress waits for the next action before leaving, e.g. when its env is gone.
+STEP_TIMEOUT = 120
+RESET_TIMEOUT = 600
+GAME_HANG_TIMEOUT = 60
+GAME_LOAD_TIMEOUT = 300
+WATCHDOG_INTERVAL = 5
+ACTION_TIMEOUT = 1800
+
+# Checkpoints of train_ppo, written by a background thread (see checkpoints.py).
+#   CHECKPOINT_FREQ: Number of steps of every env between two checkpoints.
+#   CHECKPOINTS_KEEP_LAST: Number of most recent checkpoints kept on disk.
+#   CHECKPOINTS_KEEP_BEST: Number of checkpoints with the best mean episode reward kept on disk, on top of those.
+#   CHECKPOINTS_MAX_PENDING: Checkpoints that may wait for the writer before training waits for it too.
+CHECKPOINT_FREQ = 10000
+CHECKPOINTS_KEEP_LAST = 5
+CHECKPOINTS_KEEP_BEST = 3
+CHECKPOINTS_MAX_PENDING = 1
+
+# Episode metrics written by every environment (see metrics.py), read with `python metrics.py models/<name>/metrics`.
+#   METRICS_FLUSH_EPISODES: Number of episodes buffered before they are appended to the log.
+#   METRICS_FLUSH_SECONDS: Seconds after which buffered episodes are appended anyway.
+METRICS_FLUSH_EPISODES = 16
+METRICS_FLUSH_SECONDS = 30
+
+# Evaluation of a saved model with evaluate.py, on every combination of these maps, races and difficulties
+# of the computer (names of burnysc2's Race and Difficulty).
+#   EVALUATION_GAMES: Number of games per combination.
+#   EVALUATION_WORKERS: Number of env processes playing games in parallel, e.g. the number of cores.
+EVALUATION_MAPS = [MAP_NAME]
+EVALUATION_RACES = ["Terran", "Zerg", "Protoss"]
+EVALUATION_DIFFICULTIES = ["Easy", "Medium", "Hard", "VeryHard"]
+EVALUATION_GAMES = 20
+EVALUATION_WORKERS = 4
+
+# Optional recording of the experience of every environment to disk, for offline training
+# (see trajectory.py, and trajectory.TrajectoryReader to read it back).
+#   RECORD_TRAJECTORIES: Whether QueueEnv records its steps.
+#   TRAJECTORY_DIR: Where the recordings go, one subdirectory per environment process.
+#   TRAJECTORY_CHUNK_STEPS: Number of steps per chunk of files.
+RECORD_TRAJECTORIES = False
+TRAJECTORY_DIR = "trajectories"
+TRAJECTORY_CHUNK_STEPS = 4096
+
+# Optional timing of the stages of VRBot.on_step and QueueEnv.step. Timings are
+# aggregated in every env worker and logged to TensorBoard as perf/* scalars.
+#   PERF_INSTRUMENTATION: Whether the stages are timed at all (near zero cost when False).
+#   PERF_REPORT_INTERVAL: Number of env steps between two reports of a worker to the learner.
+PERF_INSTRUMENTATION = False
+PERF_REPORT_INTERVAL = 100
+
+# Asynchronous actor/learner training (see actor_learner.py), used instead of PPO when ACTOR_LEARNER is True.
+#   NUMBER_OF_ACTORS: Number of actor processes, each one playing its own games.
+#   INFERENCE_ADDRESS: None to serve the actors over a local unix socket, or a (host, port) tuple to
+#       listen on TCP so that actors on other machines can connect.
+#   INFERENCE_AUTHKEY_VARIABLE: Environment variable with the secret key of the actors' connections. Required
+#       over TCP, on the learner and on every remote actor. Without it, local runs use a random key.
+#   INFERENCE_BATCH_WINDOW: Seconds the inference server waits for more requests before running the policy.
+#   INFERENCE_MAX_BATCH: Maximum number of observations per forward pass of the inference server.
+#   UNROLL_LENGTH: Number of steps of the segments actors send to the learner.
+#   LEARNER_BATCH_SEGMENTS: Number of segments per update of the learner.
+#   LEARNER_QUEUE_SEGMENTS: Segments waiting for the learner before actors are held back.
+#   GAMMA, LEARNING_RATE, VF_COEF, ENT_COEF, MAX_GRAD_NORM: Usual actor-critic hyperparameters.
+#   VTRACE_RHO_BAR, VTRACE_C_BAR: Clipping of the importance weights of the V-trace correction.
+ACTOR_LEARNER = False
+NUMBER_OF_ACTORS = 8
+INFERENCE_ADDRESS = None
+INFERENCE_AUTHKEY_VARIABLE = "VRBOT_INFERENCE_AUTHKEY"
+INFERENCE_BATCH_WINDOW = 0.005
+INFERENCE_MAX_BATCH = 32
+UNROLL_LENGTH = 32
+LEARNER_BATCH_SEGMENTS = 4
+LEARNER_QUEUE_SEGMENTS = 64
+GAMMA = 0.99
+LEARNING_RATE = 3e-4
+VF_COEF = 0.5
+ENT_COEF = 0.01
+MAX_GRAD_NORM = 40.0
+VTRACE_RHO_BAR = 1.0
+VTRACE_C_BAR = 1.0
@@ -0,0 +1,150 @@
+# Env worker processes of SharedMemoryVecEnv.
+# Workers only import this module and the environment (see queue_env.py), never
+# StableBaselines3 or torch, and are forked from a server that has already
+# imported both (see start_forkserver), so they start in a fraction of a second.
+import os
+import sys
+from multiprocessing import forkserver
+import cloudpickle
+import numpy as np
+import gymnasium as gym
+
+# Observations travel through a shared memory block laid out as
+# (2, num_envs, *observation_shape). Each environment renders straight into its
+# own slot, so only rewards, dones and infos go through the pipes. There are two
+# banks of slots used alternately: SB3 stores the previous observation in its
+# rollout buffer only after the next step has returned, so the frame handed to
+# the learner has to stay untouched for one more step.
+NUMBER_OF_BANKS = 2
+
+# Modules the env workers are forked with, everything QueueEnv and VRBot need
+WORKER_PRELOAD = ["env_worker", "queue_env"]
+
+# Modules preloaded by the forkserver of this process, once start_forkserver started it
+_forkserver_preload = None
+
+
+class EnvFnWrapper:
+    # Pickles the env function with cloudpickle, like SB3's CloudpickleWrapper
+    def __init__(self, var):
+        self.var = var
+
+    def __getstate__(self):
+        return cloudpickle.dumps(self.var)
+
+    def __setstate__(self, var):
+        self.var = cloudpickle.loads(var)
+
+
+def start_forkserver(modules):
+    # The server imports these modules once, the processes it forks share them.
+    # There is one server per process and its preload list can't change once it
+    # runs, so a later call must not ask for modules the first one didn't preload.
+    global _forkserver_preload
+    modules = list(modules)
+    if _forkserver_preload is not None:
+        missing = [module for module in modules if module not in _forkserver_preload]
+        if missing:
+            raise RuntimeError(f"The forkserver already runs with {_forkserver_preload} preloaded, "
+                               f"it can't preload {missing} too")
+        return
+    forkserver.set_forkserver_preload(modules)
+    if sys.version_info >= (3, 12):
+        forkserver.ensure_running()
+    else:
+        # Before Python 3.12 the server ignores our sys.path and resolves the
+        # modules from its working directory, so start it from ours
+        cwd = os.getcwd()
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+        try:
+            forkserver.ensure_running()
+        finally:
+            os.chdir(cwd)
+    _forkserver_preload = modules
+
+
+def is_wrapped(env, wrapper_class):
+    while isinstance(env, gym.Wrapper):
+        if isinstance(env, wrapper_class):
+            return True
+        env = env.env
+    return False
+
+
+def shm_worker(remote, parent_remote, env_fn_wrapper, shared, env_index, obs_shape):
+    parent_remote.close()
+    env = env_fn_wrapper.var()
+    if not isinstance(env, gym.Env):
+        # Only old gym environments need SB3 to be converted
+        from stable_baselines3.common.vec_env.patch_gym import _patch_env
+        env = _patch_env(env)
+    frames = np.frombuffer(shared, dtype=np.uint8).reshape(NUMBER_OF_BANKS, -1, *obs_shape)
+
+    def use_slot(bank):
+        # Environments that know about obs_target render directly into the slot
+        target = frames[bank, env_index]
+        env.unwrapped.obs_target = target
+        return target
+
+    def publish(observation, target):
+        # Copies the observation into the slot unless it was rendered there already
+        if observation is target:
+            return 0
+        np.copyto(target, observation)
+        return target.nbytes
+
+    while True:
+        try:
+            cmd, data = remote.recv()
+            if cmd == "step":
+                action, bank = data
+                target = use_slot(bank)
+                observation, reward, terminated, truncated, info = env.step(action)
+                done = terminated or truncated
+                info["TimeLimit.truncated"] = truncated and not terminated
+                bytes_copied = 0
+                reset_info = {}
+                if done:
+                    # The slot is about to be overwritten by the reset observation
+                    info["terminal_observation"] = np.array(observation, copy=True)
+                    bytes_copied += observation.nbytes
+                    observation, reset_info = env.reset()
+                bytes_copied += publish(observation, target)
+                info["bytes_copied"] = bytes_copied
+                remote.send((reward, done, info, reset_info))
+            elif cmd == "reset":
+                seed, options, bank = data
+                target = use_slot(bank)
+                maybe_options = {"options": options} if options else {}
+                observation, reset_info = env.reset(seed=seed, **maybe_options)
+                publish(observation, target)
+                remote.send(reset_info)
+            elif cmd == "render":
+                remote.send(env.render())
+            elif cmd == "close":
+                env.close()
+                remote.close()
+                break
+            elif cmd == "get_spaces":
+                remote.send((env.observation_space, env.action_space))
+            elif cmd == "env_method":
+                method = env.get_wrapper_attr(data[0])
+                remote.send(method(*data[1], **data[2]))
+            elif cmd == "get_attr":
+                remote.send(env.get_wrapper_attr(data))
+            elif cmd == "has_attr":
+                try:
+                    env.get_wrapper_attr(data)
+                    remote.send(True)
+                except AttributeError:
+                    remote.send(False)
+            elif cmd == "set_attr":
+                remote.send(setattr(env, data[0], data[1]))
+            elif cmd == "is_wrapped":
+                remote.send(is_wrapped(env, data))
+            else:
+                raise NotImplementedError(f"`{cmd}` is not implemented in the worker")
+        except EOFError:
+            break
+        except KeyboardInterrupt:
+            break
@@ -0,0 +1,266 @@
+# Evaluation of a saved model against a matrix of maps, races and difficulties of the computer.
+# Usage: python evaluate.py models/<model_name>/model.zip [--simulator] [--games N] [--workers N] ...
+#
+# Games are played by EVALUATION_WORKERS env processes at the same time. Their
+# observations come back together and the policy picks the actions of all of
+# them in one deterministic forward pass. Win rate, reward and game length are
+# reported per combination with 95% confidence intervals.
+# The env processes run this file again, so it only imports what envs need at the top.
+import argparse
+import copy
+import json
+import math
+import os
+import time
+import zlib
+from functools import partial
+from itertools import product
+import numpy as np
+import constants
+
+from sc2.data import Difficulty, Race
+
+import simulator
+from queue_env import QueueEnv
+
+# Normal quantile of the 95% confidence intervals
+Z_95 = 1.96
+
+
+class EvalEnv(QueueEnv):
+    """QueueEnv that plays a given list of (game number, (map, race, difficulty)) games, in order.
+
+    The game pool is only replaced when the combination changes. Its stand-in
+    games are seeded from the number of the first game of the combination, plus
+    their number in the pool, so that the games of a combination all differ.
+    Once its games are over the env idles, without a game, until the other envs
+    are done too. Every finished game is reported in the step info as
+    "evaluation", with a checksum of its actions and observations.
+    """
+
+    def __init__(self, games, simulator_config=None, stats=False, env_id=None):
+        super().__init__(env_id=env_id, stats=stats, metrics_dir=None)
+        self.games = list(games)
+        self.simulator_config = simulator_config # play stand-in games, see simulator.py
+        self.combination = None
+        self.number = None
+        self.idle = False
+        self.episode_reward = 0.0
+        self.episode_steps = 0
+        self.episode_crc = 0
+
+    def empty_observation(self):
+        observation = self.empty_map()
+        if self.stats:
+            observation = {"map": observation, "stats": self.empty_stats()}
+        return observation
+
+    def reset(self, *, seed=None, options=None):
+        if not self.games:
+            self.idle = True
+            if self.pool is not None:
+                self.pool.close()
+                self.pool = None
+            return self.empty_observation(), {}
+        self.number, combination = self.games.pop(0)
+        if combination != self.combination:
+            if self.pool is not None:
+                self.pool.close()
+                self.pool = None
+            self.combination = combination
+            map_name, race, difficulty = combination
+            self.map_name, self.race, self.difficulty = map_name, Race[race], Difficulty[difficulty]
+            if self.simulator_config is not None:
+                # The pool numbers its games from 0, see simulator.host_simulated_games
+                config = copy.copy(self.simulator_config)
+                config.seed = self.simulator_config.seed + self.number
+                self.make_pool = partial(simulator.simulated_pool, config,
+                                         map_name=self.map_name, race=self.race, difficulty=self.difficulty)
+        self.episode_reward = 0.0
+        self.episode_steps = 0
+        self.episode_crc = 0
+        self.episode_wall_start = time.perf_counter()
+        return super().reset(seed=seed, options=options)
+
+    def step(self, action):
+        if self.idle:
+            return self.empty_observation(), 0.0, False, False, {"idle": True}
+        observation, reward, done, truncated, info = super().step(action)
+        self.episode_reward += reward
+        self.episode_steps += 1
+        # Tells apart games that only look alike in their totals
+        frame = observation["map"] if self.stats else observation
+        self.episode_crc = zlib.crc32(frame, zlib.crc32(bytes([int(action)]), self.episode_crc))
+        if done or truncated:
+            map_name, race, difficulty = self.combination
+            info["evaluation"] = {
+                "game": self.number, "map": map_name, "race": race, "difficulty": difficulty,
+                # Games that crashed or hung have no result
+                "result": info.get("game_result", "Failed") if done else "Failed",
+                "reward": float(self.episode_reward),
+                "length": self.episode_steps,
+                "game_seconds": float(self.game.bot.time) if done else None,
+                "wall_seconds": time.perf_counter() - self.episode_wall_start,
+                "seed": self.game.seed,
+                "trajectory_crc": self.episode_crc,
+            }
+        return observation, reward, done, truncated, info
+
+
+def make_eval_env(games, simulator_config=None, stats=False, env_id=None):
+    def _init():
+        return EvalEnv(games, simulator_config=simulator_config, stats=stats, env_id=env_id)
+    return _init
+
+
+def wilson_interval(successes, n, z=Z_95):
+    # Confidence interval of a win rate, still sensible with few games or rates close to 0 or 1
+    if n == 0:
+        return None
+    p = successes / n
+    center = (p + z * z / (2 * n)) / (1 + z * z / n)
+    half = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n)) / (1 + z * z / n)
+    return [max(0.0, center - half), min(1.0, center + half)]
+
+
+def mean_interval(values, z=Z_95):
+    # Mean and the normal approximation of its confidence interval
+    values = np.asarray(values, dtype=np.float64)
+    if len(values) == 0:
+        return None, None
+    mean = float(values.mean())
+    if len(values) < 2:
+        return mean, None
+    half = z * float(values.std(ddof=1)) / math.sqrt(len(values))
+    return mean, [mean - half, mean + half]
+
+
+def summarize(records):
+    # One row per (map, race, difficulty), in the order of the schedule
+    rows = {}
+    for record in sorted(records, key=lambda record: record["game"]):
+        rows.setdefault((record["map"], record["race"], record["difficulty"]), []).append(record)
+    summary = []
+    for (map_name, race, difficulty), games in rows.items():
+        played = [game for game in games if game["result"] != "Failed"]
+        wins = sum(game["result"] == "Victory" for game in played)
+        reward, reward_ci = mean_interval([game["reward"] for game in played])
+        length, length_ci = mean_interval([game["length"] for game in played])
+        game_seconds, _ = mean_interval([game["game_seconds"] for game in played])
+        summary.append({
+            "map": map_name, "race": race, "difficulty": difficulty,
+            "games": len(played), "failed": len(games) - len(played),
+            "win_rate": wins / len(played) if played else None, "win_rate_ci": wilson_interval(wins, len(played)),
+            "reward": reward, "reward_ci": reward_ci,
+            "length": length, "length_ci": length_ci,
+            "game_seconds": game_seconds,
+        })
+    return summary
+
+
+def evaluate(model_path, maps=constants.EVALUATION_MAPS, races=constants.EVALUATION_RACES,
+             difficulties=constants.EVALUATION_DIFFICULTIES, games=constants.EVALUATION_GAMES,
+             workers=constants.EVALUATION_WORKERS, simulator_config=None):
+    # Learner-side imports, the env processes don't need them
+    from gymnasium import spaces
+    from stable_baselines3 import PPO
+    from stable_baselines3.common.vec_env import SubprocVecEnv, VecTransposeImage
+    from shm_vec_env import SharedMemoryVecEnv
+
+    model = PPO.load(model_path, device="cpu")
+    stats = isinstance(model.observation_space, spaces.Dict)
+    map_space = model.observation_space["map"] if stats else model.observation_space
+    expected = VecTransposeImage.transpose_space(constants.OBSERVATION_SPACE_ARRAY)
+    if map_space.shape != expected.shape:
+        raise ValueError(f"The model was trained on maps of shape {map_space.shape}, but OBSERVATION_MODE "
+                         f"and OBSERVATION_RESOLUTION in constants.py give {expected.shape}")
+
+    # Every process gets a contiguous share of the games, so that it seldom changes combination
+    combinations = list(product(maps, races, difficulties))
+    schedule = [combination for combination in combinations for _ in range(games)]
+    workers = max(1, min(workers, len(schedule)))
+    shares = np.array_split(np.arange(len(schedule)), workers)
+    env_fns = [make_eval_env([(i, schedule[i]) for i in share.tolist()], simulator_config, stats, env_id=worker)
+               for worker, share in enumerate(shares)]
+    if stats:
+        env = SubprocVecEnv(env_fns)
+    else:
+        env = SharedMemoryVecEnv(env_fns, constants.OBSERVATION_SPACE_ARRAY)
+
+    records = []
+    batch_sizes = []
+    start = time.perf_counter()
+    try:
+        observations = env.reset()
+        while len(records) < len(schedule):
+            # One forward pass for the games of all processes
+            actions, _ = model.predict(observations, deterministic=True)
+            observations, _, _, infos = env.step(actions)
+            batch_sizes.append(sum("idle" not in info for info in infos))
+            for info in infos:
+                if "evaluation" in info:
+                    records.append(info["evaluation"])
+                    print(f"Game {len(records)}/{len(schedule)}: {info['evaluation']['result']} on "
+                          f"{info['evaluation']['map']} against {info['evaluation']['race']} {info['evaluation']['difficulty']}")
+    finally:
+        env.close()
+    elapsed = time.perf_counter() - start
+    return {
+        "model": os.path.abspath(model_path),
+        "simulator": simulator_config is not None,
+        "workers": workers,
+        "games": len(records),
+        "elapsed_sec": elapsed,
+        "games_per_hour": len(records) / elapsed * 3600,
+        "mean_batch_size": float(np.mean(batch_sizes)) if batch_sizes else 0.0,
+        "summary": summarize(records),
+        "records": records,
+    }
+
+
+def print_summary(result):
+    def interval(ci, digits=1):
+        return f"[{ci[0]:.{digits}f}, {ci[1]:.{digits}f}]" if ci is not None else "-"
+
+    print(f"{'map':>16} | {'race':>8} | {'difficulty':>10} | {'games':>5} | {'failed':>6} | {'win rate':>8} | {'95% CI':>14} | "
+          f"{'reward':>8} | {'95% CI':>18} | {'steps':>6} | {'95% CI':>16}")
+    for row in result["summary"]:
+        win_rate = f"{row['win_rate']:.2f}" if row["win_rate"] is not None else "-"
+        reward = f"{row['reward']:.1f}" if row["reward"] is not None else "-"
+        length = f"{row['length']:.0f}" if row["length"] is not None else "-"
+        print(f"{row['map']:>16} | {row['race']:>8} | {row['difficulty']:>10} | {row['games']:>5} | {row['failed']:>6} | "
+              f"{win_rate:>8} | {interval(row['win_rate_ci'], 2):>14} | {reward:>8} | {interval(row['reward_ci']):>18} | "
+              f"{length:>6} | {interval(row['length_ci'], 0):>16}")
+    print(f"{result['games']} games in {result['elapsed_sec']:.0f}s with {result['workers']} processes: "
+          f"{result['games_per_hour']:.0f} games/hour, {result['mean_batch_size']:.1f} games per forward pass")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Evaluates a saved model against a matrix of computer opponents.")
+    parser.add_argument("model", help="path of the model.zip to evaluate")
+    parser.add_argument("--maps", nargs="+", default=constants.EVALUATION_MAPS)
+    parser.add_argument("--races", nargs="+", default=constants.EVALUATION_RACES, choices=[race.name for race in Race])
+    parser.add_argument("--difficulties", nargs="+", default=constants.EVALUATION_DIFFICULTIES,
+                        choices=[difficulty.name for difficulty in Difficulty])
+    parser.add_argument("--games", type=int, default=constants.EVALUATION_GAMES, help="games per combination")
+    parser.add_argument("--workers", type=int, default=constants.EVALUATION_WORKERS, help="env processes")
+    parser.add_argument("--simulator", action="store_true", help="play stand-in games of simulator.py instead of SC2")
+    parser.add_argument("--game-seconds", type=float, default=None, help="time limit of the stand-in games")
+    parser.add_argument("--output", default=None, help="JSON file for the results, next to the model by default")
+    args = parser.parse_args()
+
+    simulator_config = None
+    if args.simulator:
+        simulator_config = simulator.SimulatorConfig()
+        if args.game_seconds is not None:
+            simulator_config.time_limit = args.game_seconds
+    result = evaluate(args.model, args.maps, args.races, args.difficulties, args.games, args.workers, simulator_config)
+    print_summary(result)
+    output = args.output or os.path.join(os.path.dirname(os.path.abspath(args.model)), "evaluation.json")
+    with open(output, "w") as file:
+        json.dump(result, file, indent=2)
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
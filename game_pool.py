@@ -0,0 +1,277 @@
+# General imports
+import asyncio
+import signal
+import threading
+import time
+from contextlib import suppress
+from queue import Queue, Empty
+from threading import Semaphore, Thread, Lock
+import constants
+
+# SC2 API imports
+from sc2 import maps
+from sc2.data import Difficulty, Race
+from sc2.main import _play_game, _setup_host_game
+from sc2.player import Bot, Computer
+from sc2.protocol import ConnectionAlreadyClosed, ProtocolError
+from sc2 import sc2process
+from sc2.sc2process import SC2Process, kill_switch
+
+# Bot
+from VoidRayBot import VRBot
+from action_channel import ActionChannel
+
+
+class _MainThreadSignals:
+    # SC2Process installs a SIGINT handler when a server starts, which raises
+    # ValueError outside of the main thread, where our game servers run. Their
+    # SC2 processes are still killed at exit by burnysc2's kill_switch.
+    def __getattr__(self, name):
+        return getattr(signal, name)
+
+    def signal(self, signalnum, handler):
+        if threading.current_thread() is threading.main_thread():
+            return signal.signal(signalnum, handler)
+        return signal.getsignal(signalnum)
+
+
+sc2process.signal = _MainThreadSignals()
+
+
+# A single episode: the queues the environment talks to the bot through,
+# plus the bot itself. Slots are created by a GameThread and handed to an
+# environment by the GamePool once the game has been loaded.
+class GameSlot:
+    def __init__(self, map_name, race, difficulty, bot_class=VRBot) -> None:
+        self.map_name = map_name
+        self.race = race
+        self.difficulty = difficulty
+        self.action_in = ActionChannel()
+        self.result_out = Queue()
+        self.result = None
+        self.failed = False
+        self.waiting_since = None # set by the environment while it waits for a result
+        self.loading_since = None # set by its GameThread until the game is ready
+        self.number = None # order in which the servers of the pool started loading their games
+        self.seed = None # of stand-in games, see simulator.py
+        self.bot = bot_class(action_in=self.action_in, result_out=self.result_out)
+
+    def fail(self, reason):
+        # Hands the failure to the environment instead of the result it waits for
+        if self.result is None and not self.failed:
+            self.failed = True
+            self.result_out.put({"failed": reason})
+
+
+async def host_sc2_games(next_game):
+    # Plays games on a single long-lived SC2 process until next_game() returns None.
+    # Only the map is reloaded between games, the process itself is kept.
+    # Uses private parts of burnysc2 (_setup_host_game, _play_game, kill_switch),
+    # which is why requirements.txt pins its exact version.
+    process = SC2Process()
+    server = await process.__aenter__()
+    try:
+        while True:
+            slot = next_game()
+            if slot is None:
+                return
+            await server.ping()
+            players = [Bot(Race.Protoss, slot.bot), Computer(slot.race, slot.difficulty)]
+            client = await _setup_host_game(server, maps.get(slot.map_name), players, False)
+            slot.result = await _play_game(players[0], client, False, None)
+            with suppress(ConnectionAlreadyClosed, ProtocolError):
+                await client.leave()
+    finally:
+        # SC2Process.__aexit__ would kill every SC2 process of this Python
+        # process, including the other servers of the pool, so only clean ours.
+        await process._close_connection()
+        process._clean(verbose=False)
+        if process in kill_switch._to_kill:
+            kill_switch._to_kill.remove(process)
+
+
+# This is the thread that holds one long-lived game server
+class GameThread(Thread):
+    def __init__(self, pool) -> None:
+        super().__init__(daemon=True)
+        self.pool = pool
+        self.games_played = 0
+        self.slot = None # game currently loaded or played
+        self.loop = None
+        self.task = None
+
+    def run(self) -> None:
+        try:
+            asyncio.run(self.serve())
+        except (Exception, asyncio.CancelledError) as e:
+            if not self.pool.closed:
+                print(f"Game server stopped - {e!r}")
+        finally:
+            if self.slot is not None:
+                self.slot.fail("crashed")
+                if self.slot.loading_since is not None:
+                    # The game never reached the ready queue, where acquire() gives its warm permit back
+                    self.slot.loading_since = None
+                    self.pool.warm_permits.release()
+            self.pool._server_finished(self)
+
+    async def serve(self):
+        self.loop = asyncio.get_running_loop()
+        self.task = asyncio.current_task()
+        await self.pool.host(self.next_game)
+
+    def kill(self):
+        # Cancels whatever the game is waiting for, e.g. an SC2 process that stopped answering
+        if self.loop is not None:
+            with suppress(RuntimeError): # the loop is already closed
+                self.loop.call_soon_threadsafe(self.task.cancel)
+
+    def next_game(self):
+        # Recycle the server after a number of games to avoid leaks in SC2 itself
+        if self.games_played >= self.pool.recycle_after or self.pool.closed or self not in self.pool.servers:
+            return None
+        # Only load a new game when there is room for another warm spare
+        self.pool.warm_permits.acquire()
+        if self.pool.closed:
+            return None
+        self.games_played += 1
+        slot = GameSlot(self.pool.map_name, self.pool.race, self.pool.difficulty, self.pool.bot_class)
+        with self.pool.lock:
+            slot.number = self.pool.games_started
+            self.pool.games_started += 1
+        # The game is warm once the bot has started, it then waits for its first action
+        slot.bot.on_ready = lambda: self.pool._game_ready(slot)
+        slot.loading_since = time.monotonic()
+        self.slot = slot
+        return slot
+
+
+class GamePool:
+    """Long-lived SC2 game servers shared by the episodes of one environment.
+
+    Each server keeps its SC2 process alive across episodes and loads the next
+    game as soon as there is room for a warm spare, so that acquire() usually
+    returns a game that is already waiting for its first action.
+
+    Servers that crash are replaced and the game they were playing fails. A
+    watchdog thread also replaces the servers whose game made no progress for
+    hang_timeout seconds while an environment was waiting for it, or did not
+    finish loading within load_timeout seconds. Every game holds a warm
+    permit from the start of its loading until acquire() takes it out of the
+    ready queue, or until its server stops before the game got there.
+    """
+
+    def __init__(self, map_name, race=Race.Terran, difficulty=Difficulty.Medium,
+                 size=2, warm_spares=1, recycle_after=20, host=host_sc2_games, bot_class=VRBot,
+                 hang_timeout=constants.GAME_HANG_TIMEOUT, load_timeout=constants.GAME_LOAD_TIMEOUT,
+                 watchdog_interval=constants.WATCHDOG_INTERVAL) -> None:
+        self.map_name = map_name
+        self.race = race
+        self.difficulty = difficulty
+        self.size = size
+        self.recycle_after = recycle_after
+        self.host = host
+        self.bot_class = bot_class
+        self.warm_permits = Semaphore(warm_spares)
+        self.ready = Queue()
+        self.closed = False
+        self.lock = Lock()
+        self.servers = []
+        self.games_started = 0
+        self.last_acquire_latency = None # seconds the last acquire() waited for its game
+        self.hang_timeout = hang_timeout
+        self.load_timeout = load_timeout
+        self.watchdog_interval = watchdog_interval
+        self.restarts = {"crashed": 0, "hung": 0, "abandoned": 0}
+        for _ in range(size):
+            self._start_server()
+        Thread(target=self.watch, daemon=True).start()
+
+    def _start_server(self):
+        server = GameThread(self)
+        self.servers.append(server)
+        server.start()
+
+    def _game_ready(self, slot):
+        # Called by the bot from its server thread, like the release of the permit in GameThread.run
+        slot.loading_since = None
+        self.ready.put(slot)
+
+    def _server_finished(self, server):
+        # Replace recycled (or crashed) servers to keep the pool at its size
+        with self.lock:
+            if server not in self.servers:
+                return # already replaced by restart()
+            self.servers.remove(server)
+            if server.slot is not None and server.slot.failed:
+                self.restarts["crashed"] += 1
+            if not self.closed:
+                self._start_server()
+
+    def restart(self, server, reason):
+        # Replaces a server right away and fails its game, then stops it
+        with self.lock:
+            if server not in self.servers:
+                return
+            self.servers.remove(server)
+            self.restarts[reason] += 1
+            if not self.closed:
+                self._start_server()
+        if server.slot is not None:
+            server.slot.fail(reason)
+        server.kill()
+
+    def abandon(self, slot):
+        # The environment gave up waiting for this game
+        for server in list(self.servers):
+            if server.slot is slot:
+                self.restart(server, "abandoned")
+                return
+        slot.fail("abandoned")
+
+    def watch(self):
+        while not self.closed:
+            time.sleep(self.watchdog_interval)
+            now = time.monotonic()
+            for server in list(self.servers):
+                slot = server.slot
+                if slot is None:
+                    continue
+                loading_since = slot.loading_since
+                if loading_since is not None:
+                    if now - loading_since > self.load_timeout:
+                        print(f"Game on {self.map_name} did not load in {self.load_timeout}s, restarting its server")
+                        self.restart(server, "hung")
+                    continue
+                waiting_since = slot.waiting_since
+                if waiting_since is None:
+                    continue
+                # The bot's heartbeat is the start of its last on_step
+                if now - max(waiting_since, slot.bot.last_heartbeat) > self.hang_timeout:
+                    print(f"Game on {self.map_name} made no progress for {self.hang_timeout}s, restarting its server")
+                    self.restart(server, "hung")
+
+    def acquire(self, timeout=None):
+        # Returns the next warm game and measures how long we waited for it,
+        # skipping the warm spares whose server crashed in the meantime
+        start = time.perf_counter()
+        while True:
+            remaining = None if timeout is None else max(0.0, timeout - (time.perf_counter() - start))
+            try:
+                slot = self.ready.get(timeout=remaining)
+            except Empty:
+                raise TimeoutError(f"No game of {self.map_name} could be loaded in {timeout}s") from None
+            self.warm_permits.release()
+            if not slot.failed:
+                break
+        self.last_acquire_latency = time.perf_counter() - start
+        return slot
+
+    def close(self):
+        self.closed = True
+        # Wake up the servers waiting for a warm permit so they can exit
+        for _ in range(self.size):
+            self.warm_permits.release()
+        # and stop the games still waiting for actions
+        for server in list(self.servers):
+            server.kill()
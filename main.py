@@ -1,32 +1,12 @@
 # General imports
-import numpy as np
 import time
-import csv
 import os
 import constants
-from queue import Queue
-from threading import Thread
 
-# OpenAI Gymnasium imports
-import gymnasium as gym
-from gymnasium.spaces import MultiDiscrete, Discrete, Box
-
-# StableBaselines3 imports
-from stable_baselines3 import PPO
-from stable_baselines3.common.vec_env import SubprocVecEnv
-from stable_baselines3.common.callbacks import CheckpointCallback
-
-# SC2 API imports
-from sc2.data import Difficulty, Race
-from sc2.main import run_game
-from sc2.player import Bot, Computer
-from sc2 import maps
-
-# Bot
-from VoidRayBot import VRBot
+# The environment, light enough for the env workers to import (see queue_env.py)
+from queue_env import QueueEnv, make_env
 
 # Global variables to pick the right experiment and WandB project.
-mapName = "AbyssalReefLE"
 episode_reward_list = []
 
 # Change the comments in the following two lines to create a new model 
@@ -35,78 +15,33 @@ model_name = f"{int(time.time())}"
 
 models_dir = f"models/{model_name}/"
 
-# This is the thread that holds the queues and runs the game
-class GameThread(Thread):
-    def __init__(self) -> None:
-        super().__init__()
-        self.action_in = Queue()
-        self.result_out = Queue()
-    
-    def run(self) -> None:
-        self.bot = VRBot(action_in=self.action_in, result_out=self.result_out)
-        print("starting game.")
-        result = run_game(  # run_game is a function that runs the game.
-            maps.get(mapName), # the map we are playing on
-            [Bot(Race.Protoss, self.bot), # runs our coded bot, and we pass our bot object 
-            Computer(Race.Terran, Difficulty.Medium)], # runs a pre-made computer agent, with a hard difficulty.
-            realtime=False, # When set to True, the agent is limited in how long each step can take to process.
-        )
-
-# This is the environment itself where Step and Reset are defined
-class QueueEnv(gym.Env):
-    def __init__(self, config=None, render_mode=None): # None, "human", "rgb_array"
-        super(QueueEnv, self).__init__()
-        self.action_space = Discrete(constants.NUMBER_OF_ACTIONS)
-        self.observation_space = constants.OBSERVATION_SPACE_ARRAY
-        self.current_episode_reward = 0 
-        self.rewards_file = os.path.join(models_dir, "episode_rewards.csv")  # Define el archivo CSV
-
-    def step(self, action):
-        # Send an action to the Bot
-        self.gameThread.action_in.put(action)
-
-        # Get the result
-        out = self.gameThread.result_out.get()               
-        observation = out["observation"].astype(np.int32)
-        reward = out["reward"]
-        done = out["done"]
-        truncated = out["truncated"]
-        info = out["info"]
-
-        self.current_episode_reward += reward 
+def train_ppo():
+    # Learner-only imports, loaded here so that importing this module stays cheap
+    # (multiprocessing runs it again in every worker process)
+    # StableBaselines3 imports
+    from stable_baselines3 import PPO
+    from stable_baselines3.common.vec_env import SubprocVecEnv
 
-        if done:
-            with open(self.rewards_file, 'a', newline='') as file:
-                writer = csv.writer(file)
-                if file.tell() == 0:
-                    writer.writerow(["Total Episode Reward"])
-                writer.writerow([self.current_episode_reward])
-            self.current_episode_reward = 0 
-        observation = np.clip(observation, 0, np.inf).astype(np.int32)
-        return observation, reward, done, truncated, info
-    
-    def reset(self, *, seed=None, options=None):
-        print("--- RESETTING ENVIRONMENT ---")
-        time.sleep(5)
-        observation = np.zeros((224, 224, 3), dtype=np.uint8)
-        info = {}
-        self.gameThread = GameThread()
-        self.gameThread.start()
-        return observation, info
+    # Shared memory observation transport
+    from shm_vec_env import SharedMemoryVecEnv
 
+    # Policy networks for the unit maps
+    from policies import policy_kwargs, policy_name
 
-def make_env():
-    def _init():
-        env = QueueEnv()
-        return env
-    return _init
+    # Hot-path instrumentation, background checkpoints and fault counters
+    from callbacks import PerfCallback, AsyncCheckpointCallback, FaultCallback
+    from checkpoints import AsyncCheckpointer
 
-def train_ppo():
     if not os.path.exists(models_dir):
         os.makedirs(models_dir)
     
     num_envs = constants.NUMBER_OF_CONCURRENT_EXECUTIONS
-    env = SubprocVecEnv([make_env() for i in range(num_envs)])
+    env_fns = [make_env(env_id=i, metrics_dir=os.path.join(models_dir, "metrics")) for i in range(num_envs)]
+    # The shared memory transport only carries the map, not dict observations
+    if constants.SHARED_MEMORY_OBSERVATIONS and not constants.OBSERVATION_STATS:
+        env = SharedMemoryVecEnv(env_fns, constants.OBSERVATION_SPACE_ARRAY)
+    else:
+        env = SubprocVecEnv(env_fns)
     model_path = os.path.join(models_dir, "model.zip")
 
     if os.path.exists(model_path):
@@ -114,21 +49,34 @@ def train_ppo():
         model = PPO.load(model_path, env=env, verbose=1, tensorboard_log=f"./ppo_tb_{model_name}")
     else:
         print("Creating new model")
-        model = PPO('CnnPolicy', env, n_steps=256, batch_size=32, verbose=2, tensorboard_log=f"./ppo_tb_{model_name}")
+        model = PPO(policy_name(), env, n_steps=256, batch_size=32, policy_kwargs=policy_kwargs(),
+                    verbose=2, tensorboard_log=f"./ppo_tb_{model_name}")
 
-    checkpoint_callback = CheckpointCallback(save_freq=10000, save_path=models_dir,
-                                             name_prefix='ppo_model')
+    checkpointer = AsyncCheckpointer(models_dir)
+    checkpoint_callback = AsyncCheckpointCallback(save_freq=constants.CHECKPOINT_FREQ, checkpointer=checkpointer,
+                                                  name_prefix='ppo_model')
+    callbacks = [checkpoint_callback, FaultCallback()]
+    if constants.PERF_INSTRUMENTATION:
+        callbacks.append(PerfCallback())
 
     iters = 0
-    while iters < constants.NUMBER_OF_ITERATIONS:
-        print(f"On iteration: {iters}")
-        iters += 1
-        model.learn(total_timesteps=constants.TIMESTEPS, reset_num_timesteps=False,
-                    tb_log_name=f"PPO_run_tb_{model_name}", callback=checkpoint_callback, progress_bar=True)
-        model.save(os.path.join(models_dir, "model"))
-
-    env.close()
+    try:
+        while iters < constants.NUMBER_OF_ITERATIONS:
+            print(f"On iteration: {iters}")
+            iters += 1
+            model.learn(total_timesteps=constants.TIMESTEPS, reset_num_timesteps=False,
+                        tb_log_name=f"PPO_run_tb_{model_name}", callback=callbacks, progress_bar=True)
+            # Written in the background, the next iteration starts right away
+            checkpointer.save(model, "model.zip", prune=False)
+    finally:
+        # Also on Ctrl-C or errors: lets the pending saves finish instead of dropping them
+        checkpointer.close()
+        env.close()
 
 if __name__ == "__main__":
-    train_ppo()
+    if constants.ACTOR_LEARNER:
+        from actor_learner import train_actor_learner
+        train_actor_learner(save_dir=models_dir)
+    else:
+        train_ppo()
     
\ No newline at end of file
@@ -0,0 +1,195 @@
+# General imports
+import json
+import os
+import sys
+import time
+from collections import deque
+import numpy as np
+
+import constants
+
+# Episode metrics of the environments, one append-only columnar log per env:
+#
+#   <root>/env_<id>/
+#     columns.json        name and dtype of every column
+#     reward.bin          float64  total reward of the episode
+#     length.bin          int64    number of env steps
+#     result.bin          uint8    index of the game result in RESULTS
+#     end_time.bin        float64  unix time at the end of the episode
+#     duration.bin        float64  wall seconds the episode took
+#     steps_per_sec.bin   float32  length / duration
+#
+# Every column is a flat array of fixed size records, appended in batches by
+# MetricsWriter. A reader only trusts the episodes present in every column
+# (the writer may be in the middle of a batch), and MetricsTailer remembers
+# how far it read each log so it only ever reads the new episodes. A batch
+# that failed halfway is cut off by the writer before it writes again, so
+# rows of the same episode always line up across the columns.
+
+COLUMNS = {
+    "reward": np.float64,
+    "length": np.int64,
+    "result": np.uint8,
+    "end_time": np.float64,
+    "duration": np.float64,
+    "steps_per_sec": np.float32,
+}
+RESULTS = ["Undecided", "Victory", "Defeat", "Tie"]
+
+
+class MetricsWriter:
+    """Buffers the episodes of one env and appends them to its columns.
+
+    The buffer goes to disk every flush_episodes episodes or flush_seconds
+    seconds, whichever comes first, and on close(). It is only cleared once
+    every column has been written.
+    """
+
+    def __init__(self, directory, flush_episodes=constants.METRICS_FLUSH_EPISODES,
+                 flush_seconds=constants.METRICS_FLUSH_SECONDS) -> None:
+        self.directory = directory
+        self.flush_episodes = flush_episodes
+        self.flush_seconds = flush_seconds
+        self.buffer = {name: [] for name in COLUMNS}
+        self.last_flush = time.monotonic()
+        os.makedirs(directory, exist_ok=True)
+        schema = os.path.join(directory, "columns.json")
+        if not os.path.exists(schema):
+            with open(schema, "w") as file:
+                json.dump({name: np.dtype(dtype).str for name, dtype in COLUMNS.items()}, file)
+        # Episodes complete in every column, e.g. left by a previous run that died mid-batch
+        self.episodes = min(MetricsTailer._records(directory, name, dtype) for name, dtype in COLUMNS.items())
+
+    def append(self, reward, length, result, duration, end_time=None):
+        result = RESULTS.index(result) if result in RESULTS else 0
+        row = {"reward": reward, "length": length, "result": result, "end_time": end_time or time.time(),
+               "duration": duration, "steps_per_sec": length / duration if duration > 0 else 0.0}
+        for name, value in row.items():
+            self.buffer[name].append(value)
+        if len(self.buffer["reward"]) >= self.flush_episodes or time.monotonic() - self.last_flush >= self.flush_seconds:
+            self.flush()
+
+    def flush(self):
+        self.last_flush = time.monotonic()
+        if not self.buffer["reward"]:
+            return
+        # Whatever a failed flush left past the complete episodes goes first,
+        # then the whole buffer is written again (e.g. once the disk has room)
+        for name, dtype in COLUMNS.items():
+            path = os.path.join(self.directory, f"{name}.bin")
+            complete = self.episodes * np.dtype(dtype).itemsize
+            if os.path.exists(path) and os.path.getsize(path) > complete:
+                os.truncate(path, complete)
+        for name, dtype in COLUMNS.items():
+            with open(os.path.join(self.directory, f"{name}.bin"), "ab") as file:
+                file.write(np.array(self.buffer[name], dtype=dtype).tobytes())
+        self.episodes += len(self.buffer["reward"])
+        self.buffer = {name: [] for name in COLUMNS}
+
+    def close(self):
+        self.flush()
+
+
+class MetricsTailer:
+    """Reads the episodes appended to the logs of every env since the last poll()."""
+
+    def __init__(self, root) -> None:
+        self.root = root
+        self.read = {} # episodes already read, per env directory
+
+    def poll(self):
+        # New episodes of all envs as a dict of columns (plus "env"), sorted by end time
+        new = {name: [] for name in COLUMNS}
+        new["env"] = []
+        if os.path.isdir(self.root):
+            for env in sorted(os.listdir(self.root)):
+                directory = os.path.join(self.root, env)
+                if not os.path.isdir(directory):
+                    continue
+                start = self.read.get(env, 0)
+                # Only the episodes present in every column, see MetricsWriter.flush
+                sizes = {name: self._records(directory, name, dtype) for name, dtype in COLUMNS.items()}
+                stop = min(sizes.values())
+                if stop <= start:
+                    continue
+                for name, dtype in COLUMNS.items():
+                    new[name].append(np.fromfile(os.path.join(directory, f"{name}.bin"), dtype=dtype,
+                                                 count=stop - start, offset=start * np.dtype(dtype).itemsize))
+                new["env"].append(np.full(stop - start, env))
+                self.read[env] = stop
+        columns = {name: np.concatenate(arrays) if arrays else np.array([], dtype=COLUMNS.get(name, str))
+                   for name, arrays in new.items()}
+        order = np.argsort(columns["end_time"], kind="stable")
+        return {name: values[order] for name, values in columns.items()}
+
+    @staticmethod
+    def _records(directory, name, dtype):
+        try:
+            return os.path.getsize(os.path.join(directory, f"{name}.bin")) // np.dtype(dtype).itemsize
+        except FileNotFoundError:
+            return 0
+
+
+class RollingStats:
+    """Running totals over every episode plus statistics over the last `window` ones.
+
+    Memory and the cost of update() only depend on the window and the number
+    of new episodes, not on how many episodes were seen before.
+    """
+
+    def __init__(self, window=1000) -> None:
+        self.window = window
+        self.episodes = 0
+        self.reward_sum = 0.0
+        self.reward_squares = 0.0
+        self.victories = 0
+        self.recent = {name: deque(maxlen=window) for name in ("reward", "length", "result", "duration")}
+
+    def update(self, columns):
+        rewards = columns["reward"]
+        self.episodes += len(rewards)
+        self.reward_sum += float(np.sum(rewards))
+        self.reward_squares += float(np.sum(np.square(rewards)))
+        self.victories += int(np.count_nonzero(columns["result"] == RESULTS.index("Victory")))
+        for name, recent in self.recent.items():
+            recent.extend(columns[name][-self.window:].tolist())
+
+    def summary(self):
+        if not self.episodes:
+            return {"episodes": 0}
+        mean = self.reward_sum / self.episodes
+        reward = np.array(self.recent["reward"])
+        durations = np.array(self.recent["duration"])
+        return {
+            "episodes": self.episodes,
+            "mean_reward": mean,
+            "std_reward": max(self.reward_squares / self.episodes - mean ** 2, 0.0) ** 0.5,
+            "win_rate": self.victories / self.episodes,
+            "window_episodes": len(reward),
+            "window_mean_reward": float(reward.mean()),
+            "window_std_reward": float(reward.std()),
+            "window_win_rate": float(np.mean(np.array(self.recent["result"]) == RESULTS.index("Victory"))),
+            "window_mean_length": float(np.mean(self.recent["length"])),
+            "window_steps_per_sec": float(np.sum(self.recent["length"]) / durations.sum()) if durations.sum() > 0 else 0.0,
+        }
+
+
+def follow(root, window=1000, interval=10.0):
+    # Prints the rolling statistics of a training run as its envs log episodes
+    tailer = MetricsTailer(root)
+    stats = RollingStats(window)
+    while True:
+        new = tailer.poll()
+        if len(new["reward"]):
+            stats.update(new)
+            summary = stats.summary()
+            print(f"Episodes {summary['episodes']} | mean reward {summary['mean_reward']:.1f} | "
+                  f"last {summary['window_episodes']}: reward {summary['window_mean_reward']:.1f} "
+                  f"(std {summary['window_std_reward']:.1f}), win rate {summary['window_win_rate']:.2f}, "
+                  f"length {summary['window_mean_length']:.0f}, {summary['window_steps_per_sec']:.1f} steps/s")
+        time.sleep(interval)
+
+
+if __name__ == "__main__":
+    # python metrics.py models/<model_name>/metrics [WINDOW]
+    follow(sys.argv[1], window=int(sys.argv[2]) if len(sys.argv) > 2 else 1000)
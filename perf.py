@@ -0,0 +1,108 @@
+# General imports
+import time
+from contextlib import nullcontext
+
+import constants
+
+# Optional hot-path timing. Stages are timed with `with perf.timed("bot/stage"):`
+# and aggregated per process into log2 histograms of microseconds, which the
+# environment periodically hands to the learner through its step info (see
+# callbacks.PerfCallback). When instrumentation is disabled, timed() returns
+# a shared no-op context manager and record() returns right away.
+
+enabled = constants.PERF_INSTRUMENTATION
+
+# Bucket i holds durations below 2**i microseconds
+NUMBER_OF_BUCKETS = 32
+
+_histograms = {}
+_disabled = nullcontext()
+
+
+class Histogram:
+    __slots__ = ("counts", "total", "maximum")
+
+    def __init__(self) -> None:
+        self.counts = [0] * NUMBER_OF_BUCKETS
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def add(self, seconds):
+        self.counts[min(int(seconds * 1e6).bit_length(), NUMBER_OF_BUCKETS - 1)] += 1
+        self.total += seconds
+        if seconds > self.maximum:
+            self.maximum = seconds
+
+    def as_dict(self):
+        return {"counts": self.counts, "total": self.total, "max": self.maximum}
+
+
+class _Timer:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage) -> None:
+        self.stage = stage
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.stage, time.perf_counter() - self.start)
+        return False
+
+
+def enable(value=True):
+    global enabled
+    enabled = value
+
+
+def timed(stage):
+    return _Timer(stage) if enabled else _disabled
+
+
+def record(stage, seconds):
+    if not enabled:
+        return
+    histogram = _histograms.get(stage)
+    if histogram is None:
+        histogram = _histograms[stage] = Histogram()
+    histogram.add(seconds)
+
+
+def drain():
+    # Returns the histograms recorded since the last call, as plain picklable dicts
+    global _histograms
+    snapshot, _histograms = _histograms, {}
+    return {stage: histogram.as_dict() for stage, histogram in snapshot.items()}
+
+
+def merge(into, histograms):
+    # Adds drained histograms (e.g. coming from several workers) into `into`
+    for stage, h in histograms.items():
+        if stage not in into:
+            into[stage] = {"counts": list(h["counts"]), "total": h["total"], "max": h["max"]}
+            continue
+        target = into[stage]
+        target["counts"] = [a + b for a, b in zip(target["counts"], h["counts"])]
+        target["total"] += h["total"]
+        target["max"] = max(target["max"], h["max"])
+    return into
+
+
+def summarize(histogram):
+    # Mean, approximate percentiles (upper bound of the bucket) and count, in milliseconds
+    counts = histogram["counts"]
+    n = sum(counts)
+    if n == 0:
+        return {"calls": 0}
+    summary = {"calls": n, "mean_ms": histogram["total"] / n * 1000, "max_ms": histogram["max"] * 1000}
+    for p in (50, 95, 99):
+        threshold = n * p / 100
+        seen = 0
+        for bucket, count in enumerate(counts):
+            seen += count
+            if seen >= threshold:
+                summary[f"p{p}_ms"] = (2 ** bucket) / 1000
+                break
+    return summary
@@ -0,0 +1,83 @@
+# Policy networks for the observations drawn by VRBot.visualize_intel
+import math
+import constants
+
+# PyTorch and StableBaselines3 imports
+import torch as th
+from torch import nn
+from gymnasium import spaces
+from stable_baselines3.common.torch_layers import BaseFeaturesExtractor
+
+
+class Scale(nn.Module):
+    # Multiplies by a constant, e.g. 1 / 255 to scale uint8 pixels to [0, 1]
+    def __init__(self, factor):
+        super().__init__()
+        self.factor = factor
+
+    def forward(self, x):
+        return x * self.factor
+
+
+class SparseMapExtractor(BaseFeaturesExtractor):
+    """Small CNN for the sparse unit maps, with the optional game stats.
+
+    The maps are mostly empty, with units drawn as a few pixels each. NatureCNN
+    runs 8x8 convolutions over every pixel of them; here they are max-pooled down
+    to at most input_side pixels per side first, which keeps every unit, and go
+    through three 3x3 convolutions of stride 2. They are only scaled to [0, 1]
+    after pooling, on a fraction of the pixels, so the policy is built with
+    normalize_images=False (see policy_kwargs). Takes either the map alone
+    (channels first, as VecTransposeImage hands it) or a dict of the "map" and
+    the "stats" of constants.STATS_SPACE.
+    """
+
+    def __init__(self, observation_space, features_dim=constants.POLICY_FEATURES,
+                 input_side=constants.POLICY_INPUT_SIDE, stats_dim=32):
+        if isinstance(observation_space, spaces.Dict):
+            map_space = observation_space["map"]
+            stats_space = observation_space.spaces.get("stats")
+        else:
+            map_space, stats_space = observation_space, None
+        channels, height, width = map_space.shape
+        map_features = features_dim - (stats_dim if stats_space is not None else 0)
+        super().__init__(observation_space, features_dim)
+
+        pool = math.ceil(max(height, width) / input_side)
+        self.cnn = nn.Sequential(
+            nn.MaxPool2d(pool, ceil_mode=True) if pool > 1 else nn.Identity(),
+            Scale(1 / 255),
+            nn.Conv2d(channels, 16, kernel_size=3, stride=2, padding=1),
+            nn.ReLU(),
+            nn.Conv2d(16, 32, kernel_size=3, stride=2, padding=1),
+            nn.ReLU(),
+            nn.Conv2d(32, 32, kernel_size=3, stride=2, padding=1),
+            nn.ReLU(),
+            nn.Flatten(),
+        )
+        with th.no_grad():
+            n_flatten = self.cnn(th.zeros(1, channels, height, width)).shape[1]
+        self.linear = nn.Sequential(nn.Linear(n_flatten, map_features), nn.ReLU())
+        self.stats = None
+        if stats_space is not None:
+            self.stats = nn.Sequential(nn.Linear(stats_space.shape[0], stats_dim), nn.ReLU())
+
+    def forward(self, observations):
+        if self.stats is None:
+            return self.linear(self.cnn(observations))
+        features = self.linear(self.cnn(observations["map"]))
+        return th.cat([features, self.stats(observations["stats"])], dim=1)
+
+
+def policy_kwargs(network=constants.POLICY_NETWORK):
+    # Arguments of the SB3 policy for one of the POLICY_NETWORK choices
+    if network == "nature_cnn":
+        return {}
+    if network == "sparse_cnn":
+        return {"features_extractor_class": SparseMapExtractor, "normalize_images": False}
+    raise ValueError(f"Unknown policy network {network}")
+
+
+def policy_name(stats=constants.OBSERVATION_STATS):
+    # Dict observations need the MultiInputPolicy of SB3
+    return "MultiInputPolicy" if stats else "CnnPolicy"
@@ -0,0 +1,177 @@
+# The training environment, a QueueEnv per env worker process.
+# Only imports what the env and the bots need: workers import this module, not
+# main.py, StableBaselines3 or torch (see env_worker.py).
+import numpy as np
+import time
+import os
+from queue import Empty
+import constants
+import perf
+
+# OpenAI Gymnasium imports
+import gymnasium as gym
+from gymnasium.spaces import Discrete, Dict
+
+# SC2 API imports
+from sc2.data import Difficulty, Race
+
+# Long-lived game servers
+from game_pool import GamePool
+
+# Experience recording for offline training and episode metrics
+from trajectory import TrajectoryRecorder
+from metrics import MetricsWriter
+
+# This is the environment itself where Step and Reset are defined
+class QueueEnv(gym.Env):
+    def __init__(self, config=None, render_mode=None, make_pool=None, observation_space=None, env_id=None,
+                 stats=constants.OBSERVATION_STATS, map_name=constants.MAP_NAME, race=Race.Terran,
+                 difficulty=Difficulty.Medium, metrics_dir=os.path.join("models", "metrics")): # None, "human", "rgb_array"
+        super(QueueEnv, self).__init__()
+        self.action_space = Discrete(constants.NUMBER_OF_ACTIONS)
+        # Has to match the observation mode of the bots of the pool, see OBSERVATION_MODE in constants.py
+        self.map_space = observation_space or constants.OBSERVATION_SPACE_ARRAY
+        self.stats = stats # observations are {"map", "stats"} dicts, see OBSERVATION_STATS in constants.py
+        if stats:
+            self.observation_space = Dict({"map": self.map_space, "stats": constants.STATS_SPACE})
+        else:
+            self.observation_space = self.map_space
+        self.current_episode_reward = 0 
+        self.current_episode_steps = 0
+        self.episode_start = None
+        self.env_id = os.getpid() if env_id is None else env_id
+        self.metrics = None # episode log of this env, see metrics.py
+        self.metrics_dir = metrics_dir # None to not log the episodes
+        self.map_name = map_name
+        # Pre-made computer agent we play against
+        self.race = race
+        self.difficulty = difficulty
+        self.make_pool = make_pool # builds the GamePool, e.g. simulator.simulated_pool; defaults to SC2 games
+        self.pool = None # created on the first reset, inside the worker process
+        self.game = None
+        self.obs_target = None # set by SharedMemoryVecEnv, the bot then renders straight into it
+        self.steps = 0
+        self.recorder = None # see RECORD_TRAJECTORIES in constants.py
+        self.step_timeout = constants.STEP_TIMEOUT
+        self.reset_timeout = constants.RESET_TIMEOUT
+        self.restarts = 0 # games given up on because they crashed or hung
+        self.lost_steps = 0 # steps of the episodes cut short by those
+
+    def step(self, action):
+        # Send an action to the Bot, telling it where to render the next observation
+        step_start = time.perf_counter()
+        self.game.bot.obs_out = self.obs_target
+        self.game.bot.observe_stats = self.stats
+        self.game.waiting_since = time.monotonic()
+        self.game.action_in.put(action)
+
+        # Get the result, unless the game crashed or hung (see GamePool.watch)
+        try:
+            out = self.game.result_out.get(timeout=self.step_timeout)
+        except Empty:
+            self.pool.abandon(self.game)
+            out = {"failed": "abandoned"}
+        self.game.waiting_since = None
+        if "failed" in out:
+            return self.truncate(action, out["failed"])
+        result_received = time.perf_counter()
+        observation = out["observation"]
+        reward = out["reward"]
+        done = out["done"]
+        truncated = out["truncated"]
+        info = out["info"]
+        info["result_wait"] = result_received - step_start # time spent waiting for the game
+        perf.record("env/result_wait", info["result_wait"])
+
+        self.current_episode_reward += reward 
+        self.current_episode_steps += 1
+        if self.recorder is not None:
+            self.recorder.step(action, reward, done, observation)
+        if self.stats:
+            # The last observation of a game has no stats
+            observation = {"map": observation, "stats": out.get("stats", self.empty_stats())}
+
+        if done:
+            self.log_episode(info.get("game_result"))
+
+        perf.record("env/postprocess", time.perf_counter() - result_received)
+        # Hand the timings of this worker to the learner every now and then
+        self.steps += 1
+        if perf.enabled and self.steps % constants.PERF_REPORT_INTERVAL == 0:
+            info["perf"] = perf.drain()
+        return observation, reward, done, truncated, info
+    
+    def truncate(self, action, reason):
+        # Ends the episode of a game that failed, the next reset gets a new game
+        print(f"Game {reason}, truncating the episode after {self.current_episode_steps} steps")
+        self.restarts += 1
+        self.lost_steps += self.current_episode_steps
+        observation = self.empty_map()
+        if self.recorder is not None:
+            self.recorder.step(action, 0, True, observation)
+        info = {"game_failure": reason, "lost_steps": self.current_episode_steps,
+                "env_restarts": self.restarts, "env_lost_steps": self.lost_steps}
+        self.log_episode("Undecided")
+        if self.stats:
+            observation = {"map": observation, "stats": self.empty_stats()}
+        return observation, 0, False, True, info
+
+    def empty_map(self):
+        if self.obs_target is not None:
+            observation = self.obs_target
+            observation.fill(0)
+            return observation
+        return np.zeros(self.map_space.shape, dtype=np.uint8)
+
+    def empty_stats(self):
+        return np.zeros(constants.STATS_SPACE.shape, dtype=np.float32)
+
+    def log_episode(self, game_result):
+        if self.metrics is None and self.metrics_dir is not None:
+            self.metrics = MetricsWriter(os.path.join(self.metrics_dir, f"env_{self.env_id}"))
+        if self.metrics is not None:
+            self.metrics.append(self.current_episode_reward, self.current_episode_steps, game_result,
+                                time.perf_counter() - self.episode_start)
+        self.current_episode_reward = 0
+        self.current_episode_steps = 0
+
+    def reset(self, *, seed=None, options=None):
+        print("--- RESETTING ENVIRONMENT ---")
+        if self.pool is None and self.make_pool is not None:
+            self.pool = self.make_pool()
+        elif self.pool is None:
+            self.pool = GamePool(self.map_name, self.race, self.difficulty,
+                                 size=constants.GAME_POOL_SIZE,
+                                 warm_spares=constants.GAME_POOL_WARM_SPARES,
+                                 recycle_after=constants.GAME_POOL_RECYCLE_AFTER)
+        # Waits until a game has been loaded, usually it already is
+        self.game = self.pool.acquire(timeout=self.reset_timeout)
+        reset_latency = self.pool.last_acquire_latency
+        print(f"Game ready after {reset_latency:.2f}s")
+        observation = self.empty_map()
+        if constants.RECORD_TRAJECTORIES:
+            if self.recorder is None:
+                directory = os.path.join(constants.TRAJECTORY_DIR, f"env_{os.getpid()}_{int(time.time())}")
+                self.recorder = TrajectoryRecorder(directory, self.map_space.shape,
+                                                   chunk_steps=constants.TRAJECTORY_CHUNK_STEPS)
+            self.recorder.start(observation)
+        if self.stats:
+            observation = {"map": observation, "stats": self.empty_stats()}
+        self.episode_start = time.perf_counter()
+        info = {"reset_latency": reset_latency}
+        return observation, info
+
+    def close(self):
+        if self.metrics is not None:
+            self.metrics.close()
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.pool is not None:
+            self.pool.close()
+
+
+def make_env(make_pool=None, env_id=None, stats=constants.OBSERVATION_STATS, metrics_dir=os.path.join("models", "metrics")):
+    def _init():
+        env = QueueEnv(make_pool=make_pool, env_id=env_id, stats=stats, metrics_dir=metrics_dir)
+        return env
+    return _init
@@ -1,14 +1,25 @@
-import pandas as pd
+import sys
+import numpy as np
 import matplotlib.pyplot as plt
 
-# Load the data
-data = pd.read_csv('models/1714143864/episode_rewards.csv')
+from metrics import MetricsTailer
+
+# Usage: python reward_plotter.py models/<model_name>/metrics [WINDOW]
+root = sys.argv[1]
+window = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+
+# Load the episodes of every env, in the order they ended
+data = MetricsTailer(root).poll()
+rewards = data["reward"]
+rolling = np.convolve(rewards, np.ones(window) / window, mode="valid") if len(rewards) >= window else rewards
 
 # Plot the data
 plt.figure(figsize=(15, 6))  # Set the figure size
-plt.plot(data['Total Episode Reward'], marker='o', linestyle='-')  # Line plot with markers
+plt.plot(rewards, marker='o', linestyle='-', alpha=0.3, label='Episode reward')  # Line plot with markers
+plt.plot(np.arange(len(rewards) - len(rolling), len(rewards)), rolling, label=f'Mean of the last {window}')
 plt.title('Total Episode Rewards Over Episodes')  # Title of the plot
 plt.xlabel('Episode')  # X-axis label
 plt.ylabel('Total Episode Reward')  # Y-axis label
+plt.legend()
 plt.grid(True)  # Enable grid
 plt.show()  # Display the plot
@@ -0,0 +1,85 @@
+# General imports
+import multiprocessing as mp
+import numpy as np
+
+# StableBaselines3 imports
+from stable_baselines3.common.vec_env import SubprocVecEnv, VecEnv
+
+# The worker side, which doesn't import StableBaselines3
+from env_worker import NUMBER_OF_BANKS, WORKER_PRELOAD, EnvFnWrapper, shm_worker, start_forkserver
+
+
+class SharedMemoryVecEnv(SubprocVecEnv):
+    """SubprocVecEnv that hands observations over through shared memory.
+
+    step_wait and reset return a view of the shared block with shape
+    (num_envs, *observation_shape), so no observation is pickled per step.
+    The number of observation bytes copied on the last step is kept in
+    bytes_copied_last_step (and in each info as "bytes_copied"). With the
+    forkserver start method, workers are forked from a server that has
+    preloaded the modules of WORKER_PRELOAD.
+    """
+
+    def __init__(self, env_fns, observation_space, start_method=None):
+        self.waiting = False
+        self.closed = False
+        n_envs = len(env_fns)
+        if start_method is None:
+            forkserver_available = "forkserver" in mp.get_all_start_methods()
+            start_method = "forkserver" if forkserver_available else "spawn"
+        ctx = mp.get_context(start_method)
+        if start_method == "forkserver":
+            start_forkserver(WORKER_PRELOAD)
+
+        # Only uint8 Box observations are supported, like the VRBot frames
+        assert observation_space.dtype == np.uint8, "SharedMemoryVecEnv only supports uint8 observations"
+        obs_shape = observation_space.shape
+        self.shared = ctx.RawArray("B", NUMBER_OF_BANKS * n_envs * int(np.prod(obs_shape)))
+        self.frames = np.frombuffer(self.shared, dtype=np.uint8).reshape(NUMBER_OF_BANKS, n_envs, *obs_shape)
+        self.bank = 0
+        self.bytes_copied = 0
+        self.bytes_copied_last_step = 0
+
+        self.remotes, self.work_remotes = zip(*[ctx.Pipe() for _ in range(n_envs)])
+        self.processes = []
+        for env_index, (work_remote, remote, env_fn) in enumerate(zip(self.work_remotes, self.remotes, env_fns)):
+            args = (work_remote, remote, EnvFnWrapper(env_fn), self.shared, env_index, obs_shape)
+            # daemon=True: if the main process crashes, we should not cause things to hang
+            process = ctx.Process(target=shm_worker, args=args, daemon=True)
+            process.start()
+            self.processes.append(process)
+            work_remote.close()
+
+        self.remotes[0].send(("get_spaces", None))
+        worker_observation_space, action_space = self.remotes[0].recv()
+        assert worker_observation_space.shape == obs_shape, "Observation space does not match the environments"
+
+        VecEnv.__init__(self, n_envs, worker_observation_space, action_space)
+
+    def _next_bank(self):
+        self.bank = (self.bank + 1) % NUMBER_OF_BANKS
+        return self.bank
+
+    def step_async(self, actions):
+        bank = self._next_bank()
+        for remote, action in zip(self.remotes, actions):
+            remote.send(("step", (action, bank)))
+        self.waiting = True
+
+    def step_wait(self):
+        results = [remote.recv() for remote in self.remotes]
+        self.waiting = False
+        rews, dones, infos, self.reset_infos = zip(*results)
+        self.bytes_copied_last_step = sum(info["bytes_copied"] for info in infos)
+        self.bytes_copied += self.bytes_copied_last_step
+        return self.frames[self.bank], np.stack(rews), np.stack(dones), infos
+
+    def reset(self):
+        bank = self._next_bank()
+        for env_idx, remote in enumerate(self.remotes):
+            remote.send(("reset", (self._seeds[env_idx], self._options[env_idx], bank)))
+        self.reset_infos = [remote.recv() for remote in self.remotes]
+        # Seeds and options are only used once
+        self._reset_seeds()
+        self._reset_options()
+        return self.frames[bank]
@@ -0,0 +1,702 @@
+# General imports
+import asyncio
+import math
+import random
+from functools import partial
+
+# SC2 API imports (only the Python side of burnysc2, no game binary needed)
+from sc2.data import Difficulty, Race, Result
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.position import EPSILON, Point2, Rect
+
+# Bot
+from VoidRayBot import VRBot
+from game_pool import GamePool
+
+# A lightweight, deterministic stand-in for an SC2 game. It implements the
+# subset of the burnysc2 BotAI surface that VRBot uses, so the whole
+# QueueEnv -> VRBot -> PPO loop can run on machines without the game binaries.
+# The economy and combat rules are deliberately crude: the goal is to exercise
+# the code paths and their costs, not to be a faithful SC2 model.
+
+# Game loops advanced per on_step, like burnysc2's default game_step
+GAME_STEP = 8
+LOOPS_PER_SECOND = 22.4
+
+MAP_SIZE = (184, 176)
+PLAYABLE_AREA = Rect((16, 12, 152, 152))
+
+# minerals, vespene, supply, build time (seconds), health
+UNIT_DATA = {
+    UnitTypeId.PROBE: (50, 0, 1, 12, 40),
+    UnitTypeId.VOIDRAY: (250, 150, 4, 43, 250),
+    UnitTypeId.NEXUS: (400, 0, 0, 71, 2000),
+    UnitTypeId.PYLON: (100, 0, 0, 18, 400),
+    UnitTypeId.ASSIMILATOR: (75, 0, 0, 21, 450),
+    UnitTypeId.GATEWAY: (150, 0, 0, 46, 1000),
+    UnitTypeId.CYBERNETICSCORE: (150, 0, 0, 36, 1100),
+    UnitTypeId.STARGATE: (150, 150, 0, 43, 1200),
+    UnitTypeId.MARINE: (50, 0, 1, 18, 45),
+    UnitTypeId.COMMANDCENTER: (400, 0, 0, 71, 1500),
+}
+STRUCTURES = {UnitTypeId.NEXUS, UnitTypeId.PYLON, UnitTypeId.ASSIMILATOR, UnitTypeId.GATEWAY,
+              UnitTypeId.CYBERNETICSCORE, UnitTypeId.STARGATE, UnitTypeId.COMMANDCENTER}
+# Structure required before another one can be built
+REQUIREMENTS = {
+    UnitTypeId.GATEWAY: UnitTypeId.PYLON,
+    UnitTypeId.CYBERNETICSCORE: UnitTypeId.GATEWAY,
+    UnitTypeId.STARGATE: UnitTypeId.CYBERNETICSCORE,
+}
+# damage per second, range, speed
+COMBAT_DATA = {
+    UnitTypeId.VOIDRAY: (17.0, 6.0, 3.85),
+    UnitTypeId.MARINE: (9.8, 5.0, 3.15),
+    UnitTypeId.PROBE: (0.0, 0.0, 3.94),
+}
+# Cell size of the grid enemies use to find targets, at least the longest attack range
+DEFENSE_CELL = 8
+MINERALS_PER_WORKER_SECOND = 0.94
+VESPENE_PER_ASSIMILATOR_SECOND = 2.7
+# Minerals per second the computer buys its waves with, per difficulty. The
+# stand-in only models the computer through that income, so these are rough
+# estimates of how strong the economy of each level is, not measurements:
+#   - VeryEasy to VeryHard don't cheat, they differ in how well they macro
+#     (workers, expansions), from a trickle up to twice the income of Medium,
+#     which keeps the 4/s the simulator always used,
+#   - CheatVision only sees the whole map, which the stand-in doesn't model,
+#     so it plays like VeryHard,
+#   - CheatMoney and CheatInsane get extra resources from the game: 1.5 and 2
+#     times VeryHard here (CheatInsane also sees the map and harvests faster).
+ENEMY_INCOME = {
+    Difficulty.VeryEasy: 1.0,
+    Difficulty.Easy: 2.0,
+    Difficulty.Medium: 4.0,
+    Difficulty.MediumHard: 5.0,
+    Difficulty.Hard: 6.0,
+    Difficulty.Harder: 7.0,
+    Difficulty.VeryHard: 8.0,
+    Difficulty.CheatVision: 8.0,
+    Difficulty.CheatMoney: 12.0,
+    Difficulty.CheatInsane: 16.0,
+}
+
+
+class SimulatorConfig:
+    """Knobs of the stand-in game.
+
+    own_units and enemy_units add that many extra units around each base at
+    the start of every game, to stress the per-unit code paths of VRBot.
+    crash_rate and hang_rate are the probabilities, per game step, that the
+    game raises an exception or stops answering, to test fault recovery.
+    load_crash_rate and load_hang_rate are the probabilities, per game, that
+    it does so while loading, before the bot has started.
+    """
+
+    def __init__(self, seed=0, own_units=0, enemy_units=0, enemy_wave_interval=90, time_limit=30 * 60 + 30,
+                 crash_rate=0.0, hang_rate=0.0, load_crash_rate=0.0, load_hang_rate=0.0) -> None:
+        self.seed = seed
+        self.own_units = own_units
+        self.enemy_units = enemy_units
+        self.enemy_wave_interval = enemy_wave_interval
+        self.time_limit = time_limit
+        self.crash_rate = crash_rate
+        self.hang_rate = hang_rate
+        self.load_crash_rate = load_crash_rate
+        self.load_hang_rate = load_hang_rate
+
+
+def _position(target):
+    return target.position if hasattr(target, "position") else Point2(target)
+
+
+class SimUnit:
+    __slots__ = ("game", "tag", "type_id", "position", "health", "health_max", "is_mine", "is_structure",
+                 "build_progress", "queue", "order", "target", "mineral_contents", "vespene_contents", "is_visible", "combat")
+
+    def __init__(self, game, type_id, position, is_mine, build_progress=1.0) -> None:
+        self.game = game
+        self.tag = game.next_tag()
+        self.type_id = type_id
+        self.position = Point2(position)
+        self.health_max = UNIT_DATA[type_id][4] if type_id in UNIT_DATA else 0
+        self.health = self.health_max * max(build_progress, 0.1)
+        self.is_mine = is_mine
+        self.is_structure = type_id in STRUCTURES
+        self.build_progress = build_progress
+        self.queue = [] # [unit type, seconds left] of the units being trained
+        self.order = None # "attack", "move" or "gather"
+        self.target = None
+        self.mineral_contents = 0
+        self.vespene_contents = 0
+        self.is_visible = True
+        self.combat = COMBAT_DATA.get(type_id, (0.0, 0.0, 3.0))
+
+    @property
+    def is_ready(self):
+        return self.build_progress >= 1.0
+
+    @property
+    def is_idle(self):
+        return not self.queue if self.is_structure else self.order is None
+
+    @property
+    def is_attacking(self):
+        return self.order == "attack"
+
+    @property
+    def target_in_range(self):
+        if self.order != "attack" or not isinstance(self.target, SimUnit):
+            return False
+        return self.distance_to(self.target) <= self.combat[1]
+
+    def distance_to(self, target):
+        p = _position(target)
+        return math.hypot(self.position[0] - p[0], self.position[1] - p[1])
+
+    def train(self, unit_type):
+        if self.is_ready and self.game.spend(unit_type):
+            self.queue.append([unit_type, UNIT_DATA[unit_type][3]])
+
+    def build(self, unit_type, target):
+        # Protoss warp-in: the structure appears right away, under construction
+        if self.game.spend(unit_type):
+            self.game.add_unit(unit_type, _position(target), True, build_progress=0.0)
+
+    def attack(self, target):
+        self.order, self.target = "attack", target
+
+    def move(self, target):
+        self.order, self.target = "move", _position(target)
+
+    def gather(self, target=None):
+        self.order, self.target = "gather", target
+
+
+class SimUnits(list):
+    # The part of burnysc2's Units collection that VRBot uses
+
+    def __call__(self, unit_types):
+        return self.of_type(unit_types)
+
+    def subgroup(self, units):
+        return SimUnits(units)
+
+    def filter(self, pred):
+        return SimUnits(u for u in self if pred(u))
+
+    def of_type(self, unit_types):
+        if isinstance(unit_types, UnitTypeId):
+            return SimUnits(u for u in self if u.type_id == unit_types)
+        unit_types = set(unit_types)
+        return SimUnits(u for u in self if u.type_id in unit_types)
+
+    @property
+    def amount(self):
+        return len(self)
+
+    @property
+    def exists(self):
+        return bool(self)
+
+    @property
+    def empty(self):
+        return not self
+
+    @property
+    def first(self):
+        return self[0]
+
+    @property
+    def random(self):
+        return random.choice(self)
+
+    @property
+    def ready(self):
+        return SimUnits(u for u in self if u.is_ready)
+
+    @property
+    def not_ready(self):
+        return SimUnits(u for u in self if not u.is_ready)
+
+    @property
+    def idle(self):
+        return SimUnits(u for u in self if u.is_idle)
+
+    @property
+    def structure(self):
+        return SimUnits(u for u in self if u.is_structure)
+
+    @property
+    def not_structure(self):
+        return SimUnits(u for u in self if not u.is_structure)
+
+    def closest_to(self, target):
+        p = _position(target)
+        return min(self, key=lambda u: (u.position[0] - p[0]) ** 2 + (u.position[1] - p[1]) ** 2)
+
+    def closer_than(self, distance, target):
+        p = _position(target)
+        limit = distance ** 2
+        return SimUnits(u for u in self if (u.position[0] - p[0]) ** 2 + (u.position[1] - p[1]) ** 2 < limit)
+
+    def further_than(self, distance, target):
+        p = _position(target)
+        limit = distance ** 2
+        return SimUnits(u for u in self if (u.position[0] - p[0]) ** 2 + (u.position[1] - p[1]) ** 2 > limit)
+
+
+class SimGameInfo:
+    def __init__(self, start_location, enemy_start) -> None:
+        self.map_name = "Simulated"
+        self.map_size = MAP_SIZE
+        self.playable_area = PLAYABLE_AREA
+        self.map_center = Point2((PLAYABLE_AREA.x + PLAYABLE_AREA.width / 2, PLAYABLE_AREA.y + PLAYABLE_AREA.height / 2))
+        self.player_start_location = start_location
+        self.start_locations = [enemy_start]
+
+
+class SimClient:
+    def __init__(self) -> None:
+        self.left = False
+
+    async def leave(self):
+        self.left = True
+
+    async def query_pathing(self, start, end):
+        # There is nothing in the way on the stand-in map
+        return _position(start).distance_to_point2(_position(end))
+
+
+class SimulatedGame:
+    """One game of the stand-in simulator, played by a bot using SimulatedBotAI.
+
+    The difficulty of the computer sets its income (see ENEMY_INCOME). Its
+    race and the map are ignored.
+    """
+
+    def __init__(self, bot, config=None, seed=0, difficulty=Difficulty.Medium) -> None:
+        self.bot = bot
+        self.config = config or SimulatorConfig()
+        self.enemy_income = ENEMY_INCOME[difficulty]
+        self.rng = random.Random(seed)
+        self.fault_rng = random.Random(f"faults {seed}")
+        self.game_loop = 0
+        self.tags = 0
+        self.minerals = 50
+        self.vespene = 0
+        self.enemy_minerals = 0
+        # Every unit in the order it was added, and the same units split by owner and kind.
+        # Kept up to date as units are added and die, instead of sorted again on every step.
+        self.units = []
+        self.own = []
+        self.own_units = []
+        self.own_structures = []
+        self.enemy = []
+        self.enemy_units = []
+        self.enemy_structures = []
+        self.unit_supply = 0 # of our units, not counting the ones being trained
+        self.dead_tags = []
+        self.deaths = False
+        self.supply_cache = None
+        self.visible_from = None
+        self.client = SimClient()
+        self.start_location = Point2((44.5, 36.5))
+        self.enemy_start = Point2((139.5, 139.5))
+        self.game_info = SimGameInfo(self.start_location, self.enemy_start)
+        # Symmetric expansions around both mains
+        base_offsets = [(0, 0), (30, 2), (2, 32), (40, 40)]
+        self.expansions = [Point2((self.start_location.x + dx, self.start_location.y + dy)) for dx, dy in base_offsets]
+        self.expansions += [Point2((self.enemy_start.x - dx, self.enemy_start.y - dy)) for dx, dy in base_offsets]
+        self.setup()
+
+    @property
+    def time(self):
+        return self.game_loop / LOOPS_PER_SECOND
+
+    def next_tag(self):
+        self.tags += 1
+        return self.tags
+
+    def add_unit(self, type_id, position, is_mine, build_progress=1.0):
+        unit = SimUnit(self, type_id, position, is_mine, build_progress)
+        self.units.append(unit)
+        if is_mine:
+            self.own.append(unit)
+            if unit.is_structure:
+                self.own_structures.append(unit)
+            else:
+                self.own_units.append(unit)
+                self.unit_supply += UNIT_DATA[type_id][2]
+        else:
+            self.enemy.append(unit)
+            (self.enemy_structures if unit.is_structure else self.enemy_units).append(unit)
+        self.supply_cache = None
+        return unit
+
+    def remove_dead(self):
+        self.dead_tags = [u.tag for u in self.units if u.health <= 0]
+        self.unit_supply -= sum(UNIT_DATA[u.type_id][2] for u in self.own_units if u.health <= 0)
+        self.units = [u for u in self.units if u.health > 0]
+        self.own = [u for u in self.own if u.health > 0]
+        self.own_units = [u for u in self.own_units if u.health > 0]
+        self.own_structures = [u for u in self.own_structures if u.health > 0]
+        self.enemy = [u for u in self.enemy if u.health > 0]
+        self.enemy_units = [u for u in self.enemy_units if u.health > 0]
+        self.enemy_structures = [u for u in self.enemy_structures if u.health > 0]
+
+    def add_resource(self, type_id, position):
+        unit = SimUnit(self, type_id, position, False)
+        unit.mineral_contents = 1800 if type_id == UnitTypeId.MINERALFIELD else 0
+        unit.vespene_contents = 2250 if type_id == UnitTypeId.VESPENEGEYSER else 0
+        self.resources.append(unit)
+
+    def scatter(self, center, radius):
+        return Point2((center.x + self.rng.uniform(-radius, radius), center.y + self.rng.uniform(-radius, radius)))
+
+    def setup(self):
+        self.resources = []
+        for base in self.expansions:
+            for i in range(8):
+                self.add_resource(UnitTypeId.MINERALFIELD, (base.x - 7 + (i % 2), base.y - 3.5 + i))
+            self.add_resource(UnitTypeId.VESPENEGEYSER, (base.x + 3.5, base.y + 7.5))
+            self.add_resource(UnitTypeId.VESPENEGEYSER, (base.x + 7.5, base.y - 3.5))
+        self.add_unit(UnitTypeId.NEXUS, self.start_location, True)
+        for _ in range(12):
+            self.add_unit(UnitTypeId.PROBE, self.scatter(self.start_location, 4), True).gather()
+        self.add_unit(UnitTypeId.COMMANDCENTER, self.enemy_start, False)
+        for _ in range(8):
+            self.add_unit(UnitTypeId.MARINE, self.scatter(self.enemy_start, 6), False)
+        # Extra load requested by the configuration
+        for _ in range(self.config.own_units):
+            self.add_unit(UnitTypeId.PROBE, self.scatter(self.start_location, 10), True).gather()
+        for _ in range(self.config.enemy_units):
+            self.add_unit(UnitTypeId.MARINE, self.scatter(self.enemy_start, 12), False)
+
+    # Economy
+
+    def supply(self):
+        # Cached until units are added, trained or the game advances
+        if self.supply_cache is None:
+            self.supply_cache = self.count_supply()
+        return self.supply_cache
+
+    def count_supply(self):
+        cap = 0
+        used = self.unit_supply
+        for u in self.own_structures:
+            if u.is_ready and u.type_id == UnitTypeId.NEXUS:
+                cap += 15
+            elif u.is_ready and u.type_id == UnitTypeId.PYLON:
+                cap += 8
+            used += sum(UNIT_DATA[t][2] for t, _ in u.queue)
+        return min(cap, 200), used
+
+    def can_afford(self, unit_type, check_supply_cost=True):
+        minerals, vespene, supply = UNIT_DATA[unit_type][:3]
+        if minerals > self.minerals or vespene > self.vespene:
+            return False
+        if check_supply_cost and supply:
+            cap, used = self.supply()
+            return cap - used >= supply
+        return True
+
+    def requirement_met(self, unit_type):
+        required = REQUIREMENTS.get(unit_type)
+        return required is None or any(u.is_ready and u.type_id == required for u in self.own_structures)
+
+    def spend(self, unit_type):
+        if not self.can_afford(unit_type) or not self.requirement_met(unit_type):
+            return False
+        self.minerals -= UNIT_DATA[unit_type][0]
+        self.vespene -= UNIT_DATA[unit_type][1]
+        self.supply_cache = None
+        return True
+
+    def find_placement(self, unit_type, near, max_distance=20):
+        # Spiral around the requested position until nothing is in the way
+        near = _position(near)
+        blockers = [u.position for u in self.own_structures + self.enemy_structures] + [r.position for r in self.resources]
+        for radius in range(0, max_distance, 2):
+            for step in range(max(1, radius * 4)):
+                angle = 2 * math.pi * step / max(1, radius * 4)
+                p = Point2((near.x + radius * math.cos(angle), near.y + radius * math.sin(angle)))
+                if not (PLAYABLE_AREA.x <= p.x < PLAYABLE_AREA.x + PLAYABLE_AREA.width
+                        and PLAYABLE_AREA.y <= p.y < PLAYABLE_AREA.y + PLAYABLE_AREA.height):
+                    continue
+                if all((p.x - b[0]) ** 2 + (p.y - b[1]) ** 2 >= 9 for b in blockers):
+                    return p
+        return None
+
+    # Simulation
+
+    def prepare(self, bot):
+        # Fills the bot attributes the way BotAI._prepare_step does
+        bot._structures_previous_map = {s.tag: s for s in getattr(bot, "structures", ())}
+        bot._enemy_structures_previous_map = {s.tag: s for s in getattr(bot, "enemy_structures", ())}
+        # Copies, so that the bot keeps the units of this step even if the game adds some
+        bot.all_own_units = SimUnits(self.own)
+        bot.units = SimUnits(self.own_units)
+        bot.structures = SimUnits(self.own_structures)
+        bot.workers = bot.units(UnitTypeId.PROBE)
+        bot.townhalls = bot.structures(UnitTypeId.NEXUS)
+        bot.all_enemy_units = SimUnits(self.enemy)
+        bot.enemy_units = SimUnits(self.enemy_units)
+        bot.enemy_structures = SimUnits(self.enemy_structures)
+        # Resources are visible around our town halls, only recomputed when those change
+        nexuses = tuple(u.position for u in bot.townhalls)
+        if nexuses != self.visible_from:
+            self.visible_from = nexuses
+            for r in self.resources:
+                r.is_visible = any((r.position[0] - p[0]) ** 2 + (r.position[1] - p[1]) ** 2 < 225 for p in nexuses)
+        bot.mineral_field = SimUnits(r for r in self.resources if r.type_id == UnitTypeId.MINERALFIELD and r.mineral_contents > 0)
+        bot.vespene_geyser = SimUnits(r for r in self.resources if r.type_id == UnitTypeId.VESPENEGEYSER)
+        cap, used = self.supply()
+        bot.supply_cap, bot.supply_used, bot.supply_left = cap, used, cap - used
+
+    def advance(self):
+        dt = GAME_STEP / LOOPS_PER_SECOND
+        self.game_loop += GAME_STEP
+        self.supply_cache = None
+        gatherers = sum(1 for u in self.own_units if u.order == "gather")
+        assimilators = sum(1 for u in self.own_structures if u.is_ready and u.type_id == UnitTypeId.ASSIMILATOR)
+        nexuses = sum(1 for u in self.own_structures if u.is_ready and u.type_id == UnitTypeId.NEXUS)
+        self.minerals += min(gatherers, 16 * nexuses) * MINERALS_PER_WORKER_SECOND * dt
+        self.vespene += assimilators * VESPENE_PER_ASSIMILATOR_SECOND * dt
+        self.enemy_minerals += self.enemy_income * dt
+
+        # Our units bucketed on a coarse grid, for the enemies looking for something to shoot at,
+        # and the cells next to any of them, where enemies have to look at all
+        self.own_cells = {}
+        for u in self.own:
+            x, y = u.position
+            self.own_cells.setdefault((int(x // DEFENSE_CELL), int(y // DEFENSE_CELL)), []).append((u, x, y))
+        self.defended_cells = {(cx + dx, cy + dy) for cx, cy in self.own_cells for dx in (-1, 0, 1) for dy in (-1, 0, 1)}
+        self.deaths = False
+        for unit in list(self.units):
+            if unit.is_structure:
+                self.advance_structure(unit, dt)
+            else:
+                self.advance_unit(unit, dt)
+        if self.deaths:
+            self.remove_dead()
+        else:
+            self.dead_tags = []
+        self.enemy_ai()
+
+    def advance_structure(self, unit, dt):
+        if not unit.is_ready:
+            unit.build_progress = min(1.0, unit.build_progress + dt / UNIT_DATA[unit.type_id][3])
+            unit.health = max(unit.health, unit.health_max * unit.build_progress)
+            return
+        if unit.queue:
+            unit.queue[0][1] -= dt
+            if unit.queue[0][1] <= 0:
+                unit_type = unit.queue.pop(0)[0]
+                spawned = self.add_unit(unit_type, self.scatter(unit.position, 3), unit.is_mine)
+                if unit_type == UnitTypeId.PROBE:
+                    spawned.gather()
+
+    def advance_unit(self, unit, dt):
+        damage, attack_range, speed = unit.combat
+        if unit.order == "attack":
+            target = unit.target
+            if isinstance(target, SimUnit):
+                if target.health <= 0:
+                    unit.order, unit.target = None, None
+                    return
+                if unit.distance_to(target) <= attack_range:
+                    target.health -= damage * dt
+                    if target.health <= 0:
+                        self.deaths = True
+                    return
+            self.move_towards(unit, _position(target), speed * dt)
+            if not isinstance(target, SimUnit) and unit.distance_to(target) < 1:
+                unit.order, unit.target = None, None
+        elif unit.order == "move":
+            self.move_towards(unit, unit.target, speed * dt)
+            if unit.distance_to(unit.target) < 1:
+                unit.order, unit.target = None, None
+        elif not unit.is_mine and damage > 0:
+            # Enemy units defend themselves against anything in range
+            x, y = unit.position
+            cx, cy = int(x // DEFENSE_CELL), int(y // DEFENSE_CELL)
+            if (cx, cy) not in self.defended_cells:
+                return
+            # Neighbour cells further away than the range can't hold anything to shoot at
+            fx, fy = x - cx * DEFENSE_CELL, y - cy * DEFENSE_CELL
+            dxs = [d for d, gap in ((-1, fx), (0, 0), (1, DEFENSE_CELL - fx)) if gap <= attack_range]
+            dys = [d for d, gap in ((-1, fy), (0, 0), (1, DEFENSE_CELL - fy)) if gap <= attack_range]
+            limit = attack_range ** 2
+            for dx in dxs:
+                for dy in dys:
+                    for other, ox, oy in self.own_cells.get((cx + dx, cy + dy), ()):
+                        if (ox - x) ** 2 + (oy - y) ** 2 <= limit and other.health > 0:
+                            unit.attack(other)
+                            return
+
+    def move_towards(self, unit, target, distance):
+        # Point2.towards without its overhead, which showed up first once armies move
+        x, y = unit.position
+        tx, ty = target[0], target[1]
+        if abs(tx - x) <= EPSILON and abs(ty - y) <= EPSILON:
+            return
+        d = math.hypot(x - tx, y - ty)
+        distance = min(distance, d)
+        unit.position = Point2((x + (tx - x) / d * distance, y + (ty - y) / d * distance))
+
+    def enemy_ai(self):
+        # The computer trains marines from its command centers and sends them in waves
+        for cc in self.enemy_structures:
+            if cc.type_id == UnitTypeId.COMMANDCENTER and not cc.queue and self.enemy_minerals >= 50:
+                self.enemy_minerals -= 50
+                cc.queue.append([UnitTypeId.MARINE, UNIT_DATA[UnitTypeId.MARINE][3]])
+        if self.game_loop % int(self.config.enemy_wave_interval * LOOPS_PER_SECOND) < GAME_STEP:
+            for marine in self.enemy_units:
+                if marine.type_id == UnitTypeId.MARINE and marine.is_idle:
+                    marine.attack(self.start_location)
+
+    def result(self):
+        if self.client.left:
+            return Result.Defeat
+        if not self.own_structures:
+            return Result.Defeat
+        if not self.enemy_structures:
+            return Result.Victory
+        if self.time > self.config.time_limit:
+            return Result.Tie
+        return None
+
+    async def issue_events(self, bot):
+        # The unit events of BotAI._issue_events that VRBot listens to
+        for tag in self.dead_tags:
+            await bot.on_unit_destroyed(tag)
+        for structure in bot.structures:
+            if structure.tag not in bot._structures_previous_map and not structure.is_ready:
+                await bot.on_building_construction_started(structure)
+
+    async def inject_faults(self, crash_rate, hang_rate):
+        # Uses its own random generator so games without faults stay the same
+        if crash_rate <= 0 and hang_rate <= 0:
+            return
+        roll = self.fault_rng.random()
+        if roll < crash_rate:
+            raise RuntimeError("Injected crash")
+        if roll < crash_rate + hang_rate:
+            await asyncio.Event().wait() # a game server that stopped answering
+
+    async def play(self):
+        bot = self.bot
+        bot.simulation = self
+        # Bots use the global random module (e.g. Units.random), keep it deterministic
+        random.seed(self.rng.random())
+        self.prepare(bot)
+        # The game is still loading until on_start, where the bot becomes ready
+        await self.inject_faults(self.config.load_crash_rate, self.config.load_hang_rate)
+        await bot.on_start()
+        iteration = 0
+        while True:
+            result = self.result()
+            if result is not None:
+                await bot.on_end(result)
+                return result
+            await self.inject_faults(self.config.crash_rate, self.config.hang_rate)
+            self.prepare(bot)
+            await self.issue_events(bot)
+            await bot.on_step(iteration)
+            iteration += 1
+            self.advance()
+
+
+class SimulatedBotAI:
+    """Mixin providing the BotAI surface on top of a SimulatedGame.
+
+    It has to come before the bot class in the bases, so that its members
+    take precedence over the ones of the real BotAI.
+    """
+
+    simulation = None
+
+    @property
+    def time(self):
+        return self.simulation.time
+
+    @property
+    def game_info(self):
+        return self.simulation.game_info
+
+    @property
+    def client(self):
+        return self.simulation.client
+
+    @property
+    def start_location(self):
+        return self.simulation.start_location
+
+    @property
+    def enemy_start_locations(self):
+        return self.simulation.game_info.start_locations
+
+    @property
+    def minerals(self):
+        return self.simulation.minerals
+
+    @property
+    def expansion_locations_list(self):
+        return self.simulation.expansions
+
+    @property
+    def vespene(self):
+        return self.simulation.vespene
+
+    def can_afford(self, item_id, check_supply_cost=True):
+        return self.simulation.can_afford(item_id, check_supply_cost)
+
+    def already_pending(self, unit_type):
+        pending = sum(1 for s in self.structures if s.type_id == unit_type and not s.is_ready)
+        for s in self.structures:
+            pending += sum(1 for t, _ in s.queue if t == unit_type)
+        return pending
+
+    def select_build_worker(self, pos, force=False):
+        workers = self.workers
+        return workers.closest_to(pos) if workers else None
+
+    async def find_placement(self, building, near, max_distance=20, random_alternative=True, placement_step=2):
+        return self.simulation.find_placement(building, near, max_distance)
+
+    async def build(self, building, near, max_distance=20, build_worker=None, random_alternative=True, placement_step=2):
+        p = await self.find_placement(building, near, max_distance)
+        if p is None:
+            return False
+        builder = build_worker or self.select_build_worker(p)
+        if builder is None or not self.can_afford(building):
+            return False
+        builder.build(building, p)
+        return True
+
+    async def distribute_workers(self, resource_ratio=2):
+        for worker in self.workers.idle:
+            worker.gather()
+
+
+class SimulatedVRBot(SimulatedBotAI, VRBot):
+    pass
+
+
+async def host_simulated_games(next_game, config=None):
+    # Drop-in replacement for game_pool.host_sc2_games that plays stand-in games.
+    # Games are seeded with their number in the pool, which no other server of the pool uses.
+    config = config or SimulatorConfig()
+    while True:
+        slot = next_game()
+        if slot is None:
+            return
+        slot.seed = config.seed + slot.number
+        slot.result = await SimulatedGame(slot.bot, config, seed=slot.seed, difficulty=slot.difficulty).play()
+
+
+def simulated_pool(config=None, map_name="Simulated", race=Race.Terran, difficulty=Difficulty.Medium,
+                   bot_class=SimulatedVRBot, **pool_kwargs):
+    # A GamePool whose games are played by the stand-in simulator
+    return GamePool(map_name, race, difficulty, host=partial(host_simulated_games, config=config),
+                    bot_class=bot_class, **pool_kwargs)
@@ -0,0 +1,97 @@
+# Own units and structures of one game step, grouped once and queried many times
+
+# Enemy radius queries and unit tables
+import rasterizer
+from spatial_index import SpatialIndex
+
+# Cell size of the enemy indexes, the largest radius attack() and reward_function() query
+ENEMY_INDEX_CELL = 12
+
+# Unit tables drawn by visualize_intel and draw_planes: the units they are read
+# from, and the attributes of their rows after x and y. The rows of
+# enemy_units and enemy_structures are the masks of is_structure in the
+# "enemy" table, in the same order (BotAI fills all three in one pass).
+UNIT_TABLES = {
+    "own": ("all_own_units", ("health", "health_max", "type_id.value", "is_structure")),
+    "enemy": ("all_enemy_units", ("health", "health_max", "is_structure")),
+    "minerals": ("mineral_field", ("is_visible",)),
+    "geysers": ("vespene_geyser", ("is_visible", "vespene_contents")),
+}
+
+
+class UnitSnapshot:
+    """Per-step view of the bot's units for the macro actions.
+
+    all_own_units is grouped by type in a single pass, and the resulting
+    collections (all or ready units of a type), counts and already_pending()
+    answers are cached for the rest of the step. Collections keep the order of all_own_units, so they
+    match what self.structures(type) / self.units(type) return (including the
+    choices made by .random). The enemy spatial indexes and the unit tables
+    of the observation are built lazily.
+    """
+
+    def __init__(self, bot) -> None:
+        self.bot = bot
+        self.all_units = bot.all_own_units
+        # Keyed by the integer value of the type: hashing UnitTypeId members
+        # goes through Enum.__hash__, a Python-level call per unit
+        self.by_type = {}
+        for unit in self.all_units:
+            key = unit.type_id._value_
+            group = self.by_type.get(key)
+            if group is None:
+                group = self.by_type[key] = []
+            group.append(unit)
+        # Readiness is only looked at for a few structure types, it is filtered on first use
+        self.ready_by_type = {}
+        self.collections = {}
+        self.pending = {}
+        self.enemy_indexes = None
+        self.tables = {}
+
+    def _collection(self, key, units):
+        collection = self.collections.get(key)
+        if collection is None:
+            collection = self.collections[key] = self.all_units.subgroup(units)
+        return collection
+
+    def of_type(self, type_id):
+        # Same as self.structures(type_id) or self.units(type_id)
+        return self._collection((type_id._value_, False), self.by_type.get(type_id._value_, ()))
+
+    def _ready_units(self, type_id):
+        ready = self.ready_by_type.get(type_id._value_)
+        if ready is None:
+            ready = self.ready_by_type[type_id._value_] = [unit for unit in self.by_type.get(type_id._value_, ()) if unit.is_ready]
+        return ready
+
+    def ready(self, type_id):
+        return self._collection((type_id._value_, True), self._ready_units(type_id))
+
+    def count(self, type_id):
+        return len(self.by_type.get(type_id._value_, ()))
+
+    def ready_count(self, type_id):
+        return len(self._ready_units(type_id))
+
+    def already_pending(self, type_id):
+        # BotAI caches the underlying ability counts once per frame as well
+        pending = self.pending.get(type_id._value_)
+        if pending is None:
+            pending = self.pending[type_id._value_] = self.bot.already_pending(type_id)
+        return pending
+
+    def enemies(self):
+        # Spatial indexes of the enemy units and structures, shared by attack() and reward_function()
+        if self.enemy_indexes is None:
+            self.enemy_indexes = (SpatialIndex(self.bot.enemy_units, ENEMY_INDEX_CELL),
+                                  SpatialIndex(self.bot.enemy_structures, ENEMY_INDEX_CELL))
+        return self.enemy_indexes
+
+    def table(self, name):
+        # Rows of x, y and the attributes of UNIT_TABLES[name], one per unit, in their order
+        table = self.tables.get(name)
+        if table is None:
+            units, fields = UNIT_TABLES[name]
+            table = self.tables[name] = rasterizer.unit_table(getattr(self.bot, units), *fields)
+        return table
@@ -0,0 +1,63 @@
+# General imports
+import math
+
+# Uniform grid over the positions of a Units collection, so that radius
+# queries only look at the units in the few cells around the query point
+# instead of at every unit. It is meant to be built once per game step and
+# shared by everything that queries the same units during that step.
+
+
+def _xy(target):
+    # Accepts units as well as points, like Units.closer_than
+    position = target.position if hasattr(target, "position") else target
+    return position[0], position[1]
+
+
+class SpatialIndex:
+    """Radius queries over a fixed set of units.
+
+    closer_than returns the same units, in the same order, as
+    Units.closer_than: units whose squared distance to the position is
+    strictly below distance ** 2.
+    """
+
+    def __init__(self, units, cell_size=12.0) -> None:
+        self.units = units
+        self.cell_size = cell_size
+        self.cells = {}
+        for order, unit in enumerate(units):
+            x, y = _xy(unit)
+            key = (math.floor(x / cell_size), math.floor(y / cell_size))
+            cell = self.cells.get(key)
+            if cell is None:
+                cell = self.cells[key] = []
+            cell.append((order, unit, x, y))
+
+    def _candidates(self, distance, x, y):
+        size = self.cell_size
+        x0, x1 = math.floor((x - distance) / size), math.floor((x + distance) / size)
+        y0, y1 = math.floor((y - distance) / size), math.floor((y + distance) / size)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) >= len(self.cells):
+            # The query covers most of the grid, scanning every cell is cheaper
+            for cell in self.cells.values():
+                yield from cell
+            return
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                cell = self.cells.get((cx, cy))
+                if cell is not None:
+                    yield from cell
+
+    def closer_than(self, distance, target):
+        x, y = _xy(target)
+        limit = distance ** 2
+        found = [(order, unit) for order, unit, ux, uy in self._candidates(distance, x, y)
+                 if (ux - x) ** 2 + (uy - y) ** 2 < limit]
+        found.sort(key=lambda item: item[0])
+        return self.units.subgroup(unit for _, unit in found)
+
+    def any_closer_than(self, distance, target):
+        # Same as bool(closer_than(distance, target)), stopping at the first unit found
+        x, y = _xy(target)
+        limit = distance ** 2
+        return any((ux - x) ** 2 + (uy - y) ** 2 < limit for _, _, ux, uy in self._candidates(distance, x, y))
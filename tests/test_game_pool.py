@@ -0,0 +1,27 @@
+# Warm permits of GamePool when a game server dies while its game loads, on the stand-in simulator (no SC2 needed).
+# Run from the repository root with: python -m pytest tests
+import simulator
+from game_pool import GamePool
+
+
+async def crash_first_load(next_game):
+    # The server of the first game stops before that game reaches on_start,
+    # like an SC2 process dying on the loading screen
+    def crashing_next_game():
+        slot = next_game()
+        if slot is not None and slot.number == 0:
+            raise RuntimeError("Injected crash while loading")
+        return slot
+    await simulator.host_simulated_games(crashing_next_game)
+
+
+def test_crash_while_loading_gives_the_warm_permit_back():
+    # With a single warm permit, a leaked one would keep the replacement server from loading anything
+    pool = GamePool("Simulated", size=1, warm_spares=1, host=crash_first_load,
+                    bot_class=simulator.SimulatedVRBot)
+    try:
+        slot = pool.acquire(timeout=30)
+        assert slot.number == 1 and not slot.failed
+        assert pool.restarts["crashed"] == 1
+    finally:
+        pool.close()
@@ -0,0 +1,57 @@
+# Episode logs of metrics.py when a flush fails halfway, e.g. on a full disk.
+# Run from the repository root with: python -m pytest tests
+import builtins
+import numpy as np
+import pytest
+
+import metrics
+
+
+def failing_open(path, *args, **kwargs):
+    # The third column can't be written
+    if path.endswith("result.bin"):
+        raise OSError("No space left on device")
+    return builtins.open(path, *args, **kwargs)
+
+
+def failed_flush(directory, monkeypatch):
+    # One episode on disk, then a batch of two whose flush fails halfway
+    writer = metrics.MetricsWriter(str(directory), flush_episodes=1000, flush_seconds=1e9)
+    writer.append(1.0, 10, "Victory", 2.0)
+    writer.flush()
+    writer.append(2.0, 20, "Defeat", 4.0)
+    writer.append(3.0, 30, "Tie", 6.0)
+    monkeypatch.setattr(metrics, "open", failing_open, raising=False)
+    with pytest.raises(OSError):
+        writer.flush()
+    monkeypatch.undo()
+    return writer
+
+
+def check_columns(root, directory, rewards, lengths, results):
+    columns = metrics.MetricsTailer(str(root)).poll()
+    assert list(columns["reward"]) == rewards
+    assert list(columns["length"]) == lengths
+    assert [metrics.RESULTS[result] for result in columns["result"]] == results
+    for name, dtype in metrics.COLUMNS.items():
+        assert (directory / f"{name}.bin").stat().st_size == len(rewards) * np.dtype(dtype).itemsize
+
+
+def test_failed_batch_is_written_again(tmp_path, monkeypatch):
+    directory = tmp_path / "env_0"
+    writer = failed_flush(directory, monkeypatch)
+    # Readers never see the half written batch
+    assert list(metrics.MetricsTailer(str(tmp_path)).poll()["reward"]) == [1.0]
+    writer.append(4.0, 40, "Victory", 8.0)
+    writer.close()
+    check_columns(tmp_path, directory, [1.0, 2.0, 3.0, 4.0], [10, 20, 30, 40], ["Victory", "Defeat", "Tie", "Victory"])
+
+
+def test_next_run_cuts_off_the_failed_batch(tmp_path, monkeypatch):
+    # The run died after the failed flush, the next one appends to the same log
+    directory = tmp_path / "env_0"
+    failed_flush(directory, monkeypatch)
+    writer = metrics.MetricsWriter(str(directory))
+    writer.append(4.0, 40, "Defeat", 8.0)
+    writer.close()
+    check_columns(tmp_path, directory, [1.0, 4.0], [10, 40], ["Victory", "Defeat"])
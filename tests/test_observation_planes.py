@@ -0,0 +1,34 @@
+# The enemy planes of the "planes" observations, on a stand-in game (no SC2 needed).
+# Run from the repository root with: python -m pytest tests
+from queue import Queue
+import numpy as np
+
+import rasterizer
+import simulator
+from action_channel import ActionChannel
+from sc2.ids.unit_typeid import UnitTypeId
+from VoidRayBot import PLANE_ENEMY_STRUCTURES, PLANE_ENEMY_UNITS
+
+
+def plane_of(bot, units):
+    # The plane drawn from these units alone
+    planes = rasterizer.Planes(bot.game_info.playable_area, bot.observation_resolution)
+    table = rasterizer.unit_table(units, "health", "health_max")
+    planes.add(table[:, 0], table[:, 1], 0, np.maximum(rasterizer.health_fractions(table[:, 2], table[:, 3]) * 255, 1))
+    obs = np.zeros((bot.observation_resolution, bot.observation_resolution, 1), dtype=np.uint8)
+    return planes.draw(obs)[:, :, 0]
+
+
+def test_enemy_planes_split_units_and_structures():
+    bot = simulator.SimulatedVRBot(action_in=ActionChannel(), result_out=Queue(),
+                                   observation_mode="planes", observation_resolution=64)
+    game = simulator.SimulatedGame(bot, simulator.SimulatorConfig(enemy_units=50))
+    bot.simulation = game
+    # Enemy structures away from the enemy base, where no enemy unit covers them
+    for position in ((100, 40), (40, 100), (120, 60)):
+        game.add_unit(UnitTypeId.PYLON, position, False)
+    game.prepare(bot)
+    assert bot.enemy_units and bot.enemy_structures
+    obs = bot.visualize_intel()
+    assert np.array_equal(obs[:, :, PLANE_ENEMY_UNITS], plane_of(bot, bot.enemy_units))
+    assert np.array_equal(obs[:, :, PLANE_ENEMY_STRUCTURES], plane_of(bot, bot.enemy_structures))
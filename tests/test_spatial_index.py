@@ -0,0 +1,29 @@
+# The per-step spatial index against brute force closer_than, on simulated units (no SC2 needed).
+# Run from the repository root with: python -m pytest tests
+import random
+import pytest
+
+from spatial_index import SpatialIndex
+from benchmarks.spatial_index import ARMY_SIZES, battle, legacy_attack, legacy_reward_function, play_step
+
+
+@pytest.mark.parametrize("army", ARMY_SIZES)
+@pytest.mark.parametrize("enemy_units", [True, False])
+def test_attack_and_reward_match_brute_force(army, enemy_units):
+    bot = battle(army, seed=army, enemy_units=enemy_units)
+    # Same targets, same reward and same random choices
+    assert play_step(bot, legacy_attack, legacy_reward_function, 1) == \
+        play_step(bot, type(bot).attack, type(bot).reward_function, 1)
+
+
+@pytest.mark.parametrize("army", ARMY_SIZES)
+def test_queries_match_closer_than(army):
+    rng = random.Random(army)
+    units = battle(army, seed=army).all_enemy_units
+    index = SpatialIndex(units, 12)
+    for _ in range(200):
+        # Integer and half coordinates put some units right at the edge of the radius
+        point = (rng.randint(60, 120) + rng.choice((0, 0.5)), rng.randint(60, 120))
+        for distance in (0, 1, 3, 10, 12, 30, 200):
+            assert index.closer_than(distance, point) == units.closer_than(distance, point)
+            assert index.any_closer_than(distance, point) == bool(units.closer_than(distance, point))
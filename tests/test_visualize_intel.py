@@ -0,0 +1,14 @@
+# VRBot.visualize_intel against the original per-unit renderer, on fake units (no SC2 needed).
+# Run from the repository root with: python -m pytest tests
+import numpy as np
+import pytest
+
+from VoidRayBot import VRBot
+from benchmarks.visualize_intel import UNIT_COUNTS, FakeBot, legacy_visualize_intel
+
+
+@pytest.mark.parametrize("n", UNIT_COUNTS)
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_legacy_renderer(n, seed):
+    bot = FakeBot(n, seed)
+    assert np.array_equal(VRBot.visualize_intel(bot), legacy_visualize_intel(bot))
@@ -0,0 +1,189 @@
+# General imports
+import json
+import os
+import numpy as np
+
+# Recorded experience, kept on disk for offline training (behavior cloning,
+# PPO warm starts...). Every recorder writes its own directory of chunks:
+#
+#   chunk_00000/
+#     meta.json      number of steps and non zero pixels, observation shape and dtype
+#     actions.npy    (steps,) int64        } preallocated for a whole chunk and
+#     rewards.npy    (steps,) float32      } memory-mapped while recording, only
+#     dones.npy      (steps,) bool         } the first meta["steps"] are valid
+#     offsets.npy    (steps + 1,) int64    where the pixels of every observation start
+#     pixels.bin     uint32 flat indices of the non zero pixels of the observations
+#     values.bin     their values, in the observation dtype
+#
+# The frames drawn by visualize_intel are almost entirely zeros, so only their
+# non zero pixels are stored, and observations are densified when they are read.
+# A chunk is written under a temporary name and renamed once complete, so
+# readers only ever see whole chunks.
+
+PIXEL_DTYPE = np.uint32
+
+
+class TrajectoryRecorder:
+    """Streams (observation, action, reward, done) steps to disk.
+
+    start() takes the first observation of an episode and step() the result of
+    every action, so that each recorded step holds the observation the action
+    was chosen from.
+    """
+
+    def __init__(self, directory, observation_shape, observation_dtype=np.uint8, chunk_steps=4096) -> None:
+        self.directory = directory
+        self.observation_shape = tuple(observation_shape)
+        self.observation_dtype = np.dtype(observation_dtype)
+        self.chunk_steps = chunk_steps
+        self.chunk_index = 0
+        self.chunk = None
+        self.pending = None # non zero pixels and values of the observation the next action is chosen from
+        os.makedirs(directory, exist_ok=True)
+        # Don't overwrite the chunks of a previous run in the same directory
+        while os.path.exists(self._chunk_path(self.chunk_index)):
+            self.chunk_index += 1
+
+    def _chunk_path(self, index):
+        return os.path.join(self.directory, f"chunk_{index:05d}")
+
+    def _open_chunk(self):
+        path = self._chunk_path(self.chunk_index) + ".tmp"
+        os.makedirs(path, exist_ok=True)
+        open_memmap = np.lib.format.open_memmap
+        self.chunk = {
+            "path": path,
+            "steps": 0,
+            "pixels_written": 0,
+            "actions": open_memmap(os.path.join(path, "actions.npy"), mode="w+", dtype=np.int64, shape=(self.chunk_steps,)),
+            "rewards": open_memmap(os.path.join(path, "rewards.npy"), mode="w+", dtype=np.float32, shape=(self.chunk_steps,)),
+            "dones": open_memmap(os.path.join(path, "dones.npy"), mode="w+", dtype=np.bool_, shape=(self.chunk_steps,)),
+            "offsets": open_memmap(os.path.join(path, "offsets.npy"), mode="w+", dtype=np.int64, shape=(self.chunk_steps + 1,)),
+            "pixels": open(os.path.join(path, "pixels.bin"), "wb"),
+            "values": open(os.path.join(path, "values.bin"), "wb"),
+        }
+
+    def _close_chunk(self):
+        chunk = self.chunk
+        self.chunk = None
+        for name in ("pixels", "values"):
+            chunk[name].close()
+        for name in ("actions", "rewards", "dones", "offsets"):
+            chunk[name].flush()
+        meta = {"steps": chunk["steps"], "pixels": chunk["pixels_written"],
+                "observation_shape": list(self.observation_shape), "observation_dtype": self.observation_dtype.str}
+        with open(os.path.join(chunk["path"], "meta.json"), "w") as file:
+            json.dump(meta, file)
+        os.replace(chunk["path"], self._chunk_path(self.chunk_index))
+        self.chunk_index += 1
+
+    def _encode(self, observation):
+        flat = observation.reshape(-1)
+        pixels = np.flatnonzero(flat).astype(PIXEL_DTYPE)
+        return pixels, flat[pixels]
+
+    def start(self, observation):
+        self.pending = self._encode(observation)
+
+    def step(self, action, reward, done, observation):
+        if self.pending is None:
+            return
+        if self.chunk is None:
+            self._open_chunk()
+        chunk = self.chunk
+        i = chunk["steps"]
+        pixels, values = self.pending
+        chunk["pixels"].write(pixels.tobytes())
+        chunk["values"].write(values.astype(self.observation_dtype, copy=False).tobytes())
+        chunk["pixels_written"] += len(pixels)
+        chunk["actions"][i] = action
+        chunk["rewards"][i] = reward
+        chunk["dones"][i] = done
+        chunk["offsets"][i + 1] = chunk["pixels_written"]
+        chunk["steps"] = i + 1
+        # The observation after the last step of an episode is never acted on
+        self.pending = None if done else self._encode(observation)
+        if chunk["steps"] == self.chunk_steps:
+            self._close_chunk()
+
+    def close(self):
+        if self.chunk is not None:
+            self._close_chunk()
+
+
+class TrajectoryReader:
+    """Random access to the steps recorded under a directory, without loading them.
+
+    Every complete chunk found below `directory` (several recorders may share
+    it) is memory-mapped; observations are densified only for the steps asked for.
+    """
+
+    def __init__(self, directory) -> None:
+        self.chunks = []
+        for root, dirs, files in sorted(os.walk(directory)):
+            dirs.sort()
+            if "meta.json" in files and not root.endswith(".tmp"):
+                self.chunks.append(self._load_chunk(root))
+        self.chunks = [chunk for chunk in self.chunks if chunk["steps"] > 0]
+        if not self.chunks:
+            raise FileNotFoundError(f"No recorded steps under {directory}")
+        shapes = {tuple(chunk["observation_shape"]) for chunk in self.chunks}
+        if len(shapes) > 1:
+            raise ValueError(f"Chunks with different observation shapes under {directory}: {shapes}")
+        self.observation_shape = shapes.pop()
+        self.observation_dtype = np.dtype(self.chunks[0]["observation_dtype"])
+        # Global step i lives in chunk k when starts[k] <= i < starts[k + 1]
+        self.starts = np.cumsum([0] + [chunk["steps"] for chunk in self.chunks])
+
+    @staticmethod
+    def _load_chunk(path):
+        with open(os.path.join(path, "meta.json")) as file:
+            chunk = json.load(file)
+        steps = chunk["steps"]
+        for name in ("actions", "rewards", "dones"):
+            chunk[name] = np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r")[:steps]
+        chunk["offsets"] = np.load(os.path.join(path, "offsets.npy"), mmap_mode="r")[:steps + 1]
+        # Empty files can't be memory-mapped
+        dtype = np.dtype(chunk["observation_dtype"])
+        for name, file_dtype in (("pixels", PIXEL_DTYPE), ("values", dtype)):
+            file_path = os.path.join(path, f"{name}.bin")
+            if chunk["pixels"] == 0:
+                chunk[name + "_map"] = np.zeros(0, dtype=file_dtype)
+            else:
+                chunk[name + "_map"] = np.memmap(file_path, dtype=file_dtype, mode="r", shape=(chunk["pixels"],))
+        return chunk
+
+    def __len__(self):
+        return int(self.starts[-1])
+
+    def _locate(self, indices):
+        indices = np.asarray(indices)
+        chunk_ids = np.searchsorted(self.starts, indices, side="right") - 1
+        return chunk_ids, indices - self.starts[chunk_ids]
+
+    def observations(self, indices):
+        chunk_ids, local = self._locate(indices)
+        out = np.zeros((len(chunk_ids), *self.observation_shape), dtype=self.observation_dtype)
+        flat = out.reshape(len(chunk_ids), -1)
+        for row, (k, i) in enumerate(zip(chunk_ids, local)):
+            chunk = self.chunks[k]
+            start, end = chunk["offsets"][i], chunk["offsets"][i + 1]
+            flat[row, chunk["pixels_map"][start:end]] = chunk["values_map"][start:end]
+        return out
+
+    def _gather(self, name, chunk_ids, local):
+        return np.array([self.chunks[k][name][i] for k, i in zip(chunk_ids, local)])
+
+    def batch(self, indices):
+        chunk_ids, local = self._locate(indices)
+        return {
+            "observations": self.observations(indices),
+            "actions": self._gather("actions", chunk_ids, local),
+            "rewards": self._gather("rewards", chunk_ids, local),
+            "dones": self._gather("dones", chunk_ids, local),
+        }
+
+    def sample(self, batch_size, rng=None):
+        # A random minibatch of steps
+        rng = rng if rng is not None else np.random.default_rng()
+        return self.batch(rng.integers(0, len(self), batch_size))